@@ -0,0 +1,486 @@
+"""
+AI Chat Guardian - 性能基准测试
+生成确定性的中英文合成语料，测量各检测阶段的吞吐量、延迟和峰值内存，并输出JSON便于对比
+"""
+import sys
+import io
+import json
+import math
+import time
+import random
+import tempfile
+import argparse
+import platform
+import threading
+import tracemalloc
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# 设置标准输出编码为UTF-8
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import yaml
+
+from src import ChatGuardian, setup_logging
+from src.utils import load_config, load_sensitive_keywords
+from src.detectors import RegexDetector, KeywordDetector, AIDetector
+from src.detectors.overlap import merge_overlaps
+from src.obfuscators import Obfuscator
+
+# 所有测试阶段（按执行顺序）
+STAGES = ('regex', 'keyword', 'ai', 'obfuscator', 'check_text', 'llm_local', 'llm_api')
+
+# 默认语料大小（字符数）
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# 填充文本
+FILLER_CN = [
+    '今天的会议主要讨论了下个季度的工作安排。', '请大家在周五之前提交各自的周报。', '新版本的界面设计已经基本确定。', '下午三点在三楼会议室进行需求评审。',
+    '这个问题需要和产品经理再确认一下细节。', '测试环境已经部署完成，可以开始验证。', '感谢各位同事在项目中的辛苦付出。', '文档已经上传到共享目录，请查收。',
+    '我们计划在月底前完成第一阶段的开发。', '如有疑问可以随时在群里沟通。'
+]
+FILLER_EN = [
+    'The deployment pipeline finished without errors. ', 'Please review the attached design document. ', 'We will sync again after the sprint planning. ',
+    'Latency on the staging cluster looks stable today. ', 'Let me know if the numbers in the draft look right. '
+]
+
+# 植入的财务表述
+FINANCIAL_TEMPLATES = ['本季度营收{n}万元，', '公司预算为{n}亿元。', '净利润同比增长{p}%，', '合同金额{n}万元。', 'Q3 revenue reached {n} million. ']
+
+# 手机号段（已分配的号段，未分配号段的号码会被校验过滤）
+PHONE_PREFIXES = ['138', '139', '150', '158', '177', '186', '189', '199']
+
+# 身份证地区码和校验码
+ID_REGIONS = ['110101', '310104', '440305', '330106', '510107']
+ID_WEIGHTS = [7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2]
+ID_CHECK_CODES = '10X98765432'
+
+ALNUM = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+
+
+def _digits(rnd: random.Random, count: int) -> str:
+    return ''.join(rnd.choice('0123456789') for _ in range(count))
+
+
+def _id_card(rnd: random.Random) -> str:
+    """生成校验位正确的18位身份证号"""
+    body = rnd.choice(ID_REGIONS) + f"{rnd.randint(1970, 2005)}{rnd.randint(1, 12):02d}{rnd.randint(1, 28):02d}" + _digits(rnd, 3)
+    return body + ID_CHECK_CODES[sum(int(c) * w for c, w in zip(body, ID_WEIGHTS)) % 11]
+
+
+def _bank_card(rnd: random.Random) -> str:
+    """生成Luhn校验正确的银行卡号"""
+    body = '62' + _digits(rnd, rnd.choice((13, 14, 16)))
+    total = 0
+    for i, c in enumerate(reversed(body)):
+        d = int(c)
+        if i % 2 == 0:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return body + str((10 - total % 10) % 10)
+
+
+def _planted(rnd: random.Random, keywords: List[str]) -> str:
+    """生成一段包含敏感信息的文本"""
+    kind = rnd.randrange(9)
+    if kind == 0:
+        return f"我的手机号是{rnd.choice(PHONE_PREFIXES)}{_digits(rnd, 8)}，"
+    if kind == 1:
+        return f"身份证号：{_id_card(rnd)}。"
+    if kind == 2:
+        return f"银行卡 {_bank_card(rnd)} 请勿外传。"
+    if kind == 3:
+        return f"api_key={''.join(rnd.choice(ALNUM) for _ in range(32))} "
+    if kind == 4:
+        return f"AKIA{''.join(rnd.choice(ALNUM[:26] + ALNUM[52:]) for _ in range(16))} "
+    if kind == 5:
+        return f"联系邮箱 user{rnd.randint(1, 9999)}@example.com，"
+    if kind == 6:
+        return f"服务器地址 10.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}，"
+    if kind == 7 and keywords:
+        return f"关于{rnd.choice(keywords)}的事项请注意保密。"
+    return rnd.choice(FINANCIAL_TEMPLATES).format(n=rnd.randint(10, 99999), p=rnd.randint(1, 80))
+
+
+def generate_corpus(size: int, seed: int, keywords: List[str], sensitive_ratio: float = 0.25) -> str:
+    """
+    生成确定性的合成语料
+
+    Args:
+        size: 语料字符数
+        seed: 随机种子（相同种子和大小总是生成相同的语料）
+        keywords: 可植入的敏感关键词
+        sensitive_ratio: 敏感片段所占比例
+
+    Returns:
+        语料文本
+    """
+    rnd = random.Random(f"{seed}:{size}")
+    parts = []
+    length = 0
+    while length < size:
+        r = rnd.random()
+        if r < sensitive_ratio:
+            piece = _planted(rnd, keywords)
+        elif r < sensitive_ratio + 0.15:
+            piece = rnd.choice(FILLER_EN)
+        else:
+            piece = rnd.choice(FILLER_CN)
+        if rnd.random() < 0.05:
+            piece += '\n\n'
+        parts.append(piece)
+        length += len(piece)
+    return ''.join(parts)[:size]
+
+
+class MockLLMServer:
+    """本地模拟LLM服务，兼容Ollama和OpenAI格式的接口，返回提示词中的手机号和金额"""
+
+    PHONE_PATTERN = r'1[3-9]\d{9}'
+    AMOUNT_PATTERN = r'\d+(?:\.\d+)?[万亿]元'
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency: 每个请求的模拟延迟（秒）
+        """
+        import re
+        from http.server import ThreadingHTTPServer
+
+        self.latency = latency
+        self._patterns = [(re.compile(self.PHONE_PATTERN), 'personnel'), (re.compile(self.AMOUNT_PATTERN), 'financial')]
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> 'MockLLMServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def respond(self, prompt: str) -> str:
+        """生成检测结果JSON"""
+        detections = []
+        seen = set()
+        for pattern, category in self._patterns:
+            for match in pattern.finditer(prompt):
+                if match.group() not in seen:
+                    seen.add(match.group())
+                    detections.append({'text': match.group(), 'category': category})
+        return json.dumps({'detections': detections}, ensure_ascii=False)
+
+    def _make_handler(self):
+        from http.server import BaseHTTPRequestHandler
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # 支持长连接
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload: Dict[str, Any]):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, content: str, piece_size: int = 16):
+                """按Ollama流式格式分块发送（chunked编码）"""
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                lines = [{'response': content[i:i + piece_size], 'done': False} for i in range(0, len(content), piece_size)]
+                lines.append({'response': '', 'done': True})
+                try:
+                    for line in lines:
+                        data = (json.dumps(line, ensure_ascii=False) + '\n').encode('utf-8')
+                        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b'\r\n')
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # 客户端在JSON完整后提前断开
+
+            def do_GET(self):
+                if self.path == '/api/tags':
+                    self._send_json({'models': [{'name': 'mock'}]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                if mock.latency:
+                    time.sleep(mock.latency)
+
+                if self.path == '/api/generate':
+                    content = mock.respond(request.get('prompt', ''))
+                    if request.get('stream'):
+                        self._send_stream(content)
+                    else:
+                        self._send_json({'response': content, 'done': True})
+                elif self.path.endswith('/chat/completions'):
+                    prompt = '\n'.join(message.get('content', '') for message in request.get('messages', []))
+                    self._send_json({'choices': [{'message': {'role': 'assistant', 'content': mock.respond(prompt)}}]})
+                else:
+                    self.send_error(404)
+
+        return Handler
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法计算百分位数"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def measure(run: Callable[[str], int], text: str, repeat: int, warmup: int = 1) -> Dict[str, Any]:
+    """
+    测量单个阶段在一份语料上的性能
+
+    Args:
+        run: 阶段函数，输入文本，返回检测/处理的条目数
+        text: 语料
+        repeat: 计时的运行次数
+        warmup: 预热次数（不计时）
+
+    Returns:
+        延迟、吞吐量和峰值内存统计
+    """
+    for _ in range(warmup):
+        run(text)
+
+    latencies = []
+    count = 0
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        count = run(text)
+        latencies.append(time.perf_counter() - start_time)
+
+    # 单独运行一次测量峰值内存（tracemalloc 会拖慢执行，不与计时混在一起）
+    tracemalloc.start()
+    try:
+        run(text)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        'chars': len(text),
+        'runs': repeat,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': total / repeat * 1000,
+        'chars_per_sec': len(text) * repeat / total if total > 0 else 0.0,
+        'peak_memory_bytes': peak,
+        'items': count
+    }
+
+
+def _write_bench_config(tmp_dir: str) -> str:
+    """生成 check_text 阶段使用的配置：只启用正则和关键词检测，关闭结果缓存"""
+    config = load_config()
+    config.setdefault('detection', {}).update({'enable_regex': True, 'enable_keyword': True, 'enable_ai': False})
+    config.setdefault('llm_detector', {})['enable'] = False
+    config['result_cache'] = {'enable': False}
+    config['segment_cache'] = {'enable': False}
+    path = Path(tmp_dir) / 'bench_config.yaml'
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    return str(path)
+
+
+def build_stages(names: List[str], keywords: Dict[str, list], tmp_dir: str, mock_url: Optional[str], ai_mode: str, resources: ExitStack) -> Dict[str, Callable[[str], int]]:
+    """
+    创建各阶段的运行函数（检测器的初始化不计入测量；需要释放的资源登记到 resources）
+
+    Returns:
+        {阶段名: 运行函数}，无法运行的阶段不包含在内
+    """
+    stages = {}
+
+    if 'regex' in names:
+        regex_detector = RegexDetector()
+        stages['regex'] = lambda text: len(regex_detector.detect(text))
+
+    if 'keyword' in names:
+        keyword_detector = KeywordDetector(keywords)
+        stages['keyword'] = lambda text: len(keyword_detector.detect(text))
+
+    if 'ai' in names:
+        ai_detector = AIDetector(mode=ai_mode)
+        stages['ai'] = lambda text: len(ai_detector.detect(text))
+
+    if 'obfuscator' in names:
+        # 混淆阶段使用预先计算好的检测结果，只测量混淆本身
+        obfuscator = Obfuscator(load_config().get('obfuscation', {}))
+        regex_detector = RegexDetector()
+        keyword_detector = KeywordDetector(keywords)
+        detections_cache = {}
+
+        def run_obfuscator(text: str) -> int:
+            if text not in detections_cache:
+                detections_cache.clear()
+                detections_cache[text] = merge_overlaps(regex_detector.detect(text) + keyword_detector.detect(text))
+            return len(obfuscator.obfuscate(text, detections_cache[text])[1])
+
+        stages['obfuscator'] = run_obfuscator
+
+    if 'check_text' in names:
+        guardian = resources.enter_context(ChatGuardian(config_path=_write_bench_config(tmp_dir)))
+        stages['check_text'] = lambda text: guardian.check_text(text).detection_count
+
+    if mock_url and 'llm_local' in names:
+        from src.detectors.llm_detector import LLMDetector
+        local_detector = LLMDetector(model='mock', base_url=mock_url, stream=True)
+        stages['llm_local'] = lambda text: len(local_detector.detect(text, threshold=0.0))
+
+    if mock_url and 'llm_api' in names:
+        from src.detectors.llm_detector_api import LLMDetectorAPI
+        api_detector = LLMDetectorAPI(provider='zhipu', api_key='mock-key', model='mock', base_url=f"{mock_url}/v1")
+        stages['llm_api'] = lambda text: len(api_detector.detect(text, threshold=0.0))
+
+    return stages
+
+
+def run_benchmark(names: List[str], sizes: List[int], repeat: int, seed: int, mock_latency: float, ai_mode: str) -> Dict[str, Any]:
+    """运行基准测试，返回可序列化为JSON的结果"""
+    keywords = load_sensitive_keywords()
+    keyword_list = sorted({keyword for words in keywords.values() for keyword in (words or [])})
+    corpora = {size: generate_corpus(size, seed, keyword_list) for size in sizes}
+
+    results = []
+    skipped = {}
+
+    # LLM阶段依赖 requests 库，缺失时跳过
+    llm_names = [name for name in names if name.startswith('llm_')]
+    if llm_names:
+        try:
+            import requests  # noqa: F401
+        except ImportError:
+            for name in llm_names:
+                skipped[name] = '未安装 requests 库'
+            llm_names = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir, ExitStack() as resources:
+        mock = MockLLMServer(latency=mock_latency) if llm_names else None
+        if mock is not None:
+            mock.__enter__()
+        try:
+            stages = build_stages([name for name in names if name not in skipped], keywords, tmp_dir, mock.url if mock else None, ai_mode, resources)
+            for name in names:
+                if name not in stages:
+                    continue
+                for size in sizes:
+                    stats = measure(stages[name], corpora[size], repeat)
+                    results.append({'stage': name, 'size': size, **stats})
+                    print(f"  {name:<11} {size:>9} 字符  p50 {stats['p50_ms']:9.2f}ms  {stats['chars_per_sec'] / 1e6:8.2f} M字符/秒", file=sys.stderr)
+        finally:
+            if mock is not None:
+                mock.__exit__(None, None, None)
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'sizes': sizes,
+            'repeat': repeat,
+            'mock_latency_ms': mock_latency * 1000,
+            'ai_mode': ai_mode
+        },
+        'results': results,
+        'skipped': skipped
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    """打印结果表格（提供基准结果时显示吞吐量变化）"""
+    base = {(item['stage'], item['size']): item for item in (baseline or {}).get('results', [])}
+
+    header = f"{'阶段':<11}{'大小':>10}{'p50(ms)':>12}{'p99(ms)':>12}{'M字符/秒':>12}{'峰值内存(MB)':>14}{'条目':>8}"
+    if base:
+        header += f"{'对比':>10}"
+    print(header)
+    print('-' * (len(header) + 8))
+
+    for item in report['results']:
+        line = (f"{item['stage']:<11}{item['size']:>10}{item['p50_ms']:>12.2f}{item['p99_ms']:>12.2f}"
+                f"{item['chars_per_sec'] / 1e6:>12.2f}{item['peak_memory_bytes'] / 1024 / 1024:>14.2f}{item['items']:>8}")
+        previous = base.get((item['stage'], item['size']))
+        if previous and previous.get('chars_per_sec'):
+            line += f"{item['chars_per_sec'] / previous['chars_per_sec']:>9.2f}x"
+        print(line)
+
+    for name, reason in report.get('skipped', {}).items():
+        print(f"跳过 {name}: {reason}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='AI Chat Guardian - 性能基准测试',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="""
+示例:
+  python bench.py                                   # 默认阶段和语料大小
+  python bench.py --sizes 1000,1000000 --repeat 3   # 指定语料大小
+  python bench.py --stages regex,keyword -o new.json
+  python bench.py --compare old.json                # 与之前的结果对比
+        """)
+
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"要测试的阶段，逗号分隔（可选: {', '.join(STAGES)}）")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES), help='语料大小（字符数），逗号分隔')
+    parser.add_argument('--repeat', type=int, default=5, help='每个阶段计时的运行次数')
+    parser.add_argument('--seed', type=int, default=42, help='语料随机种子')
+    parser.add_argument('--mock-latency-ms', type=float, default=0.0, help='模拟LLM服务每个请求的延迟（毫秒）')
+    parser.add_argument('--ai-mode', default='keyword-enhanced', help='AI检测器模式（zero-shot / similarity / keyword-enhanced）')
+    parser.add_argument('-o', '--output', help='将JSON结果保存到文件')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出结果（不打印表格）')
+    parser.add_argument('--compare', help='与之前保存的JSON结果对比吞吐量')
+
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.stages.split(',') if name.strip()]
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        parser.error(f"未知的阶段: {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    setup_logging('WARNING')
+
+    report = run_benchmark(names, sizes, max(1, args.repeat), args.seed, args.mock_latency_ms / 1000, args.ai_mode)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        baseline = None
+        if args.compare:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        print_report(report, baseline)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
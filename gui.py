@@ -95,8 +95,10 @@ class GuardianGUI:
         try:
             # 重新加载配置文件到内存
             self.load_config()
-            # 重新初始化Guardian
+            # 重新初始化Guardian，旧实例正在进行的检测完成后在后台释放其线程池/进程池
+            previous = self.guardian
             self.guardian = ChatGuardian()
+            threading.Thread(target=previous.close, kwargs={'wait': True}, daemon=True).start()
             messagebox.showinfo("成功", "配置已更新并重新加载检测器")
             return True
         except Exception as e:
@@ -527,8 +529,16 @@ class GuardianGUI:
         # 显示检测进度
         self.root.after(0, lambda: self.progress_label.config(text="🔍 正在检测...", fg='#2196F3'))
 
+        # LLM检测较慢，流式输出中每发现一项即更新进度
+        llm_found = []
+
+        def on_llm_match(detection):
+            llm_found.append(detection)
+            message = f"🔍 正在检测... LLM已发现 {len(llm_found)} 项（最新: {detection.category}）"
+            self.root.after(0, lambda: self.progress_label.config(text=message, fg='#2196F3'))
+
         # 直接使用guardian的check_text方法，它会处理所有检测器
-        result = self.guardian.check_text(text, auto_obfuscate=True)
+        result = self.guardian.check_text(text, auto_obfuscate=True, on_llm_match=on_llm_match)
 
         # 完成检测
         self.root.after(0, lambda: self.progress_label.config(text="✓ 检测完成", fg='#4CAF50'))
@@ -701,6 +711,11 @@ def main():
     app = GuardianGUI(root)
     root.mainloop()
 
+    # 关闭窗口后释放检测线程池/进程池
+    guardian = getattr(app, 'guardian', None)
+    if guardian is not None:
+        guardian.close()
+
 
 if __name__ == '__main__':
     main()
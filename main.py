@@ -2,6 +2,9 @@
 AI Chat Guardian - 命令行界面
 """
 import sys
+import os
+import time
+import json
 import argparse
 from pathlib import Path
 import io
@@ -15,7 +18,8 @@ sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src import ChatGuardian, setup_logging
-from src.utils import load_config
+from src.utils import load_config, get_cache_dir
+from src.manifest import ScanManifest, hash_file
 
 try:
     from colorama import init, Fore, Style
@@ -164,7 +168,178 @@ def file_mode(guardian: ChatGuardian, file_path: str, output_path: str = None):
             print_colored(f"\n保存文件失败: {e}", Fore.RED)
 
 
-def batch_mode(guardian: ChatGuardian, directory: str):
+def stream_mode(guardian: ChatGuardian, file_path: str, output_path: str = None, verbose: bool = False):
+    """流式模式（适用于超大文件，只使用正则和关键词检测）"""
+    print_colored(f"\n正在流式检测文件: {file_path}", Fore.CYAN)
+
+    sink = None
+    try:
+        if output_path:
+            sink = open(output_path, 'w', encoding='utf-8', newline='')
+
+        type_counts = {}
+        total = 0
+        for detection in guardian.scan_file_stream(file_path, sink=sink):
+            total += 1
+            type_counts[detection['type']] = type_counts.get(detection['type'], 0) + 1
+            if verbose:
+                content = detection['content']
+                if len(content) > 50:
+                    content = content[:50] + "..."
+                print(f"  [{detection['type']}] {detection['start']}: {content}")
+    except Exception as e:
+        print_colored(f"\n流式检测失败: {e}", Fore.RED)
+        return
+    finally:
+        if sink is not None:
+            sink.close()
+
+    print_colored("\n" + "=" * 60, Fore.CYAN)
+    print_colored("检测结果", Fore.CYAN, bright=True)
+    print_colored("=" * 60, Fore.CYAN)
+
+    if total:
+        print_colored(f"\n⚠️  检测到 {total} 处敏感信息！", Fore.RED, bright=True)
+        for det_type, count in type_counts.items():
+            print_colored(f"  [{det_type}] 共 {count} 处", Fore.YELLOW)
+    else:
+        print_colored("\n✓ 未检测到敏感信息，文本安全！", Fore.GREEN, bright=True)
+
+    if output_path:
+        print_colored(f"\n安全文本已保存到: {output_path}", Fore.GREEN)
+
+
+# 批量检测工作进程中的守护者实例（每个进程只初始化一次）
+_batch_guardian = None
+
+
+def _init_batch_worker(config_path: str, log_level: str):
+    """批量检测工作进程初始化"""
+    global _batch_guardian
+    setup_logging(log_level)
+    _batch_guardian = ChatGuardian(config_path=config_path)
+
+
+def _scan_batch_file(task: tuple) -> tuple:
+    """在工作进程中检测单个文件，返回 (序号, 是否敏感, 敏感信息数量, 文件大小, 是否无警告)"""
+    index, file_path = task
+    result = _batch_guardian.check_file(file_path)
+    try:
+        size = os.path.getsize(file_path)
+    except OSError:
+        size = 0
+    return index, result.has_sensitive, result.detection_count, size, not result.warnings
+
+
+def _scan_batch_parallel(text_files: list, workers: int, config_path: str = None, verbose: bool = False) -> list:
+    """
+    使用进程池并行检测文件
+    
+    文件按小块动态分发（空闲进程领取下一块），检测期间显示进度和吞吐量
+    
+    Returns:
+        按文件顺序排列的 (是否敏感, 敏感信息数量, 是否无警告) 列表
+    """
+    import multiprocessing
+
+    tasks = [(index, str(file_path)) for index, file_path in enumerate(text_files)]
+    chunksize = max(1, min(64, len(tasks) // (workers * 16)))
+    results = [None] * len(tasks)
+
+    start_time = time.perf_counter()
+    last_report = 0.0
+    total_bytes = 0
+    done = 0
+
+    log_level = 'DEBUG' if verbose else 'WARNING'
+    with multiprocessing.Pool(processes=workers, initializer=_init_batch_worker, initargs=(config_path, log_level)) as pool:
+        for index, has_sensitive, count, size, ok in pool.imap_unordered(_scan_batch_file, tasks, chunksize=chunksize):
+            results[index] = (has_sensitive, count, ok)
+            total_bytes += size
+            done += 1
+
+            # 限制刷新频率
+            now = time.perf_counter()
+            if now - last_report >= 0.5 or done == len(tasks):
+                last_report = now
+                elapsed = max(now - start_time, 1e-9)
+                print(f"\r进度: {done}/{len(tasks)} | {done / elapsed:.1f} 文件/秒 | {total_bytes / elapsed / 1024 / 1024:.2f} MB/秒", end='', flush=True)
+
+    print()
+    return results
+
+
+def _scan_batch_serial(guardian: ChatGuardian, text_files: list) -> list:
+    """
+    依次检测文件并逐个显示结果
+    
+    Returns:
+        按文件顺序排列的 (是否敏感, 敏感信息数量, 是否无警告) 列表
+    """
+    results = []
+    for file_path in text_files:
+        print_colored(f"检测: {file_path.name}", Fore.CYAN)
+        result = guardian.check_file(str(file_path))
+
+        if result.has_sensitive:
+            print_colored(f"  ⚠ 发现 {result.detection_count} 处敏感信息", Fore.YELLOW)
+        else:
+            print_colored(f"  ✓ 安全", Fore.GREEN)
+        results.append((result.has_sensitive, result.detection_count, not result.warnings))
+
+    return results
+
+
+def _plan_incremental_scan(manifest: ScanManifest, text_files: list, results: list) -> tuple:
+    """
+    根据扫描清单确定需要检测的文件
+    
+    大小和修改时间未变的文件直接复用清单中的结果；已变化的文件计算内容哈希，
+    内容检测过（包括本次扫描中内容相同的其他文件）的同样不再检测。
+    复用的结果直接写入 results。
+    
+    Returns:
+        (需要检测的文件序号, {重复文件序号: 首个相同内容文件的序号}, {序号: (路径, 大小, 修改时间, 内容哈希)}, 跳过的文件数)
+    """
+    scan_indexes = []
+    duplicates = {}
+    file_info = {}
+    first_by_hash = {}
+    skipped = 0
+
+    for index, file_path in enumerate(text_files):
+        try:
+            stat = file_path.stat()
+            path = str(file_path.resolve())
+            cached = manifest.get_by_stat(path, stat.st_size, stat.st_mtime_ns)
+            if cached is not None:
+                results[index] = (*cached, True)
+                skipped += 1
+                continue
+
+            content_hash = hash_file(str(file_path))
+        except OSError:
+            # 无法读取的文件交给检测流程报告错误
+            scan_indexes.append(index)
+            continue
+
+        file_info[index] = (path, stat.st_size, stat.st_mtime_ns, content_hash)
+        cached = manifest.get_by_hash(content_hash)
+        if cached is not None:
+            results[index] = (*cached, True)
+            manifest.record(path, stat.st_size, stat.st_mtime_ns, content_hash, *cached)
+            skipped += 1
+        elif content_hash in first_by_hash:
+            duplicates[index] = first_by_hash[content_hash]
+            skipped += 1
+        else:
+            first_by_hash[content_hash] = index
+            scan_indexes.append(index)
+
+    return scan_indexes, duplicates, file_info, skipped
+
+
+def batch_mode(guardian: ChatGuardian, directory: str, workers: int = 1, config_path: str = None, verbose: bool = False, incremental: bool = False, manifest_path: str = None):
     """批量处理模式"""
     from pathlib import Path
 
@@ -182,19 +357,49 @@ def batch_mode(guardian: ChatGuardian, directory: str):
 
     print_colored(f"\n找到 {len(text_files)} 个文件，开始批量检测...\n", Fore.CYAN)
 
-    total_sensitive = 0
-    results_summary = []
+    # 每个文件的 (是否敏感, 敏感信息数量, 是否检测成功)
+    results = [None] * len(text_files)
 
-    for file_path in text_files:
-        print_colored(f"检测: {file_path.name}", Fore.CYAN)
-        result = guardian.check_file(str(file_path))
+    # 增量模式：根据扫描清单跳过未变化和内容重复的文件
+    manifest = None
+    scan_indexes = list(range(len(text_files)))
+    duplicates = {}
+    file_info = {}
+    if incremental:
+        manifest = ScanManifest(manifest_path or str(get_cache_dir() / 'scan_manifest.sqlite3'), guardian.fingerprint)
+        scan_indexes, duplicates, file_info, skipped = _plan_incremental_scan(manifest, text_files, results)
+        print_colored(f"增量扫描: {skipped} 个文件未变化或内容重复，需要检测 {len(scan_indexes)} 个\n", Fore.CYAN)
 
-        if result.has_sensitive:
-            total_sensitive += 1
-            results_summary.append({'file': file_path.name, 'count': result.detection_count})
-            print_colored(f"  ⚠ 发现 {result.detection_count} 处敏感信息", Fore.YELLOW)
+    try:
+        scan_files = [text_files[index] for index in scan_indexes]
+        if workers > 1 and scan_files:
+            # 多进程模式：只显示进度，结果按文件顺序汇总
+            print_colored(f"使用 {workers} 个进程并行检测", Fore.CYAN)
+            scanned = _scan_batch_parallel(scan_files, workers, config_path, verbose)
         else:
-            print_colored(f"  ✓ 安全", Fore.GREEN)
+            scanned = _scan_batch_serial(guardian, scan_files)
+
+        for index, (has_sensitive, count, ok) in zip(scan_indexes, scanned):
+            results[index] = (has_sensitive, count, ok)
+            # 读取或检测出错的文件不记录，下次重新检测
+            if manifest is not None and ok and index in file_info:
+                manifest.record(*file_info[index], has_sensitive, count)
+
+        # 内容重复的文件沿用首个文件的结果，首个文件检测出错时同样不记录
+        for index, first_index in duplicates.items():
+            has_sensitive, count, ok = results[index] = results[first_index]
+            if manifest is not None and ok:
+                manifest.record(*file_info[index], has_sensitive, count)
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+    total_sensitive = 0
+    results_summary = []
+    for file_path, (has_sensitive, count, _) in zip(text_files, results):
+        if has_sensitive:
+            total_sensitive += 1
+            results_summary.append({'file': file_path.name, 'count': count})
 
     # 显示总结
     print_colored("\n" + "=" * 60, Fore.CYAN)
@@ -209,6 +414,85 @@ def batch_mode(guardian: ChatGuardian, directory: str):
             print(f"  - {item['file']}: {item['count']} 处")
 
 
+def _parse_pipeline_record(line: str, text_field: str) -> tuple:
+    """
+    解析流水线输入的一行：JSON对象取 text_field 字段（并保留 id），JSON字符串取其值，其他按原始文本处理
+    
+    Returns:
+        (待检测文本, 记录ID或None)
+    """
+    line = line.rstrip('\n').rstrip('\r')
+    if line[:1] in ('{', '"'):
+        try:
+            value = json.loads(line)
+        except ValueError:
+            return line, None
+        if isinstance(value, dict):
+            text = value.get(text_field)
+            return (text if isinstance(text, str) else ''), value.get('id')
+        if isinstance(value, str):
+            return value, None
+    return line, None
+
+
+def _process_pipeline_record(guardian: ChatGuardian, line: str, text_field: str) -> str:
+    """检测一条流水线记录，返回一行JSON结果（不包含敏感原文）"""
+    text, record_id = _parse_pipeline_record(line, text_field)
+    record = {} if record_id is None else {'id': record_id}
+    try:
+        result = guardian.check_text(text)
+        record.update({
+            'has_sensitive': result.has_sensitive,
+            'detection_count': result.detection_count,
+            'safe_text': result.safe_text,
+            'detections': [{
+                'type': detection['type'],
+                'start': detection['start'],
+                'end': detection['end'],
+                'confidence': detection['confidence']
+            } for detection in result.detections]
+        })
+        if result.warnings:
+            record['warnings'] = result.warnings
+    except Exception as e:
+        record['error'] = str(e)
+    return json.dumps(record, ensure_ascii=False)
+
+
+def pipeline_mode(guardian: ChatGuardian, workers: int = 1, max_in_flight: int = 64, text_field: str = 'text'):
+    """
+    流水线模式：从标准输入逐行读取记录（NDJSON或原始文本），向标准输出逐行写出JSON结果
+    
+    输出顺序与输入一致。多线程时最多同时处理 max_in_flight 条记录，队首完成后立即写出，内存占用有上限。
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    out = sys.stdout
+
+    if workers <= 1:
+        for line in sys.stdin:
+            out.write(_process_pipeline_record(guardian, line, text_field) + '\n')
+            out.flush()
+        return
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for line in sys.stdin:
+            # 达到并发上限时等待最早的记录完成
+            if len(pending) >= max_in_flight:
+                out.write(pending.popleft().result() + '\n')
+            pending.append(pool.submit(_process_pipeline_record, guardian, line, text_field))
+
+            while pending and pending[0].done():
+                out.write(pending.popleft().result() + '\n')
+            out.flush()
+
+        while pending:
+            out.write(pending.popleft().result() + '\n')
+        out.flush()
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='AI Chat Guardian - 保护您的敏感信息',
@@ -219,13 +503,24 @@ def main():
   python main.py -t "文本内容"             # 直接检测文本
   python main.py -f input.txt             # 检测文件
   python main.py -f input.txt -o safe.txt # 检测并保存安全文本
+  python main.py -f huge.log --stream -o safe.log  # 流式检测超大文件
   python main.py -b ./documents           # 批量检测目录
+  python main.py -b ./documents --workers 8  # 多进程批量检测
+  python main.py -b ./documents --incremental  # 增量检测（跳过未变化的文件）
+  cat records.ndjson | python main.py --pipeline > results.ndjson  # 流水线模式
         """)
 
     parser.add_argument('-t', '--text', help='直接检测文本（用于测试）')
     parser.add_argument('-f', '--file', help='检测文件')
     parser.add_argument('-o', '--output', help='输出文件路径（保存安全文本）')
     parser.add_argument('-b', '--batch', help='批量检测目录')
+    parser.add_argument('--stream', action='store_true', help='流式检测文件（与 -f 一起使用，内存占用与文件大小无关，只使用正则和关键词检测）')
+    parser.add_argument('--workers', type=int, default=1, help='批量检测的进程数，流水线模式下为线程数（默认1，0表示使用全部CPU核心）')
+    parser.add_argument('--incremental', action='store_true', help='增量批量检测：跳过上次检测后未变化的文件，内容相同的文件只检测一次')
+    parser.add_argument('--manifest', help='增量检测的扫描清单路径（默认 cache/scan_manifest.sqlite3）')
+    parser.add_argument('--pipeline', action='store_true', help='流水线模式：从标准输入读取NDJSON或文本行，每行输出一条JSON结果')
+    parser.add_argument('--text-field', default='text', help='流水线模式下JSON记录中待检测文本的字段名（默认 text）')
+    parser.add_argument('--in-flight', type=int, default=64, help='流水线模式下同时处理的最大记录数（--workers 大于1时生效）')
     parser.add_argument('-c', '--config', help='配置文件路径')
     parser.add_argument('-v', '--verbose', action='store_true', help='详细输出')
     parser.add_argument('--no-color', action='store_true', help='禁用颜色输出')
@@ -237,6 +532,21 @@ def main():
         global HAS_COLORAMA
         HAS_COLORAMA = False
 
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    # 流水线模式：标准输出只写结果，日志写到标准错误
+    if args.pipeline:
+        setup_logging('DEBUG' if args.verbose else 'WARNING')
+        try:
+            with ChatGuardian(config_path=args.config) as guardian:
+                pipeline_mode(guardian, workers, max(1, args.in_flight), args.text_field)
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            print(f"运行错误: {e}", file=sys.stderr)
+            return 1
+        return 0
+
     # 打印横幅
     print_banner()
 
@@ -253,19 +563,22 @@ def main():
         print_colored(f"初始化失败: {e}", Fore.RED)
         return 1
 
-    # 根据参数选择模式
+    # 根据参数选择模式（结束时释放检测线程池/进程池）
     try:
-        if args.text:
-            # 直接文本检测模式
-            print_colored("\n正在检测...", Fore.CYAN)
-            result = guardian.check_text(args.text)
-            print_result(result)
-        elif args.file:
-            file_mode(guardian, args.file, args.output)
-        elif args.batch:
-            batch_mode(guardian, args.batch)
-        else:
-            interactive_mode(guardian)
+        with guardian:
+            if args.text:
+                # 直接文本检测模式
+                print_colored("\n正在检测...", Fore.CYAN)
+                result = guardian.check_text(args.text)
+                print_result(result)
+            elif args.file and args.stream:
+                stream_mode(guardian, args.file, args.output, args.verbose)
+            elif args.file:
+                file_mode(guardian, args.file, args.output)
+            elif args.batch:
+                batch_mode(guardian, args.batch, workers, args.config, args.verbose, args.incremental, args.manifest)
+            else:
+                interactive_mode(guardian)
     except Exception as e:
         print_colored(f"\n运行错误: {e}", Fore.RED)
         if args.verbose:
@@ -0,0 +1,112 @@
+"""
+Aho-Corasick 多模式匹配自动机
+一次线性扫描即可找出文本中所有关键词的出现位置
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class AhoCorasickAutomaton:
+    """Aho-Corasick 自动机（纯Python实现，无额外依赖）"""
+
+    def __init__(self, words: Iterable[str] = ()):
+        """
+        初始化自动机
+
+        Args:
+            words: 初始关键词列表
+        """
+        self._goto: List[Dict[str, int]] = [{}]  # 状态转移表
+        self._fail: List[int] = [0]  # 失败指针
+        self._word: List[Optional[str]] = [None]  # 在该状态结束的关键词
+        self._output: List[Tuple[str, ...]] = [()]  # 每个状态可输出的关键词（长的在前）
+        self._built = True
+        self._size = 0
+
+        for word in words:
+            self.add(word)
+        self.build()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, word: str):
+        """
+        添加关键词（添加后需重新调用 build）
+
+        Args:
+            word: 关键词
+        """
+        if not word:
+            return
+
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._word.append(None)
+                self._output.append(())
+            state = next_state
+
+        if self._word[state] is None:
+            self._word[state] = word
+            self._size += 1
+            self._built = False
+
+    def build(self):
+        """构建失败指针（BFS），并合并后缀状态的输出"""
+        self._output = [(word, ) if word is not None else () for word in self._word]
+        queue = deque()
+
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+
+                # 当前状态的关键词一定比失败状态上的更长
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """
+        扫描文本，按结束位置顺序产出所有匹配
+
+        Args:
+            text: 待扫描文本（调用方负责大小写归一化）
+
+        Yields:
+            (起始位置, 结束位置, 关键词)
+        """
+        if not self._built:
+            self.build()
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+
+        for index, char in enumerate(text):
+            transitions = goto[state]
+            while state and char not in transitions:
+                state = fail[state]
+                transitions = goto[state]
+            state = transitions.get(char, 0)
+
+            if output[state]:
+                end = index + 1
+                for word in output[state]:
+                    yield end - len(word), end, word
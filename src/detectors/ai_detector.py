@@ -25,7 +25,7 @@ class SemanticMatch:
 class AIDetector:
     """基于AI的语义检测器"""
 
-    def __init__(self, model_name: str = "bert-base-chinese", use_gpu: bool = False, mode: str = "zero-shot"):
+    def __init__(self, model_name: str = "bert-base-chinese", use_gpu: bool = False, mode: str = "zero-shot", batch_size: int = 8):
         """
         初始化AI检测器
         
@@ -33,15 +33,20 @@ class AIDetector:
             model_name: 模型名称（默认：bert-base-chinese）
             use_gpu: 是否使用GPU
             mode: 检测模式 - "zero-shot"（零样本分类）或 "similarity"（相似度匹配）
+            batch_size: 模型推理的批大小（每批处理的句子数）
         """
         self.logger = logging.getLogger(__name__)
         self.model_name = model_name
         self.use_gpu = use_gpu
         self.mode = mode
+        self.batch_size = max(1, int(batch_size))
         self.model = None
         self.tokenizer = None
         self.classifier = None
         self.sentence_model = None
+        self.template_matrix = None  # 所有模板的L2归一化向量（按类别顺序堆叠）
+        self.template_categories = []  # 与 template_offsets 对应的类别键
+        self.template_offsets = None  # 每个类别在模板矩阵中的起始行
 
         # 定义敏感类别及其描述
         self.categories = {
@@ -149,15 +154,38 @@ class AIDetector:
             raise
 
     def _precompute_template_embeddings(self):
-        """预计算敏感内容模板的向量"""
-        self.template_embeddings = {}
+        """
+        预计算敏感内容模板的向量
+        
+        所有类别的模板一次性编码并L2归一化为一个矩阵，同时记录每个类别的起始行，
+        检测时只需一次矩阵乘法即可得到句子与全部模板的余弦相似度。
+        """
+        import numpy as np
 
+        templates = []
+        categories = []
+        offsets = []
         for category, info in self.categories.items():
-            templates = info['templates']
-            embeddings = self.sentence_model.encode(templates)
-            self.template_embeddings[category] = embeddings
+            if not info['templates']:
+                continue
+            categories.append(category)
+            offsets.append(len(templates))
+            templates.extend(info['templates'])
 
-        self.logger.debug(f"已预计算 {len(self.template_embeddings)} 个类别的模板向量")
+        embeddings = self.sentence_model.encode(templates, batch_size=self.batch_size)
+        self.template_matrix = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        self.template_categories = categories
+        self.template_offsets = np.asarray(offsets, dtype=np.intp)
+
+        self.logger.debug(f"已预计算 {len(categories)} 个类别、{len(templates)} 条模板的向量")
+
+    @staticmethod
+    def _normalize(vectors):
+        """按行L2归一化（零向量保持为零）"""
+        import numpy as np
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
 
     def detect(self, text: str, threshold: float = 0.7) -> List[SemanticMatch]:
         """
@@ -176,22 +204,22 @@ class AIDetector:
 
         results = []
 
-        # 将文本分割成句子进行检测
-        sentences = self._split_sentences(text)
-
-        for sentence, start_pos in sentences:
-            if len(sentence.strip()) < 10:  # 跳过太短的句子
-                continue
-
-            # 根据模式进行分析
-            if self.model == "zero-shot":
-                detections = self._detect_zero_shot(sentence, threshold)
-            elif self.model == "similarity":
-                detections = self._detect_similarity(sentence, threshold)
-            else:
-                # 增强关键词模式
-                detections = self._detect_enhanced_keywords(sentence, threshold)
-
+        # 将文本分割成句子，跳过太短的句子
+        sentences = [(sentence, start_pos) for sentence, start_pos in self._split_sentences(text) if len(sentence.strip()) >= 10]
+        if not sentences:
+            return results
+
+        # 根据模式进行分析（模型模式下所有句子按批推理）
+        texts = [sentence for sentence, _ in sentences]
+        if self.model == "zero-shot":
+            batch_detections = self._detect_zero_shot(texts, threshold)
+        elif self.model == "similarity":
+            batch_detections = self._detect_similarity(texts, threshold)
+        else:
+            # 增强关键词模式
+            batch_detections = [self._detect_enhanced_keywords(sentence, threshold) for sentence in texts]
+
+        for (sentence, start_pos), detections in zip(sentences, batch_detections):
             # 添加位置信息
             for category, confidence in detections:
                 match = SemanticMatch(text=sentence, category=category, start=start_pos, end=start_pos + len(sentence), confidence=confidence)
@@ -200,62 +228,82 @@ class AIDetector:
 
         return results
 
-    def _detect_zero_shot(self, text: str, threshold: float) -> List[tuple]:
-        """使用零样本分类检测"""
+    def _detect_zero_shot(self, texts: List[str], threshold: float) -> List[List[tuple]]:
+        """
+        使用零样本分类批量检测
+        
+        Args:
+            texts: 句子列表
+            threshold: 置信度阈值
+        
+        Returns:
+            与输入句子一一对应的 (类别, 置信度) 列表
+        """
         if self.classifier is None:
-            return []
+            return [[] for _ in texts]
 
         try:
-            # 准备候选标签
+            # 准备候选标签，并将标签映射回类别键
             candidate_labels = [info['label'] for info in self.categories.values()]
+            label_to_key = {info['label']: key for key, info in self.categories.items()}
 
-            # 进行零样本分类
-            result = self.classifier(text, candidate_labels, multi_label=True)
+            # 按批进行零样本分类（单条输入时管道返回字典而不是列表）
+            results = self.classifier(texts, candidate_labels, multi_label=True, batch_size=self.batch_size)
+            if isinstance(results, dict):
+                results = [results]
 
             # 提取高置信度的类别
-            detections = []
-            for label, score in zip(result['labels'], result['scores']):
-                if score >= threshold:
-                    # 将标签映射回类别键
-                    for key, info in self.categories.items():
-                        if info['label'] == label:
-                            detections.append((key, float(score)))
-                            break
+            batch_detections = []
+            for result in results:
+                detections = []
+                for label, score in zip(result['labels'], result['scores']):
+                    if score >= threshold and label in label_to_key:
+                        detections.append((label_to_key[label], float(score)))
+                batch_detections.append(detections)
 
-            return detections
+            return batch_detections
 
         except Exception as e:
             self.logger.error(f"零样本分类出错: {e}")
-            return []
+            return [[] for _ in texts]
 
-    def _detect_similarity(self, text: str, threshold: float) -> List[tuple]:
-        """使用相似度匹配检测"""
-        if self.sentence_model is None or not self.template_embeddings:
-            return []
+    def _detect_similarity(self, texts: List[str], threshold: float) -> List[List[tuple]]:
+        """
+        使用相似度匹配批量检测
+        
+        Args:
+            texts: 句子列表
+            threshold: 相似度阈值
+        
+        Returns:
+            与输入句子一一对应的 (类别, 相似度) 列表
+        """
+        if self.sentence_model is None or self.template_matrix is None:
+            return [[] for _ in texts]
 
         try:
             import numpy as np
-            from sklearn.metrics.pairwise import cosine_similarity
-
-            # 计算文本向量
-            text_embedding = self.sentence_model.encode([text])[0]
 
-            detections = []
-            for category, template_embeddings in self.template_embeddings.items():
-                # 计算与所有模板的相似度
-                similarities = cosine_similarity(text_embedding.reshape(1, -1), template_embeddings)[0]
+            # 按批计算所有句子的向量并归一化
+            text_embeddings = self._normalize(np.asarray(self.sentence_model.encode(texts, batch_size=self.batch_size), dtype=np.float32))
 
-                # 取最大相似度
-                max_similarity = float(np.max(similarities))
+            # 一次矩阵乘法得到与所有模板的余弦相似度，再按类别取最大值
+            similarities = text_embeddings @ self.template_matrix.T
+            max_similarities = np.maximum.reduceat(similarities, self.template_offsets, axis=1)
 
-                if max_similarity >= threshold:
-                    detections.append((category, max_similarity))
+            batch_detections = []
+            for row in max_similarities:
+                detections = []
+                for category, max_similarity in zip(self.template_categories, row):
+                    if max_similarity >= threshold:
+                        detections.append((category, float(max_similarity)))
+                batch_detections.append(detections)
 
-            return detections
+            return batch_detections
 
         except Exception as e:
             self.logger.error(f"相似度计算出错: {e}")
-            return []
+            return [[] for _ in texts]
 
     def _detect_enhanced_keywords(self, text: str, threshold: float) -> List[tuple]:
         """增强的关键词检测（智能权重）"""
@@ -330,5 +378,6 @@ class AIDetector:
             'model_loaded': self.model is not None,
             'model_type': self.model if isinstance(self.model, str) else type(self.model).__name__,
             'use_gpu': self.use_gpu,
+            'batch_size': self.batch_size,
             'categories': list(self.categories.keys())
         }
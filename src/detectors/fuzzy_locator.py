@@ -0,0 +1,128 @@
+"""
+模糊定位
+当LLM输出的文本在原文中找不到时，根据其中的数字和词语在原文中定位最相似的片段
+"""
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+# 锚点：数字（包括金额、百分比等）、2个字符以上的中文词、3个字符以上的英文单词
+_NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?(?:[万亿千百]|%)?')
+_CHINESE_PATTERN = re.compile(r'[\u4e00-\u9fff]{2,}')
+_ENGLISH_PATTERN = re.compile(r'[a-zA-Z]{3,}')
+
+# 匹配窗口比LLM文本稍宽
+WINDOW_PADDING = 20
+
+# 边界外扩的字符数，尽量包含完整的词
+BOUNDARY_MARGIN = 5
+
+
+def extract_anchors(llm_text: str) -> List[str]:
+    """提取LLM文本中的锚点（保留重复项，每次出现都计分）"""
+    return _NUMBER_PATTERN.findall(llm_text) + _CHINESE_PATTERN.findall(llm_text) + _ENGLISH_PATTERN.findall(llm_text)
+
+
+def _find_all(text: str, word: str) -> List[int]:
+    """返回 word 在 text 中所有（可重叠的）出现位置"""
+    positions = []
+    pos = text.find(word)
+    while pos != -1:
+        positions.append(pos)
+        pos = text.find(word, pos + 1)
+    return positions
+
+
+def _best_window(anchors: List[str], original_text: str, window_size: int) -> Tuple[int, int]:
+    """
+    寻找包含锚点最多的窗口
+
+    锚点 kw 在位置 p 出现时，只有起点落在 [p + len(kw) - window_size, p] 的窗口包含它。
+    把每个锚点的这些区间合并后作为 +/- 事件扫描一遍，即可得到每个窗口起点的得分，
+    无需逐个窗口检查所有锚点。
+
+    Returns:
+        (最早的最高分窗口起点, 最高分)，没有窗口得分时返回 (-1, 0)
+    """
+    last_start = len(original_text) - window_size
+    if last_start < 0:
+        return -1, 0
+
+    events = {}
+    for anchor, weight in Counter(anchors).items():
+        if len(anchor) > window_size:
+            continue
+
+        # 合并该锚点各次出现对应的窗口起点区间（同一锚点在一个窗口内只计一次）
+        range_start = range_end = None
+        for pos in _find_all(original_text, anchor):
+            low = max(0, pos + len(anchor) - window_size)
+            high = min(pos, last_start)
+            if low > high:
+                continue
+            if range_end is not None and low <= range_end + 1:
+                range_end = max(range_end, high)
+                continue
+            if range_end is not None:
+                events[range_start] = events.get(range_start, 0) + weight
+                events[range_end + 1] = events.get(range_end + 1, 0) - weight
+            range_start, range_end = low, high
+
+        if range_end is not None:
+            events[range_start] = events.get(range_start, 0) + weight
+            events[range_end + 1] = events.get(range_end + 1, 0) - weight
+
+    best_start = -1
+    best_score = 0
+    score = 0
+    for position in sorted(events):
+        score += events[position]
+        if score > best_score and position <= last_start:
+            best_score = score
+            best_start = position
+
+    return best_start, best_score
+
+
+def fuzzy_locate(llm_text: str, original_text: str) -> Tuple[Optional[str], int, int, int, int]:
+    """
+    在原文中定位与LLM文本最相似的片段
+
+    Args:
+        llm_text: LLM输出的敏感文本
+        original_text: 原始文本
+
+    Returns:
+        (匹配的文本, 起始位置, 结束位置, 命中锚点数, 锚点总数)，未找到时文本为None、位置为-1
+    """
+    anchors = extract_anchors(llm_text)
+    if not anchors:
+        return None, -1, -1, 0, 0
+
+    window_size = len(llm_text) + WINDOW_PADDING
+    best_start, best_score = _best_window(anchors, original_text, window_size)
+
+    # 至少包含一半锚点才认为匹配成功
+    if best_start == -1 or best_score < len(anchors) / 2:
+        return None, -1, -1, best_score, len(anchors)
+
+    best_match = original_text[best_start:best_start + window_size]
+
+    # 优化边界：缩小到第一个和最后一个锚点之间
+    first_kw_pos = len(best_match)
+    last_kw_pos = 0
+    for anchor in anchors:
+        pos = best_match.find(anchor)
+        if pos != -1:
+            first_kw_pos = min(first_kw_pos, pos)
+            last_kw_pos = max(last_kw_pos, pos + len(anchor))
+
+    # 稍微扩展边界，包含完整的词
+    start_offset = max(0, first_kw_pos - BOUNDARY_MARGIN)
+    end_offset = min(len(best_match), last_kw_pos + BOUNDARY_MARGIN)
+
+    optimized_match = best_match[start_offset:end_offset].strip()
+    optimized_start = best_start + start_offset
+    optimized_end = optimized_start + len(optimized_match)
+
+    return optimized_match, optimized_start, optimized_end, best_score, len(anchors)
@@ -0,0 +1,80 @@
+"""
+HTTP连接池
+为LLM检测器提供可在多线程间共享的长连接会话
+"""
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+class PooledSession:
+    """线程安全的长连接HTTP会话（按需创建，复用TCP/TLS连接）"""
+
+    def __init__(self, http_config: Optional[Dict[str, Any]] = None, default_read_timeout: float = 60.0):
+        """
+        初始化连接池配置
+
+        Args:
+            http_config: HTTP配置，支持 pool_size / keep_alive / connect_timeout / read_timeout / max_retries
+            default_read_timeout: 未配置 read_timeout 时使用的读取超时（秒）
+        """
+        self.logger = logging.getLogger(__name__)
+        config = http_config or {}
+
+        self.pool_size = max(1, int(config.get('pool_size', 10)))  # 每个主机保持的最大连接数
+        self.keep_alive = bool(config.get('keep_alive', True))  # 是否保持长连接
+        self.connect_timeout = float(config.get('connect_timeout', 5))  # 连接超时（秒）
+        self.read_timeout = float(config.get('read_timeout', default_read_timeout))  # 读取超时（秒）
+        self.max_retries = int(config.get('max_retries', 0))  # 连接失败时的重试次数
+
+        self._session = None
+        self._pid = None  # 创建会话的进程（fork后的子进程不能复用父进程的连接）
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """(连接超时, 读取超时)"""
+        return self.connect_timeout, self.read_timeout
+
+    def get_session(self):
+        """获取共享的 requests.Session（首次调用时或fork后的子进程中创建）"""
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self._create_session()
+                    self._pid = os.getpid()
+        return self._session
+
+    def _create_session(self):
+        """创建带连接池的会话"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=self.max_retries, pool_block=False)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+
+        self.logger.debug(f"创建HTTP连接池: pool_size={self.pool_size}, keep_alive={self.keep_alive}, timeout={self.timeout}")
+        return session
+
+    def post(self, url: str, **kwargs):
+        """发送POST请求（未指定超时时使用默认超时）"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.get_session().post(url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        """发送GET请求（未指定超时时使用默认超时）"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.get_session().get(url, **kwargs)
+
+    def close(self):
+        """关闭会话及其连接"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
@@ -0,0 +1,99 @@
+"""
+增量JSON解析
+在LLM流式输出过程中解析 {"detections":[...]}，每个检测项闭合后立即产出
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+
+class DetectionStreamParser:
+    """
+    检测结果的增量解析器
+
+    依次喂入模型输出的文本片段，跟踪括号层级和字符串状态：
+    - 数组中的对象一旦闭合即解析并返回
+    - 根节点闭合后标记完成，调用方可据此停止生成
+    根节点之前的内容（如 ```json 标记或说明文字）会被忽略。
+    """
+
+    def __init__(self):
+        self._text = ""  # 已接收的全部文本
+        self._pos = 0  # 下一个待扫描字符的位置
+        self._stack: List[str] = []  # 当前嵌套的容器（'{' 或 '['）
+        self._item_starts: List[Optional[int]] = []  # 与 _stack 对应：数组元素对象的起始位置
+        self._in_string = False
+        self._escape = False
+        self._root_end = -1  # 根节点结束位置
+        self.done = False  # 根节点是否已闭合
+
+    @property
+    def content(self) -> str:
+        """已接收的文本（根节点闭合后截止到根节点末尾）"""
+        return self._text[:self._root_end] if self.done else self._text
+
+    def feed(self, fragment: str) -> List[Dict[str, Any]]:
+        """
+        喂入一段文本
+
+        Args:
+            fragment: 模型新输出的文本片段
+
+        Returns:
+            本次新闭合的检测项（字典）列表
+        """
+        if self.done or not fragment:
+            return []
+
+        self._text += fragment
+        text = self._text
+        items = []
+
+        for i in range(self._pos, len(text)):
+            char = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if not self._stack and char not in '{[':
+                continue  # 根节点之前的内容
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                is_item = char == '{' and bool(self._stack) and self._stack[-1] == '['
+                self._stack.append(char)
+                self._item_starts.append(i if is_item else None)
+            elif char in '}]':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                item_start = self._item_starts.pop()
+
+                if item_start is not None:
+                    item = self._load(text[item_start:i + 1])
+                    if item is not None:
+                        items.append(item)
+
+                if not self._stack:
+                    self.done = True
+                    self._root_end = i + 1
+                    self._pos = i + 1
+                    return items
+
+        self._pos = len(text)
+        return items
+
+    @staticmethod
+    def _load(item_text: str) -> Optional[Dict[str, Any]]:
+        """解析单个检测项，格式错误时忽略"""
+        try:
+            item = json.loads(item_text)
+        except json.JSONDecodeError:
+            return None
+        return item if isinstance(item, dict) else None
@@ -6,6 +6,9 @@ import logging
 from typing import List, Dict
 from dataclasses import dataclass
 
+from .aho_corasick import AhoCorasickAutomaton
+from .overlap import remove_overlaps
+
 
 @dataclass
 class KeywordMatch:
@@ -43,7 +46,7 @@ class KeywordDetector:
         self._init_context_booster()
 
     def _build_keyword_index(self):
-        """构建关键词索引"""
+        """构建关键词索引及多模式匹配自动机"""
         self.keyword_index = {}
         for category, keywords in self.keywords_dict.items():
             if keywords:
@@ -51,6 +54,8 @@ class KeywordDetector:
                     if keyword and isinstance(keyword, str):
                         self.keyword_index[keyword.lower()] = category
 
+        self.automaton = AhoCorasickAutomaton(self.keyword_index)
+
         self.logger.info(f"已加载 {len(self.keyword_index)} 个敏感关键词")
 
     def _init_context_booster(self):
@@ -76,25 +81,27 @@ class KeywordDetector:
         results = []
         text_lower = text.lower()
 
-        for keyword, category in self.keyword_index.items():
-            # 查找所有出现的位置
-            start = 0
-            while True:
-                pos = text_lower.find(keyword, start)
-                if pos == -1:
-                    break
+        # 同一关键词的出现位置互不重叠（与逐词 find 的语义一致）
+        last_end = {}
+
+        # 自动机一次扫描找出所有关键词
+        for pos, end, keyword in self.automaton.iter_matches(text_lower):
+            if pos < last_end.get(keyword, 0):
+                continue
+            last_end[keyword] = end
+
+            category = self.keyword_index[keyword]
 
-                # 获取上下文
-                context = self._get_context(text, pos, len(keyword))
+            # 获取上下文
+            context = self._get_context(text, pos, len(keyword))
 
-                # 计算动态置信度
-                confidence = self._calculate_confidence(keyword, category, context)
+            # 计算动态置信度
+            confidence = self._calculate_confidence(keyword, category, context)
 
-                match = KeywordMatch(keyword=keyword, category=category, start=pos, end=pos + len(keyword), confidence=confidence, context=context)
-                results.append(match)
+            match = KeywordMatch(keyword=keyword, category=category, start=pos, end=end, confidence=confidence, context=context)
+            results.append(match)
 
-                self.logger.debug(f"检测到敏感词 [{category}]: {keyword} (置信度: {confidence:.2f})")
-                start = pos + len(keyword)
+            self.logger.debug(f"检测到敏感词 [{category}]: {keyword} (置信度: {confidence:.2f})")
 
         # 去重和排序
         results = self._deduplicate_matches(results)
@@ -153,25 +160,7 @@ class KeywordDetector:
             return matches
 
         # 按起始位置和长度排序（优先保留更长的匹配）
-        sorted_matches = sorted(matches, key=lambda x: (x.start, -(x.end - x.start)))
-
-        filtered = []
-        for match in sorted_matches:
-            # 检查是否与已有匹配重叠
-            overlaps = False
-            for existing in filtered:
-                if self._is_overlap(match, existing):
-                    overlaps = True
-                    break
-
-            if not overlaps:
-                filtered.append(match)
-
-        return filtered
-
-    def _is_overlap(self, m1: KeywordMatch, m2: KeywordMatch) -> bool:
-        """判断两个匹配是否重叠"""
-        return not (m1.end <= m2.start or m1.start >= m2.end)
+        return remove_overlaps(matches, sort_key=lambda x: (x.start, -(x.end - x.start)))
 
     def add_keywords(self, category: str, keywords: List[str]):
         """
@@ -186,9 +175,11 @@ class KeywordDetector:
 
         self.keywords_dict[category].extend(keywords)
 
-        # 更新索引
+        # 更新索引和自动机
         for keyword in keywords:
             if keyword and isinstance(keyword, str):
                 self.keyword_index[keyword.lower()] = category
+                self.automaton.add(keyword.lower())
+        self.automaton.build()
 
         self.logger.info(f"添加了 {len(keywords)} 个关键词到分类 {category}")
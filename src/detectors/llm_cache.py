@@ -0,0 +1,223 @@
+"""
+LLM检测结果缓存
+基于SQLite的持久化缓存，按内容哈希复用LLM响应，可在多个进程间共享
+"""
+import atexit
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# 命中/未命中计数和访问时间先记在内存中，累计到该次数或距上次写入超过该时间（秒）后批量写入
+STATS_FLUSH_EVERY = 100
+STATS_FLUSH_INTERVAL = 5.0
+
+
+class LLMResultCache:
+    """内容寻址的LLM响应缓存（SQLite，支持TTL和容量淘汰）"""
+
+    def __init__(self, path: str, max_entries: int = 10000, max_size_mb: float = 100, ttl_seconds: float = 7 * 24 * 3600):
+        """
+        初始化缓存
+
+        Args:
+            path: SQLite数据库文件路径
+            max_entries: 最大缓存条数
+            max_size_mb: 缓存内容总大小上限（MB）
+            ttl_seconds: 缓存有效期（秒），<=0 表示永不过期
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = str(path)
+        self.max_entries = max(1, int(max_entries))
+        self.max_size_bytes = int(float(max_size_mb) * 1024 * 1024)
+        self.ttl_seconds = float(ttl_seconds)
+
+        # 每个线程（以及fork后的每个进程）使用独立的连接
+        self._local = threading.local()
+
+        # 读取时不写数据库：统计和访问时间在内存中累计，批量写入
+        self._pending_lock = threading.Lock()
+        self._pending_hits = 0
+        self._pending_misses = 0
+        self._touched: Dict[str, float] = {}  # 命中的键 -> 最近访问时间
+        self._last_flush = time.monotonic()
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._init_schema()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt_version: str, text: str) -> str:
+        """
+        生成缓存键：提供商、模型、提示词版本和文本的SHA-256
+
+        Args:
+            provider: 提供商（如 ollama / zhipu）
+            model: 模型名称
+            prompt_version: 提示词模板版本
+            text: 待检测文本
+        """
+        digest = hashlib.sha256()
+        for part in (provider, model, prompt_version, text):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程/进程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        """创建缓存表"""
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                     'key TEXT PRIMARY KEY, content TEXT NOT NULL, size INTEGER NOT NULL, '
+                     'created_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)')
+        conn.execute('CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        conn.execute("INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0), ('evictions', 0)")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存的LLM响应（只读查询，不阻塞其他读取方；过期条目在写入时淘汰）
+
+        Returns:
+            缓存的原始响应，未命中或已过期时返回None
+        """
+        try:
+            now = time.time()
+            row = self._connect().execute('SELECT content, created_at FROM entries WHERE key = ?', (key, )).fetchone()
+        except sqlite3.Error as e:
+            self.logger.warning(f"读取LLM缓存失败: {e}")
+            return None
+
+        if row is not None and self.ttl_seconds > 0 and now - row[1] > self.ttl_seconds:
+            row = None
+
+        with self._pending_lock:
+            if row is None:
+                self._pending_misses += 1
+            else:
+                self._pending_hits += 1
+                self._touched[key] = now
+            due = (self._pending_hits + self._pending_misses >= STATS_FLUSH_EVERY or time.monotonic() - self._last_flush >= STATS_FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+        return row[0] if row is not None else None
+
+    def _take_pending(self) -> tuple:
+        """取出内存中累计的 (命中次数, 未命中次数, 访问时间)"""
+        with self._pending_lock:
+            pending = (self._pending_hits, self._pending_misses, self._touched)
+            self._pending_hits = self._pending_misses = 0
+            self._touched = {}
+            self._last_flush = time.monotonic()
+        return pending
+
+    def _write_pending(self, conn: sqlite3.Connection, pending: tuple):
+        """在当前事务中写入累计的统计和访问时间"""
+        hits, misses, touched = pending
+        if hits or misses:
+            conn.executemany("UPDATE stats SET value = value + ? WHERE name = ?", ((hits, 'hits'), (misses, 'misses')))
+        if touched:
+            conn.executemany('UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE key = ?', [(accessed, key) for key, accessed in touched.items()])
+
+    def flush(self):
+        """把内存中累计的命中/未命中计数和访问时间写入数据库（一次事务）"""
+        pending = self._take_pending()
+        if not any(pending):
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                self._write_pending(conn, pending)
+        except sqlite3.Error as e:
+            self.logger.warning(f"写入LLM缓存统计失败: {e}")
+
+    def set(self, key: str, content: str):
+        """写入LLM响应，并按TTL和容量淘汰旧条目"""
+        try:
+            conn = self._connect()
+            now = time.time()
+            size = len(content.encode('utf-8'))
+
+            # 顺带写入累计的统计，淘汰时使用最新的访问时间
+            pending = self._take_pending()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                self._write_pending(conn, pending)
+                conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)', (key, content, size, now, now))
+                self._evict(conn, now)
+
+        except sqlite3.Error as e:
+            self.logger.warning(f"写入LLM缓存失败: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """淘汰过期条目，以及超出条数/大小上限的最久未访问条目"""
+        evicted = 0
+        if self.ttl_seconds > 0:
+            evicted += conn.execute('DELETE FROM entries WHERE created_at < ?', (now - self.ttl_seconds, )).rowcount
+
+        count, total_size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        if count > self.max_entries or total_size > self.max_size_bytes:
+            over_size = total_size - self.max_size_bytes
+            freed = 0
+            keys = []
+            for key, size in conn.execute('SELECT key, size FROM entries ORDER BY accessed_at'):
+                if count - len(keys) <= self.max_entries and freed >= over_size:
+                    break
+                keys.append(key)
+                freed += size
+            conn.executemany('DELETE FROM entries WHERE key = ?', [(key, ) for key in keys])
+            evicted += len(keys)
+
+        if evicted:
+            conn.execute("UPDATE stats SET value = value + ? WHERE name = 'evictions'", (evicted, ))
+            self.logger.debug(f"LLM缓存淘汰 {evicted} 条")
+
+    def clear(self):
+        """清空缓存及统计"""
+        self._take_pending()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('DELETE FROM entries')
+                conn.execute('UPDATE stats SET value = 0')
+        except sqlite3.Error as e:
+            self.logger.warning(f"清空LLM缓存失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计（命中/未命中次数为所有进程累计值，其他进程尚未批量写入的部分不计入）"""
+        self.flush()
+        try:
+            conn = self._connect()
+            stats = dict(conn.execute('SELECT name, value FROM stats').fetchall())
+            entries, total_size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        except sqlite3.Error as e:
+            self.logger.warning(f"读取LLM缓存统计失败: {e}")
+            return {}
+
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        return {
+            'path': self.path,
+            'entries': entries,
+            'size_bytes': total_size,
+            'hits': stats.get('hits', 0),
+            'misses': stats.get('misses', 0),
+            'evictions': stats.get('evictions', 0),
+            'hit_ratio': stats.get('hits', 0) / lookups if lookups else 0.0
+        }
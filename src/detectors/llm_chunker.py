@@ -0,0 +1,153 @@
+"""
+长文本分块
+按段落/句子边界将长文本切分为带重叠的块，供LLM检测器并行处理
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Callable, List, Optional, Tuple
+
+from .overlap import IntervalSweep
+
+# 句子/段落边界（与AI检测器的断句规则一致，并把单个换行也视为边界）
+_UNIT_PATTERN = re.compile(r'[^。！？；.!?;\n]*(?:[。！？；.!?;]+\s*|\n+|$)')
+
+# CJK字符（大致每个字符对应一个token）
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+@dataclass
+class TextChunk:
+    """文本块"""
+    text: str  # 块内容
+    start: int  # 在原文中的起始位置
+    end: int  # 在原文中的结束位置
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：CJK字符按1个token，其余字符按4个字符1个token"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class TextChunker:
+    """按token预算切分文本，相邻块之间保留一定重叠"""
+
+    def __init__(self, max_tokens: int = 1500, overlap_tokens: int = 100):
+        """
+        初始化分块器
+
+        Args:
+            max_tokens: 每块的token预算
+            overlap_tokens: 相邻块之间重叠的token数
+        """
+        self.max_tokens = max(1, int(max_tokens))
+        self.overlap_tokens = max(0, min(int(overlap_tokens), self.max_tokens // 2))
+
+    def split(self, text: str) -> List[TextChunk]:
+        """
+        切分文本
+
+        Args:
+            text: 原始文本
+
+        Returns:
+            文本块列表（文本未超出预算时只有一块）
+        """
+        if estimate_tokens(text) <= self.max_tokens:
+            return [TextChunk(text=text, start=0, end=len(text))]
+
+        units = self._split_units(text)
+        chunks = []
+        i = 0
+        while i < len(units):
+            # 尽量多地装入完整的句子
+            budget = self.max_tokens
+            j = i
+            while j < len(units) and units[j][2] <= budget:
+                budget -= units[j][2]
+                j += 1
+            if j == i:
+                j = i + 1  # 单句仍超出预算时单独成块
+
+            start, end = units[i][0], units[j - 1][1]
+            chunks.append(TextChunk(text=text[start:end], start=start, end=end))
+            if j >= len(units):
+                break
+
+            # 下一块从末尾若干句开始，形成重叠
+            overlap = 0
+            next_i = j
+            while next_i - 1 > i and overlap + units[next_i - 1][2] <= self.overlap_tokens:
+                next_i -= 1
+                overlap += units[next_i][2]
+            i = next_i
+
+        return chunks
+
+    def _split_units(self, text: str) -> List[tuple]:
+        """切分为 (起始, 结束, token数) 的句子单元，超长句子按字符硬切"""
+        units = []
+        for match in _UNIT_PATTERN.finditer(text):
+            start, end = match.span()
+            if start == end:
+                continue
+
+            tokens = estimate_tokens(text[start:end])
+            if tokens <= self.max_tokens:
+                units.append((start, end, tokens))
+                continue
+
+            # 超长句子：按预算对应的字符数切分
+            step = max(1, (end - start) * self.max_tokens // tokens)
+            for piece_start in range(start, end, step):
+                piece_end = min(end, piece_start + step)
+                units.append((piece_start, piece_end, estimate_tokens(text[piece_start:piece_end])))
+
+        return units
+
+
+def merge_chunk_matches(matches: List[Any]) -> List[Any]:
+    """
+    合并各块的检测结果：重叠区域中同一类别的重复结果只保留一次
+
+    Args:
+        matches: 已换算为原文位置的结果（需具备 start / end / category 属性）
+
+    Returns:
+        去重后的结果列表（按位置排序）
+    """
+    sweep = IntervalSweep()
+    for match in sorted(matches, key=lambda x: (x.start, -(x.end - x.start))):
+        duplicated = any(existing.category == match.category and existing.start <= match.start and match.end <= existing.end for _, existing in sweep.overlapping(match))
+        if not duplicated:
+            sweep.add(match)
+    return sweep.items
+
+
+def detect_chunks(chunks: List[TextChunk], request: Callable[[TextChunk], Optional[str]], parse: Callable[[str, str], List[Any]], max_parallel: int = 4) -> Tuple[List[Any], List[str]]:
+    """
+    并行检测各文本块，并把结果位置换算回原文
+
+    Args:
+        chunks: 文本块列表
+        request: 请求函数，输入文本块，返回LLM原始响应（失败时返回None）
+        parse: 解析函数，输入 (原始响应, 块文本)，返回块内位置的检测结果
+        max_parallel: 最大并发请求数
+
+    Returns:
+        (合并后的检测结果, 各块的原始响应)
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(chunks)))) as pool:
+        contents = list(pool.map(request, chunks))
+
+    matches = []
+    responses = []
+    for chunk, content in zip(chunks, contents):
+        if content is None:
+            continue
+        responses.append(content)
+        for match in parse(content, chunk.text):
+            matches.append(replace(match, start=match.start + chunk.start, end=match.end + chunk.start))
+
+    return merge_chunk_matches(matches), responses
@@ -6,9 +6,15 @@ import logging
 import json
 import re
 import time
-from typing import List, Dict
+from typing import List, Dict, Any, Callable, Iterator, Optional, Set, Tuple
 from dataclasses import dataclass
 
+from .http_session import PooledSession
+from .llm_cache import LLMResultCache
+from .llm_chunker import TextChunk, TextChunker, detect_chunks
+from .fuzzy_locator import fuzzy_locate
+from .json_stream import DetectionStreamParser
+
 
 @dataclass
 class LLMMatch:
@@ -24,28 +30,54 @@ class LLMMatch:
 class LLMDetector:
     """基于Ollama本地大语言模型的检测器"""
 
-    def __init__(self, model: str = "qwen2:7b", base_url: str = "http://localhost:11434"):
+    # 提示词模板版本（修改 _build_prompt 时需同步更新，使旧缓存失效）
+    PROMPT_VERSION = '1'
+
+    def __init__(self,
+                 model: str = "qwen2:7b",
+                 base_url: str = "http://localhost:11434",
+                 http_config: Optional[Dict[str, Any]] = None,
+                 cache: Optional[LLMResultCache] = None,
+                 chunk_config: Optional[Dict[str, Any]] = None,
+                 stream: bool = True):
         """
         初始化LLM检测器
         
         Args:
             model: Ollama模型名称 (如 qwen2:7b, llama3:8b)
             base_url: Ollama服务地址
+            http_config: HTTP连接池配置（连接池大小、长连接、超时等）
+            cache: LLM响应缓存（可选）
+            chunk_config: 长文本分块配置（max_tokens / overlap_tokens / max_parallel）
+            stream: 是否使用流式输出（JSON完整后立即停止生成，默认开启）
         """
         self.logger = logging.getLogger(__name__)
         self.model = model
         self.base_url = base_url.rstrip('/')
         self.last_raw_response = ""  # 保存最后一次原始响应，用于调试
 
+        # 长连接会话（本地模型生成较慢，默认读取超时更长）
+        self.http = PooledSession(http_config, default_read_timeout=120)
+        self.cache = cache
+
+        # 长文本分块（输出长度有限，整篇送入容易被截断）
+        chunk_config = chunk_config or {}
+        self.chunker = TextChunker(chunk_config.get('max_tokens', 1500), chunk_config.get('overlap_tokens', 100)) if chunk_config.get('enable', True) else None
+        self.max_parallel_chunks = int(chunk_config.get('max_parallel', 4))
+
+        self.stream = stream
+
         self.logger.info(f"初始化LLM检测器: Ollama/{self.model}")
 
-    def detect(self, text: str, threshold: float = 0.7) -> List[LLMMatch]:
+    def detect(self, text: str, threshold: float = 0.7, on_match: Optional[Callable[[LLMMatch], None]] = None) -> List[LLMMatch]:
         """
         使用本地LLM检测敏感信息
         
         Args:
             text: 待检测文本
             threshold: 置信度阈值
+            on_match: 每得到一个检测结果即调用（流式输出时检测项闭合后立即调用，其余结果在检测结束时调用；
+                      分块检测时块重叠处的结果可能回调两次，以返回值为准）
             
         Returns:
             检测结果列表
@@ -57,7 +89,7 @@ class LLMDetector:
             start_time = time.time()
             self.logger.info(f"开始LLM检测 (模型: {self.model})...")
 
-            results = self._detect_ollama(text, threshold)
+            results = self._detect_ollama(text, threshold, on_match)
 
             elapsed_time = time.time() - start_time
             self.logger.info(f"LLM检测完成，耗时: {elapsed_time:.2f}秒，检测到 {len(results)} 项")
@@ -95,48 +127,167 @@ class LLMDetector:
 
 只返回JSON，不要包含其他解释。需严格遵守JSON格式，注意检查括号成对。"""
 
-    def _detect_ollama(self, text: str, threshold: float) -> List[LLMMatch]:
-        """使用Ollama本地模型检测"""
-        try:
-            import requests
+    def _detect_ollama(self, text: str, threshold: float, on_match: Optional[Callable[[LLMMatch], None]] = None) -> List[LLMMatch]:
+        """使用Ollama本地模型检测（长文本分块并行检测）"""
+        reported: Set[Tuple[int, int, str]] = set()  # 流式输出过程中已回调的结果 (起始位置, 结束位置, 类别)
+
+        def request(chunk: TextChunk) -> Optional[str]:
+            on_item = None
+            if on_match is not None:
+                on_item = lambda det: self._report_item(det, chunk, threshold, on_match, reported)
+            return self._request_ollama(chunk.text, on_item)
+
+        chunks = self.chunker.split(text) if self.chunker else []
+        if len(chunks) > 1:
+            self.logger.info(f"文本较长，分为 {len(chunks)} 块并行检测")
+            matches, responses = detect_chunks(chunks,
+                                               request,
+                                               lambda content, chunk_text: self._parse_response(content, chunk_text, threshold),
+                                               max_parallel=self.max_parallel_chunks)
+            self.last_raw_response = '\n'.join(responses)
+        else:
+            content = request(TextChunk(text=text, start=0, end=len(text)))
+            if content is None:
+                return []
+            self.last_raw_response = content  # 保存原始响应
+            matches = self._parse_response(content, text, threshold)
 
-            # API端点
-            url = f"{self.base_url}/api/generate"
-
-            # 调用API（优化参数以提升速度）
-            self.logger.debug("正在调用Ollama API...")
-            response = requests.post(
-                url,
-                json={
-                    'model': self.model,
-                    'prompt': self._build_prompt(text),
-                    'stream': False,
-                    'options': {
-                        'temperature': 0.1,  # 低温度，更确定性
-                        'top_p': 0.9,  # 降低随机性
-                        'num_predict': 512,  # 限制最大输出token（加速）
-                        # 'stop': ['}}\n\n']  # 只在JSON结束后停止
-                    }
-                })
+        # 缓存命中、非流式调用等未在过程中回调的结果
+        if on_match is not None:
+            for match in matches:
+                if (match.start, match.end, match.category) not in reported:
+                    self._notify(on_match, match)
+        return matches
 
+    def _report_item(self, det: Any, chunk: TextChunk, threshold: float, on_match: Callable[[LLMMatch], None], reported: Set[Tuple[int, int, str]]):
+        """流式输出中一个检测项闭合：定位原文位置并立即回调"""
+        try:
+            match = self._build_match(det, chunk.text, threshold)
+        except (TypeError, ValueError) as e:
+            self.logger.warning(f"忽略格式错误的检测项: {e}")
+            return
+        if match is None:
+            return
+        if chunk.start:
+            match.start += chunk.start
+            match.end += chunk.start
+        reported.add((match.start, match.end, match.category))
+        self._notify(on_match, match)
+
+    def _notify(self, on_match: Callable[[LLMMatch], None], match: LLMMatch):
+        """调用结果回调（回调出错不影响检测）"""
+        try:
+            on_match(match)
+        except Exception as e:
+            self.logger.warning(f"检测结果回调出错: {e}")
+
+    def _build_payload(self, text: str, stream: bool) -> Dict[str, Any]:
+        """构建Ollama请求参数"""
+        return {
+            'model': self.model,
+            'prompt': self._build_prompt(text),
+            'stream': stream,
+            'options': {
+                'temperature': 0.1,  # 低温度，更确定性
+                'top_p': 0.9,  # 降低随机性
+                'num_predict': 512,  # 限制最大输出token（加速）
+            }
+        }
+
+    def _stream_ollama(self, text: str, parser: DetectionStreamParser) -> Iterator[Dict[str, Any]]:
+        """
+        以流式方式调用Ollama，边接收边解析
+        
+        JSON根节点闭合后立即断开连接，Ollama随之停止生成后续无用的文本。
+        
+        Args:
+            text: 待检测文本
+            parser: 增量解析器（调用结束后可从中取得原始响应）
+            
+        Yields:
+            每个刚闭合的检测项（字典）
+        """
+        url = f"{self.base_url}/api/generate"
+        self.logger.debug("正在以流式方式调用Ollama API...")
+        response = self.http.post(url, json=self._build_payload(text, stream=True), stream=True)
+        try:
             response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                yield from parser.feed(chunk.get('response', ''))
+
+                if parser.done:
+                    self.logger.debug("JSON已完整，停止生成")
+                    break
+                if chunk.get('done'):
+                    break
+        finally:
+            response.close()
+
+    def _request_ollama(self, text: str, on_item: Optional[Callable[[Dict[str, Any]], None]] = None) -> Optional[str]:
+        """
+        调用Ollama生成检测结果
+        
+        Args:
+            text: 待检测文本
+            on_item: 流式输出中每个检测项闭合时调用（参数为检测项字典）
+            
+        Returns:
+            LLM原始响应，调用失败时返回None
+        """
+        try:
+            # 相同文本直接复用缓存的响应
+            cache_key = LLMResultCache.make_key('ollama', self.model, self.PROMPT_VERSION, text)
+            cached = self.cache.get(cache_key) if self.cache else None
+            if cached is not None:
+                self.logger.debug("LLM缓存命中")
+                return cached
+
+            if self.stream:
+                # 流式调用，JSON完整后即停止生成
+                parser = DetectionStreamParser()
+                for det in self._stream_ollama(text, parser):
+                    if on_item is not None:
+                        on_item(det)
+                content = parser.content.strip()
+                complete = parser.done
+            else:
+                # 调用API（优化参数以提升速度）
+                self.logger.debug("正在调用Ollama API...")
+                response = self.http.post(f"{self.base_url}/api/generate", json=self._build_payload(text, stream=False))
+                response.raise_for_status()
+                content = response.json().get('response', '').strip()
+                complete = True
 
-            # 解析结果
-            content = response.json().get('response', '').strip()
-            self.last_raw_response = content  # 保存原始响应
             self.logger.debug(f"LLM原始响应: {content[:200]}...")
-            return self._parse_response(content, text, threshold)
+            # 流式输出在JSON闭合前结束（被截断或连接中断）时不缓存，下次重新请求
+            if self.cache and content and complete:
+                self.cache.set(cache_key, content)
+            elif not complete:
+                self.logger.warning("LLM流式输出未完整结束，本次结果不缓存")
+            return content
+
+        except Exception as e:
+            self._log_request_error(e)
+            return None
 
+    def _log_request_error(self, error: Exception):
+        """记录Ollama调用错误"""
+        try:
+            import requests
         except ImportError:
             self.logger.error("请安装 requests 库: pip install requests")
-            return []
-        except requests.exceptions.ConnectionError:
+            return
+
+        if isinstance(error, requests.exceptions.ConnectionError):
             self.logger.error("无法连接到Ollama服务，请确保Ollama已启动")
             self.logger.info("启动方法: 在终端运行 'ollama serve' 或 Ollama应用会自动启动服务")
-            return []
-        except Exception as e:
-            self.logger.error(f"Ollama API调用失败: {e}")
-            return []
+        elif isinstance(error, requests.exceptions.Timeout):
+            self.logger.error(f"Ollama API请求超时 (连接/读取超时: {self.http.timeout})")
+        else:
+            self.logger.error(f"Ollama API调用失败: {error}")
 
     def _parse_response(self, content: str, original_text: str, threshold: float) -> List[LLMMatch]:
         """
@@ -179,39 +330,9 @@ class LLMDetector:
                 return []
 
             for det in detections:
-                if not isinstance(det, dict):
-                    continue
-
-                # confidence 字段可选，默认 0.8（只要LLM返回就认为检测到）
-                confidence = float(det.get('confidence', 0.8))
-
-                if confidence >= threshold:
-                    sensitive_text = det.get('text', '')
-
-                    if not sensitive_text:
-                        continue
-
-                    # 在原文中查找位置（精确匹配）
-                    start = original_text.find(sensitive_text)
-                    end = start + len(sensitive_text) if start != -1 else -1
-
-                    # 如果直接找不到，尝试模糊匹配
-                    if start == -1:
-                        matched_text, match_start, match_end = self._fuzzy_match(sensitive_text, original_text)
-                        if matched_text:
-                            sensitive_text = matched_text
-                            start = match_start
-                            end = match_end
-                            self.logger.debug(f"使用模糊匹配: '{sensitive_text[:30]}...'")
-
-                    if start != -1 and end != -1:
-                        match = LLMMatch(text=sensitive_text, category=det.get('category', 'unknown'), start=start, end=end, confidence=confidence, reason=det.get('reason', 'LLM检测'))
-                        matches.append(match)
-
-                        self.logger.debug(f"LLM检测到: [{match.category}] {match.text[:30]}... "
-                                          f"(置信度: {match.confidence:.2f}, 位置: {start}-{end})")
-                    else:
-                        self.logger.warning(f"⚠️ 无法在原文中定位敏感内容: '{sensitive_text[:50]}...'")
+                match = self._build_match(det, original_text, threshold)
+                if match:
+                    matches.append(match)
 
             return matches
 
@@ -224,14 +345,58 @@ class LLMDetector:
             self.logger.debug(f"详细错误: {type(e).__name__}: {str(e)}")
             return []
 
+    def _build_match(self, det: Any, original_text: str, threshold: float) -> Optional[LLMMatch]:
+        """
+        将单个检测项转换为LLMMatch（定位原文位置）
+        
+        Args:
+            det: LLM返回的检测项
+            original_text: 原始文本
+            threshold: 置信度阈值
+            
+        Returns:
+            检测结果，低于阈值或无法定位时返回None
+        """
+        if not isinstance(det, dict):
+            return None
+
+        # confidence 字段可选，默认 0.8（只要LLM返回就认为检测到）
+        confidence = float(det.get('confidence', 0.8))
+        if confidence < threshold:
+            return None
+
+        sensitive_text = det.get('text', '')
+        if not sensitive_text:
+            return None
+
+        # 在原文中查找位置（精确匹配）
+        start = original_text.find(sensitive_text)
+        end = start + len(sensitive_text) if start != -1 else -1
+
+        # 如果直接找不到，尝试模糊匹配
+        if start == -1:
+            matched_text, match_start, match_end = self._fuzzy_match(sensitive_text, original_text)
+            if matched_text:
+                sensitive_text = matched_text
+                start = match_start
+                end = match_end
+                self.logger.debug(f"使用模糊匹配: '{sensitive_text[:30]}...'")
+
+        if start == -1 or end == -1:
+            self.logger.warning(f"⚠️ 无法在原文中定位敏感内容: '{sensitive_text[:50]}...'")
+            return None
+
+        match = LLMMatch(text=sensitive_text, category=det.get('category', 'unknown'), start=start, end=end, confidence=confidence, reason=det.get('reason', 'LLM检测'))
+        self.logger.debug(f"LLM检测到: [{match.category}] {match.text[:30]}... "
+                          f"(置信度: {match.confidence:.2f}, 位置: {start}-{end})")
+        return match
+
     def _fuzzy_match(self, llm_text: str, original_text: str) -> tuple:
         """
         模糊匹配：当LLM输出的文本在原文中找不到时，尝试找到相似的片段
         
-        策略：
-        1. 提取数字和关键词
-        2. 在原文中查找包含这些关键信息的片段
-        3. 返回最匹配的原文片段
+        先为LLM文本中的数字和关键词建立在原文中的位置索引，只在锚点附近为候选窗口计分，
+        避免在整个原文上滑动窗口。
         
         Args:
             llm_text: LLM输出的敏感文本
@@ -240,77 +405,16 @@ class LLMDetector:
         Returns:
             (匹配的文本, 起始位置, 结束位置) 或 (None, -1, -1)
         """
-        import re
-
-        # 提取数字（包括金额、百分比等）
-        numbers = re.findall(r'\d+(?:\.\d+)?(?:[万亿千百]|%)?', llm_text)
-
-        # 提取关键中文词（2个字符以上）
-        chinese_words = re.findall(r'[\u4e00-\u9fff]{2,}', llm_text)
-
-        # 提取英文单词（3个字符以上）
-        english_words = re.findall(r'[a-zA-Z]{3,}', llm_text)
-
-        keywords = numbers + chinese_words + english_words
-
-        if not keywords:
-            return None, -1, -1
-
-        # 在原文中查找包含最多关键词的片段
-        best_match = None
-        best_score = 0
-        best_start = -1
-        best_end = -1
-
-        # 使用滑动窗口查找
-        window_size = len(llm_text) + 20  # 稍微放宽一些
-
-        for i in range(len(original_text) - window_size + 1):
-            window = original_text[i:i + window_size]
-
-            # 计算这个窗口包含多少关键词
-            score = sum(1 for kw in keywords if kw in window)
-
-            if score > best_score:
-                best_score = score
-                best_match = window
-                best_start = i
-                best_end = i + window_size
-
-        # 如果找到了包含至少一半关键词的片段，则认为匹配成功
-        if best_score >= len(keywords) / 2:
-            # 优化边界：尝试缩小到更精确的范围
-            if best_match:
-                # 找到第一个关键词的位置
-                first_kw_pos = len(best_match)
-                last_kw_pos = 0
-
-                for kw in keywords:
-                    pos = best_match.find(kw)
-                    if pos != -1:
-                        first_kw_pos = min(first_kw_pos, pos)
-                        last_kw_pos = max(last_kw_pos, pos + len(kw))
-
-                # 稍微扩展边界，包含完整的词
-                margin = 5
-                start_offset = max(0, first_kw_pos - margin)
-                end_offset = min(len(best_match), last_kw_pos + margin)
-
-                optimized_match = best_match[start_offset:end_offset].strip()
-                optimized_start = best_start + start_offset
-                optimized_end = optimized_start + len(optimized_match)
-
-                self.logger.debug(f"模糊匹配成功: 关键词匹配度 {best_score}/{len(keywords)}")
-                return optimized_match, optimized_start, optimized_end
-
-        return None, -1, -1
+        matched_text, start, end, score, total = fuzzy_locate(llm_text, original_text)
+        if matched_text is not None:
+            self.logger.debug(f"模糊匹配成功: 关键词匹配度 {score}/{total}")
+        return matched_text, start, end
 
     def is_available(self) -> bool:
         """检查LLM检测器是否可用"""
         try:
-            import requests
             url = f"{self.base_url}/api/tags"
-            response = requests.get(url, timeout=5)
+            response = self.http.get(url, timeout=(self.http.connect_timeout, 5))
             return response.status_code == 200
         except:
             return False
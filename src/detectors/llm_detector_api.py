@@ -7,10 +7,15 @@ import json
 import re
 import time
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Any, Callable, Optional
 from dataclasses import dataclass
 from pathlib import Path
 
+from .http_session import PooledSession
+from .llm_cache import LLMResultCache
+from .llm_chunker import TextChunker, detect_chunks
+from .fuzzy_locator import fuzzy_locate
+
 
 # 尝试加载.env文件
 def load_dotenv():
@@ -49,6 +54,9 @@ class LLMMatch:
 class LLMDetectorAPI:
     """基于在线API的LLM检测器"""
 
+    # 提示词模板版本（修改 _build_prompt 时需同步更新，使旧缓存失效）
+    PROMPT_VERSION = '1'
+
     # 支持的API提供商配置
     PROVIDERS = {
         'zhipu': {
@@ -67,7 +75,14 @@ class LLMDetectorAPI:
         }
     }
 
-    def __init__(self, provider: str = 'zhipu', api_key: Optional[str] = None, model: Optional[str] = None, base_url: Optional[str] = None):
+    def __init__(self,
+                 provider: str = 'zhipu',
+                 api_key: Optional[str] = None,
+                 model: Optional[str] = None,
+                 base_url: Optional[str] = None,
+                 http_config: Optional[Dict[str, Any]] = None,
+                 cache: Optional[LLMResultCache] = None,
+                 chunk_config: Optional[Dict[str, Any]] = None):
         """
         初始化LLM API检测器
         
@@ -76,6 +91,9 @@ class LLMDetectorAPI:
             api_key: API密钥（优先从环境变量读取）
             model: 模型名称（为空则使用默认模型）
             base_url: 自定义API地址（可选）
+            http_config: HTTP连接池配置（连接池大小、长连接、超时等）
+            cache: LLM响应缓存（可选）
+            chunk_config: 长文本分块配置（max_tokens / overlap_tokens / max_parallel）
         """
         self.logger = logging.getLogger(__name__)
         self.provider = provider.lower()
@@ -103,6 +121,15 @@ class LLMDetectorAPI:
 
         self.last_raw_response = ""  # 保存最后一次原始响应，用于调试
 
+        # 长连接会话，复用TCP连接和TLS握手
+        self.http = PooledSession(http_config, default_read_timeout=30)
+        self.cache = cache
+
+        # 长文本分块（输出长度有限，整篇送入容易被截断）
+        chunk_config = chunk_config or {}
+        self.chunker = TextChunker(chunk_config.get('max_tokens', 1500), chunk_config.get('overlap_tokens', 100)) if chunk_config.get('enable', True) else None
+        self.max_parallel_chunks = int(chunk_config.get('max_parallel', 4))
+
         self.logger.info(f"初始化LLM API检测器: {provider_config['name']} ({self.model})")
 
     def _get_api_key_from_env(self) -> Optional[str]:
@@ -123,13 +150,14 @@ class LLMDetectorAPI:
 
         return None
 
-    def detect(self, text: str, threshold: float = 0.7) -> List[LLMMatch]:
+    def detect(self, text: str, threshold: float = 0.7, on_match: Optional[Callable[[LLMMatch], None]] = None) -> List[LLMMatch]:
         """
         使用在线LLM API检测敏感信息
         
         Args:
             text: 待检测文本
             threshold: 置信度阈值
+            on_match: 每个检测结果的回调（在线API不使用流式输出，检测结束时依次调用）
             
         Returns:
             检测结果列表
@@ -150,6 +178,13 @@ class LLMDetectorAPI:
             elapsed_time = time.time() - start_time
             self.logger.info(f"LLM API检测完成，耗时: {elapsed_time:.2f}秒，检测到 {len(results)} 项")
 
+            if on_match is not None:
+                for match in results:
+                    try:
+                        on_match(match)
+                    except Exception as e:
+                        self.logger.warning(f"检测结果回调出错: {e}")
+
             return results
         except Exception as e:
             elapsed_time = time.time() - start_time if 'start_time' in locals() else 0
@@ -184,21 +219,52 @@ class LLMDetectorAPI:
 只返回JSON，不要包含其他解释。需严格遵守JSON格式，注意检查括号成对。"""
 
     def _call_api(self, text: str, threshold: float) -> List[LLMMatch]:
-        """调用API进行检测"""
+        """调用API进行检测（长文本分块并行检测）"""
         if self.api_format == 'openai':
-            return self._call_openai_format_api(text, threshold)
+            request = self._call_openai_format_api
         else:
             raise ValueError(f"不支持的API格式: {self.api_format}")
 
-    def _call_openai_format_api(self, text: str, threshold: float) -> List[LLMMatch]:
-        """调用OpenAI格式的API"""
+        chunks = self.chunker.split(text) if self.chunker else []
+        if len(chunks) > 1:
+            self.logger.info(f"文本较长，分为 {len(chunks)} 块并行检测")
+            matches, responses = detect_chunks(chunks,
+                                               lambda chunk: request(chunk.text),
+                                               lambda content, chunk_text: self._parse_response(content, chunk_text, threshold),
+                                               max_parallel=self.max_parallel_chunks)
+            self.last_raw_response = '\n'.join(responses)
+            return matches
+
+        content = request(text)
+        if content is None:
+            return []
+        self.last_raw_response = content
+        return self._parse_response(content, text, threshold)
+
+    def _call_openai_format_api(self, text: str) -> Optional[str]:
+        """
+        调用OpenAI格式的API
+        
+        Args:
+            text: 待检测文本
+            
+        Returns:
+            LLM原始响应，调用失败时返回None
+        """
         try:
             import requests
         except ImportError:
             self.logger.error("请安装 requests 库: pip install requests")
-            return []
+            return None
 
         try:
+            # 相同文本直接复用缓存的响应
+            cache_key = LLMResultCache.make_key(self.provider, self.model, self.PROMPT_VERSION, text)
+            cached = self.cache.get(cache_key) if self.cache else None
+            if cached is not None:
+                self.logger.debug("LLM缓存命中")
+                return cached
+
             url = f"{self.base_url}/chat/completions"
 
             headers = {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
@@ -215,7 +281,7 @@ class LLMDetectorAPI:
             }
 
             self.logger.debug(f"调用API: {url}")
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
+            response = self.http.post(url, headers=headers, json=payload)
             response.raise_for_status()
 
             result = response.json()
@@ -223,12 +289,13 @@ class LLMDetectorAPI:
             # 提取响应内容
             if 'choices' in result and len(result['choices']) > 0:
                 content = result['choices'][0]['message']['content'].strip()
-                self.last_raw_response = content
                 self.logger.debug(f"API原始响应: {content[:200]}...")
-                return self._parse_response(content, text, threshold)
+                if self.cache and content:
+                    self.cache.set(cache_key, content)
+                return content
             else:
                 self.logger.warning("API响应格式异常")
-                return []
+                return None
 
         except requests.exceptions.RequestException as e:
             self.logger.error(f"API请求失败: {e}")
@@ -238,10 +305,10 @@ class LLMDetectorAPI:
                     self.logger.error(f"错误详情: {error_detail}")
                 except:
                     self.logger.error(f"响应内容: {e.response.text[:200]}")
-            return []
+            return None
         except Exception as e:
             self.logger.error(f"API调用失败: {e}")
-            return []
+            return None
 
     def _parse_response(self, content: str, original_text: str, threshold: float) -> List[LLMMatch]:
         """
@@ -331,65 +398,18 @@ class LLMDetectorAPI:
         """
         模糊匹配：当LLM输出的文本在原文中找不到时，尝试找到相似的片段
         
+        先为LLM文本中的数字和关键词建立在原文中的位置索引，只在锚点附近为候选窗口计分，
+        避免在整个原文上滑动窗口。
+        
+        Args:
+            llm_text: LLM输出的敏感文本
+            original_text: 原始文本
+            
         Returns:
             (匹配的文本, 起始位置, 结束位置) 或 (None, -1, -1)
         """
-        # 提取数字
-        numbers = re.findall(r'\d+(?:\.\d+)?(?:[万亿千百]|%)?', llm_text)
-
-        # 提取关键中文词（2个字符以上）
-        chinese_words = re.findall(r'[\u4e00-\u9fff]{2,}', llm_text)
-
-        # 提取英文单词（3个字符以上）
-        english_words = re.findall(r'[a-zA-Z]{3,}', llm_text)
-
-        keywords = numbers + chinese_words + english_words
-
-        if not keywords:
-            return None, -1, -1
-
-        # 在原文中查找包含最多关键词的片段
-        best_match = None
-        best_score = 0
-        best_start = -1
-        best_end = -1
-
-        window_size = len(llm_text) + 20
-
-        for i in range(len(original_text) - window_size + 1):
-            window = original_text[i:i + window_size]
-            score = sum(1 for kw in keywords if kw in window)
-
-            if score > best_score:
-                best_score = score
-                best_match = window
-                best_start = i
-                best_end = i + window_size
-
-        # 如果找到了包含至少一半关键词的片段
-        if best_score >= len(keywords) / 2:
-            if best_match:
-                # 优化边界
-                first_kw_pos = len(best_match)
-                last_kw_pos = 0
-
-                for kw in keywords:
-                    pos = best_match.find(kw)
-                    if pos != -1:
-                        first_kw_pos = min(first_kw_pos, pos)
-                        last_kw_pos = max(last_kw_pos, pos + len(kw))
-
-                margin = 5
-                start_offset = max(0, first_kw_pos - margin)
-                end_offset = min(len(best_match), last_kw_pos + margin)
-
-                optimized_match = best_match[start_offset:end_offset].strip()
-                optimized_start = best_start + start_offset
-                optimized_end = optimized_start + len(optimized_match)
-
-                return optimized_match, optimized_start, optimized_end
-
-        return None, -1, -1
+        matched_text, start, end, score, total = fuzzy_locate(llm_text, original_text)
+        return matched_text, start, end
 
     def is_available(self) -> bool:
         """检查API是否可用"""
@@ -414,5 +434,3 @@ class LLMDetectorAPI:
             'available': self.is_available(),
             'has_api_key': bool(self.api_key)
         }
-
-    print("\n" + "=" * 60)
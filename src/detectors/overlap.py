@@ -0,0 +1,117 @@
+"""
+重叠区间处理
+正则、关键词和Guardian合并阶段共用的扫描线去重结构
+"""
+from typing import Any, Callable, Iterator, List, Tuple
+
+
+class IntervalSweep:
+    """
+    按起始位置递增顺序处理区间的扫描线结构
+
+    已保留的区间中，结束位置不超过当前起始位置的区间不可能再与后续区间重叠，
+    因此只需在一个很小的活动集合中查找重叠，整体复杂度接近线性。
+    区间对象只需具备 start / end 属性。
+    """
+
+    def __init__(self):
+        self.items: List[Any] = []  # 已保留的区间（按加入顺序）
+        self._active: List[int] = []  # 仍可能与后续区间重叠的下标（递增）
+
+    def overlapping(self, interval: Any) -> Iterator[Tuple[int, Any]]:
+        """
+        按加入顺序产出与给定区间重叠的已保留区间
+
+        Args:
+            interval: 新区间，其起始位置不得小于之前传入的区间
+
+        Yields:
+            (下标, 已保留的区间)
+        """
+        start = interval.start
+        items = self.items
+        self._active = [i for i in self._active if items[i].end > start]
+
+        for i in self._active:
+            existing = items[i]
+            if not (interval.end <= existing.start or interval.start >= existing.end):
+                yield i, existing
+
+    def add(self, interval: Any) -> int:
+        """保留区间，返回其下标"""
+        self.items.append(interval)
+        self._active.append(len(self.items) - 1)
+        return len(self.items) - 1
+
+    def replace(self, index: int, interval: Any):
+        """用新区间替换已保留的区间（新区间的结束位置不得更小）"""
+        self.items[index] = interval
+
+
+def remove_overlaps(intervals: List[Any], sort_key: Callable[[Any], Any]) -> List[Any]:
+    """
+    按排序优先级贪心保留互不重叠的区间
+
+    Args:
+        intervals: 区间列表
+        sort_key: 排序键，必须以 start 为第一关键字
+
+    Returns:
+        去重后的区间列表（按排序顺序）
+    """
+    sweep = IntervalSweep()
+    for interval in sorted(intervals, key=sort_key):
+        if next(sweep.overlapping(interval), None) is None:
+            sweep.add(interval)
+    return sweep.items
+
+
+def merge_overlaps(detections: List[Any]) -> List[Any]:
+    """
+    合并重叠的检测结果
+
+    规则（与已保留结果逐个比较，命中第一条规则即停止）：
+    1. 被已有结果完全包含 -> 丢弃
+    2. 完全包含已有结果 -> 置信度不低于已有结果时替换，否则丢弃
+    3. 重叠超过较短者的50% -> 置信度更高（或相同但更长）时替换，否则丢弃
+    重叠不超过50%的部分重叠两者都保留。
+
+    Args:
+        detections: 检测结果列表（需具备 start / end / confidence 属性）
+
+    Returns:
+        合并后的结果列表
+    """
+    sweep = IntervalSweep()
+
+    for detection in sorted(detections, key=lambda x: (x.start, -x.confidence)):
+        should_add = True
+        for i, existing in sweep.overlapping(detection):
+            # 如果新检测被现有检测完全包含，跳过
+            if detection.start >= existing.start and detection.end <= existing.end:
+                should_add = False
+                break
+            # 如果新检测完全包含现有检测，且置信度更高，替换
+            elif detection.start <= existing.start and detection.end >= existing.end:
+                if detection.confidence >= existing.confidence:
+                    sweep.replace(i, detection)
+                should_add = False
+                break
+            # 部分重叠：选择置信度更高的，或者选择更长的
+            else:
+                overlap_len = min(detection.end, existing.end) - max(detection.start, existing.start)
+                detection_len = detection.end - detection.start
+                existing_len = existing.end - existing.start
+
+                # 如果重叠超过50%，选择置信度更高或更长的
+                if overlap_len > min(detection_len, existing_len) * 0.5:
+                    if detection.confidence > existing.confidence or \
+                       (detection.confidence == existing.confidence and detection_len > existing_len):
+                        sweep.replace(i, detection)
+                    should_add = False
+                    break
+
+        if should_add:
+            sweep.add(detection)
+
+    return sweep.items
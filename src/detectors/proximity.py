@@ -0,0 +1,221 @@
+"""
+邻近共现匹配
+代替增强模式中 A.*?B 形式的正则：先在文本中一次找出各项（关键词、数字串）的全部出现位置，
+再把相邻两项按距离配对。每个间隔不超过窗口字符数且不跨行，结果与正则 A.{0,窗口}?B 的 finditer 一致
+（窗口为None时与 A.*?B 一致），不会像 .*? 那样对长行中的每个起点反复扫描到行尾
+"""
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# 默认的最大间隔（字符数）
+DEFAULT_WINDOW = 100
+
+_DIGIT_RUN_PATTERN = re.compile(r'\d+')
+_NEWLINE_PATTERN = re.compile(r'\n')
+
+# 出现位置：(最早起点, 最晚起点, 可能的结束位置)；数字串从其中任意位置开始匹配的结果相同
+Occurrences = Tuple[List[int], List[int], List[Tuple[int, ...]]]
+
+
+class Literals:
+    """字面量备选项，与正则的 (a|b|c) 相同，同一位置按顺序尝试"""
+
+    def __init__(self, *literals: str):
+        self.literals = literals
+        # 分组为该位置按顺序第一个出现的备选项；出现位置可能相互重叠时用零宽前瞻找出每个位置
+        alternation = '(' + '|'.join(map(re.escape, literals)) + ')'
+        overlapping = any(a[k:k + len(b)] == b[:len(a) - k] for a in literals for b in literals for k in range(1, len(a)))
+        self._finder = re.compile(f'(?={alternation})' if overlapping else alternation)
+        # 只有一个备选项是另一个的前缀时，同一位置才可能出现多个备选项
+        self._ambiguous = any(a != b and b.startswith(a) for a in literals for b in literals)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Literals) and self.literals == other.literals
+
+    def __hash__(self) -> int:
+        return hash((Literals, self.literals))
+
+    def find(self, index: 'TermIndex') -> Occurrences:
+        text = index.text
+        spans = [match.span(1) for match in self._finder.finditer(text)]
+        starts = [start for start, _ in spans]
+        if self._ambiguous:
+            ends = [tuple(start + len(literal) for literal in self.literals if text.startswith(literal, start)) for start in starts]
+        else:
+            ends = [(end, ) for _, end in spans]
+        return starts, starts, ends
+
+
+class Number:
+    """数字串，与正则的 \\d+ 相同；指定单位时要求紧跟其中之一，与 \\d+(万|亿) 相同"""
+
+    def __init__(self, units: Sequence[str] = ()):
+        self.units = tuple(units)
+        # 后面紧跟单位的完整数字串，分组为按顺序第一个出现的单位
+        self._finder = re.compile(r'(?<!\d)\d+(?=(' + '|'.join(map(re.escape, self.units)) + '))') if self.units else None
+        self._ambiguous = any(a != b and b.startswith(a) for a in self.units for b in self.units)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Number) and self.units == other.units
+
+    def __hash__(self) -> int:
+        return hash((Number, self.units))
+
+    def find(self, index: 'TermIndex') -> Occurrences:
+        if not self.units:
+            runs = index.digit_runs()
+            return [start for start, _ in runs], [end - 1 for _, end in runs], [(end, ) for _, end in runs]
+
+        text = index.text
+        matches = [(match.start(), match.end(), match.end(1)) for match in self._finder.finditer(text)]
+        if self._ambiguous:
+            ends = [tuple(end + len(unit) for unit in self.units if text.startswith(unit, end)) for _, end, _ in matches]
+        else:
+            ends = [(unit_end, ) for _, _, unit_end in matches]
+        return [start for start, _, _ in matches], [end - 1 for _, end, _ in matches], ends
+
+
+Term = Union[Literals, Number]
+
+
+class TermIndex:
+    """一段文本中各项的出现位置（每项只查找一次，供所有模式共用）"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self._occurrences: Dict[Term, Occurrences] = {}
+        self._digit_runs = None
+        self._newlines = None
+
+    def occurrences(self, term: Term) -> Occurrences:
+        found = self._occurrences.get(term)
+        if found is None:
+            found = self._occurrences[term] = term.find(self)
+        return found
+
+    def digit_runs(self) -> List[Tuple[int, int]]:
+        if self._digit_runs is None:
+            self._digit_runs = [match.span() for match in _DIGIT_RUN_PATTERN.finditer(self.text)]
+        return self._digit_runs
+
+    def newlines(self) -> List[int]:
+        if self._newlines is None:
+            self._newlines = [match.start() for match in _NEWLINE_PATTERN.finditer(self.text)]
+        return self._newlines
+
+    def line_end(self, pos: int) -> int:
+        """pos 之后（含）第一个换行符的位置，没有时为文本长度"""
+        newlines = self.newlines()
+        i = bisect_right(newlines, pos - 1)
+        return newlines[i] if i < len(newlines) else len(self.text)
+
+
+class ProximityPattern:
+    """依次出现的若干项，相邻两项之间为不含换行的间隔"""
+
+    def __init__(self, *terms: Union[Term, Sequence[str]]):
+        """
+        Args:
+            terms: 各项，Literals/Number，或字面量元组（转换为 Literals）
+        """
+        self.terms = tuple(term if isinstance(term, (Literals, Number)) else Literals(*term) for term in terms)
+
+    def finditer(self, index: TermIndex, window: Optional[int] = DEFAULT_WINDOW) -> List[Tuple[int, int]]:
+        """
+        查找所有不重叠的匹配
+
+        与正则一样从左到右取最早的起点，每个间隔取最短（后面的项取最近的出现位置，
+        后续项配对失败时再尝试窗口内更远的出现位置）。每个 (项, 位置) 的配对结果只计算一次，
+        总耗时与各项出现次数和窗口内的候选数成正比。
+
+        Args:
+            index: 文本的出现位置索引
+            window: 相邻两项之间的最大间隔（字符数），None表示不限
+
+        Returns:
+            [(起始位置, 结束位置), ...]
+        """
+        if len(self.terms) == 2:
+            return self._find_pairs(index, window)
+
+        firsts, lasts, ends = index.occurrences(self.terms[0])
+        memo: Dict[Tuple[int, int], Optional[int]] = {}
+        spans = []
+        pos = 0
+        for first, last, term_ends in zip(firsts, lasts, ends):
+            if last < pos:
+                continue
+            for end in term_ends:
+                match_end = self._match_rest(index, 1, end, window, memo)
+                if match_end is not None:
+                    spans.append((max(first, pos), match_end))
+                    pos = match_end
+                    break
+        return spans
+
+    def _find_pairs(self, index: TermIndex, window: Optional[int]) -> List[Tuple[int, int]]:
+        """两项模式的 finditer：第二项取每个第一项之后最近的出现位置"""
+        firsts, lasts, ends = index.occurrences(self.terms[0])
+        if not firsts:
+            return []
+        pair_firsts, pair_lasts, pair_ends = index.occurrences(self.terms[1])
+        if not pair_firsts:
+            return []
+
+        count = len(pair_firsts)
+        newlines = index.newlines()
+        spans = []
+        pos = 0
+        for first, last, term_ends in zip(firsts, lasts, ends):
+            if last < pos:
+                continue
+            for end in term_ends:
+                j = bisect_right(pair_firsts, end) - 1
+                if j < 0 or pair_lasts[j] < end:
+                    j += 1
+                if j == count:
+                    continue
+                limit = index.line_end(end) if newlines else len(index.text)
+                if window is not None and end + window < limit:
+                    limit = end + window
+                if pair_firsts[j] <= limit:
+                    spans.append((max(first, pos), pair_ends[j][0]))
+                    pos = pair_ends[j][0]
+                    break
+        return spans
+
+    def _match_rest(self, index: TermIndex, i: int, pos: int, window: Optional[int], memo: Dict[Tuple[int, int], Optional[int]]) -> Optional[int]:
+        """从 pos 开始匹配第 i 项及之后的各项，返回匹配结束位置"""
+        key = (i, pos)
+        if key in memo:
+            return memo[key]
+
+        firsts, lasts, ends = index.occurrences(self.terms[i])
+        limit = index.line_end(pos)
+        if window is not None:
+            limit = min(limit, pos + window)
+
+        j = bisect_right(firsts, pos) - 1
+        if j < 0 or lasts[j] < pos:
+            j += 1
+
+        # 最后一项：最近的出现位置即为结果
+        if i == len(self.terms) - 1:
+            result = ends[j][0] if j < len(firsts) and firsts[j] <= limit else None
+            memo[key] = result
+            return result
+
+        result = None
+        while result is None and j < len(firsts) and firsts[j] <= limit:
+            for end in ends[j]:
+                result = self._match_rest(index, i + 1, end, window, memo)
+                if result is not None:
+                    break
+            # 不限距离时，更远的出现位置能配对的，最近的出现位置也能配对
+            if window is None:
+                break
+            j += 1
+
+        memo[key] = result
+        return result
@@ -4,9 +4,20 @@
 """
 import re
 import logging
-from typing import List, Dict, Tuple
+import threading
+from typing import Any, List, Dict, Optional, Tuple
 from dataclasses import dataclass
 
+from .checksum import BATCH_VALIDATORS, validate_batch
+from .overlap import remove_overlaps
+from .proximity import DEFAULT_WINDOW, TermIndex
+from .rules import RuleSet, load_rules
+from .run_scanner import can_scan, scan_runs
+
+# 预过滤条件中表示“文本包含数字”的特殊项（与正则中的 \d 一致，包括全角等Unicode数字）
+DIGIT = r'\d'
+_DIGIT_PATTERN = re.compile(DIGIT)
+
 
 @dataclass
 class DetectionResult:
@@ -21,124 +32,73 @@ class DetectionResult:
 class RegexDetector:
     """基于正则表达式的敏感信息检测器（增强版）"""
 
-    def __init__(self):
+    def __init__(self, rules: Optional[RuleSet] = None, proximity_window: Optional[int] = DEFAULT_WINDOW):
+        """
+        Args:
+            rules: 检测规则（为None时加载 config/detection_rules.yaml 中启用的规则）
+            proximity_window: 增强模式中相邻两个词之间的最大间隔（字符数），None表示同一行内不限距离
+        """
         self.logger = logging.getLogger(__name__)
-        self._init_patterns()
-        self._init_enhanced_patterns()
-
-    def _init_patterns(self):
-        """初始化正则表达式模式"""
-        self.patterns = {
-            # 邮箱地址 - 修复中文兼容性
-            'email': {
-                'pattern': re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}'),
-                'confidence': 0.95
-            },
-
-            # 中国手机号 - 修复中文兼容性
-            'phone_cn': {
-                'pattern': re.compile(r'(?<![0-9])1[3-9]\d{9}(?![0-9])'),
-                'confidence': 0.9
-            },
-
-            # 固定电话
-            'phone_landline': {
-                'pattern': re.compile(r'(?<![0-9])\d{3,4}-\d{7,8}(?![0-9])'),
-                'confidence': 0.85
-            },
-
-            # 中国身份证号（18位）- 修复中文兼容性
-            'id_card_cn': {
-                'pattern': re.compile(r'(?<![0-9])[1-9]\d{5}(19|20)\d{2}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])\d{3}[\dXx](?![0-9])'),
-                'confidence': 0.95
-            },
-
-            # IPv4地址 - 修复中文兼容性
-            'ipv4': {
-                'pattern': re.compile(r'(?<![0-9.])(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)(?![0-9.])'),
-                'confidence': 0.8
-            },
-
-            # API密钥模式（常见格式）
-            'api_key': {
-                'pattern': re.compile(r'(?<![A-Za-z0-9])[A-Za-z0-9]{32,64}(?![A-Za-z0-9])'),
-                'confidence': 0.6
-            },
-
-            # JWT Token
-            'jwt_token': {
-                'pattern': re.compile(r'(?<![A-Za-z0-9_.-])eyJ[A-Za-z0-9_-]*\.eyJ[A-Za-z0-9_-]*\.[A-Za-z0-9_-]*(?![A-Za-z0-9_.-])'),
-                'confidence': 0.95
-            },
-
-            # 信用卡号 - 修复中文兼容性
-            'credit_card': {
-                'pattern': re.compile(r'(?<![0-9])\d{4}[- ]?\d{4}[- ]?\d{4}[- ]?\d{4}(?![0-9])'),
-                'confidence': 0.7
-            },
-
-            # 银行卡号（中国，16-19位）- 修复中文兼容性
-            'bank_card': {
-                'pattern': re.compile(r'(?<![0-9])\d{16,19}(?![0-9])'),
-                'confidence': 0.65
-            },
-
-            # URL中的密钥参数
-            'url_secret': {
-                'pattern': re.compile(r'(password|passwd|pwd|secret|token|key|api_key|apikey)=[A-Za-z0-9_\-]+', re.IGNORECASE),
-                'confidence': 0.9
-            },
-
-            # AWS密钥 - 修复中文兼容性
-            'aws_key': {
-                'pattern': re.compile(r'(?<![A-Z0-9])(AKIA[0-9A-Z]{16})(?![A-Z0-9])'),
-                'confidence': 0.95
-            },
-
-            # 数据库连接字符串
-            'db_connection': {
-                'pattern': re.compile(r'(mongodb|mysql|postgresql|redis)://[^\s]+', re.IGNORECASE),
-                'confidence': 0.9
-            },
-
-            # Private Key
-            'private_key': {
-                'pattern': re.compile(r'-----BEGIN (?:RSA |EC |OPENSSH )?PRIVATE KEY-----'),
-                'confidence': 0.99
-            },
-        }
-
-    def _init_enhanced_patterns(self):
-        """初始化增强的语义模式（用于检测含金额、敏感词组合的文本）"""
-        self.enhanced_patterns = {
-            # 财务信息模式
-            'financial': [
-                re.compile(r'(\d+)(万|亿|千万).*?(营收|利润|收入|预算|成本|资金|业绩|销售额)'),
-                re.compile(r'(营收|利润|收入|预算|成本|资金|业绩|销售额).*?(\d+)(万|亿|千万)'),
-                re.compile(r'[¥$€£]\s*\d+'),
-            ],
-            # 人事信息模式
-            'personnel': [
-                re.compile(r'(工资|薪资|薪酬|年薪).*?\d+.*?(万|元)'),
-                re.compile(r'(员工|人员).*?(名单|信息|数据)'),
-            ],
-            # 战略信息模式
-            'strategy': [
-                re.compile(r'(机密|保密|内部|秘密).*?(文件|资料|数据|信息|材料)'),
-                re.compile(r'(战略|计划|规划).*?(目标|方案)'),
-            ],
-            # 技术信息模式
-            'technical': [
-                re.compile(r'(API|api).*?(密钥|key|秘钥)'),
-                re.compile(r'(密码|password|pwd)[:：=]\s*\S+'),
-                re.compile(r'(数据库|服务器|主机).*?(地址|IP|密码|账号)'),
-            ],
-            # 客户信息模式
-            'customer': [
-                re.compile(r'客户.*?(名单|信息|数据|资料)'),
-                re.compile(r'(合同|订单).*?(编号|金额|内容)'),
-            ],
-        }
+        self.proximity_window = proximity_window
+        self.rules = rules if rules is not None else load_rules()
+
+        # 基础模式：规则名称 -> 模式；增强模式（语义组合）：类别 -> 模式列表
+        self.patterns = self.rules.patterns
+        self.enhanced_patterns = self.rules.enhanced_patterns
+        self._init_prefilter()
+
+        # 与扫描器中定义完全相同的数字/字母数字类模式，一次扫描得到全部匹配
+        self._scanned_types = frozenset(name for name, info in self.patterns.items() if info['scanned'])
+
+    def _init_prefilter(self):
+        """初始化预过滤的运行/跳过计数"""
+        names = list(self.patterns)
+        for patterns in self.enhanced_patterns.values():
+            names.extend(pattern_info['name'] for pattern_info in patterns)
+        self._prefilter_counts = {name: [0, 0] for name in names}  # 名称 -> [运行次数, 跳过次数]
+        self._prefilter_lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # 锁不能序列化（进程池执行模式会把检测器传给工作进程）
+        state = self.__dict__.copy()
+        del state['_prefilter_lock']
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._prefilter_lock = threading.Lock()
+
+    @staticmethod
+    def _make_prefilter(text: str):
+        """
+        创建预过滤函数：判断文本是否满足模式的必要条件
+
+        条件是若干组备选项（组之间为“且”，组内为“或”），备选项为必须出现的字面量或 DIGIT。
+        每个字面量在一次检测中只查找一次（str 的子串查找），不满足条件的模式不可能匹配，直接跳过。
+        """
+        present = {}
+
+        def contains(literal) -> bool:
+            found = present.get(literal)
+            if found is None:
+                found = _DIGIT_PATTERN.search(text) is not None if literal == DIGIT else literal in text
+                present[literal] = found
+            return found
+
+        def should_run(requires) -> bool:
+            return all(any(contains(literal) for literal in group) for group in requires)
+
+        return should_run
+
+    def get_prefilter_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        获取各模式的预过滤统计（进程池执行模式下工作进程中的计数不会汇总到这里）
+
+        Returns:
+            {规则名称: {'run': 运行次数, 'skipped': 跳过次数}}
+        """
+        with self._prefilter_lock:
+            return {name: {'run': run, 'skipped': skipped} for name, (run, skipped) in self._prefilter_counts.items()}
 
     def detect(self, text: str) -> List[DetectionResult]:
         """
@@ -151,65 +111,114 @@ class RegexDetector:
             检测结果列表
         """
         results = []
+        should_run = self._make_prefilter(text)
+        skipped = {name for name, info in self.patterns.items() if not should_run(info['requires'])}
+
+        # 数字/字母数字类模式一次扫描完成（文本含全角等非ASCII数字时仍逐个使用正则）
+        scan_types = self._scanned_types - skipped
+        scanned = scan_runs(text, {name: self.patterns[name]['pattern'] for name in scan_types}, scan_types) if scan_types and can_scan(text) else {}
 
         # 1. 基础模式检测（格式化信息）
+        candidates = []  # (类型, 内容, 起始位置, 结束位置, 置信度)
         for pattern_name, pattern_info in self.patterns.items():
-            pattern = pattern_info['pattern']
-            confidence = pattern_info['confidence']
+            if pattern_name in skipped:
+                continue
 
-            for match in pattern.finditer(text):
-                # 对于低置信度的模式，进行额外验证
-                if confidence < 0.8:
-                    if not self._validate_match(pattern_name, match.group()):
+            confidence = pattern_info['confidence']
+            validator = pattern_info['validator']
+            if pattern_name in scanned:
+                spans = scanned[pattern_name]
+            else:
+                spans = (match.span() for match in pattern_info['pattern'].finditer(text))
+
+            for start, end in spans:
+                content = text[start:end]
+
+                # 逐个校验的规则（如API密钥是否像真实的密钥）
+                if validator is not None and validator not in BATCH_VALIDATORS:
+                    if not self._validate_match(validator, content):
                         continue
 
-                result = DetectionResult(type=pattern_name, content=match.group(), start=match.start(), end=match.end(), confidence=confidence)
-                results.append(result)
+                candidates.append((pattern_name, validator, content, start, end, confidence))
+
+        # 卡号、身份证号、手机号的校验位和号段统一批量校验
+        valid = validate_batch([(validator, content) for _, validator, content, _, _, _ in candidates])
+        for (pattern_name, _, content, start, end, confidence), ok in zip(candidates, valid):
+            if not ok:
+                continue
 
-                self.logger.debug(f"检测到 {pattern_name}: {match.group()}")
+            result = DetectionResult(type=pattern_name, content=content, start=start, end=end, confidence=confidence)
+            results.append(result)
+
+            self.logger.debug(f"检测到 {pattern_name}: {content}")
 
         # 2. 增强模式检测（语义组合）
-        enhanced_results = self._detect_enhanced_patterns(text)
+        enhanced_results = self._detect_enhanced_patterns(text, should_run, skipped)
         results.extend(enhanced_results)
 
+        with self._prefilter_lock:
+            for name, counts in self._prefilter_counts.items():
+                counts[1 if name in skipped else 0] += 1
+
         # 去重和排序
         results = self._deduplicate_results(results)
         results.sort(key=lambda x: x.start)
 
         return results
 
-    def _detect_enhanced_patterns(self, text: str) -> List[DetectionResult]:
-        """检测增强模式（语义组合）"""
+    def _detect_enhanced_patterns(self, text: str, should_run=None, skipped=None) -> List[DetectionResult]:
+        """
+        检测增强模式（语义组合）
+
+        Args:
+            text: 待检测的文本
+            should_run: 预过滤函数（为None时运行所有模式）
+            skipped: 记录被预过滤跳过的模式名称
+        """
         results = []
+        index = None  # 词组合模式共用的出现位置索引，需要时才建立
 
         for category, patterns in self.enhanced_patterns.items():
-            for pattern in patterns:
-                for match in pattern.finditer(text):
+            for pattern_info in patterns:
+                if should_run is not None and not should_run(pattern_info['requires']):
+                    if skipped is not None:
+                        skipped.add(pattern_info['name'])
+                    continue
+
+                if 'proximity' in pattern_info:
+                    if index is None:
+                        index = TermIndex(text)
+                    spans = pattern_info['proximity'].finditer(index, self.proximity_window)
+                else:
+                    spans = (match.span() for match in pattern_info['pattern'].finditer(text))
+
+                for start, end in spans:
+                    content = text[start:end]
                     result = DetectionResult(
                         type=category,
-                        content=match.group(),
-                        start=match.start(),
-                        end=match.end(),
-                        confidence=0.9  # 语义组合置信度较高
+                        content=content,
+                        start=start,
+                        end=end,
+                        confidence=pattern_info['confidence']
                     )
                     results.append(result)
-                    self.logger.debug(f"增强检测到 {category}: {match.group()}")
+                    self.logger.debug(f"增强检测到 {category}: {content}")
 
         return results
 
-    def _validate_match(self, pattern_type: str, content: str) -> bool:
+    def _validate_match(self, validator: str, content: str) -> bool:
         """
-        对低置信度匹配进行额外验证
+        对单个匹配进行额外验证（卡号等数字候选的校验位在 detect 中批量校验）
         
         Args:
-            pattern_type: 模式类型
+            validator: 规则的校验器
             content: 匹配内容
         
         Returns:
             是否有效
         """
         # API密钥验证：检查是否看起来像真实的密钥
-        if pattern_type == 'api_key':
+        if validator == 'key_like':
             # 排除全数字或全字母
             if content.isdigit() or content.isalpha():
                 return False
@@ -217,29 +226,8 @@ class RegexDetector:
             if len(set(content)) < 10:
                 return False
 
-        # 银行卡号验证：Luhn算法
-        if pattern_type in ['bank_card', 'credit_card']:
-            clean_num = content.replace(' ', '').replace('-', '')
-            if not self._luhn_check(clean_num):
-                return False
-
         return True
 
-    def _luhn_check(self, card_number: str) -> bool:
-        """Luhn算法验证银行卡号"""
-        try:
-            digits = [int(d) for d in card_number]
-            checksum = 0
-            for i, digit in enumerate(reversed(digits)):
-                if i % 2 == 1:
-                    digit *= 2
-                    if digit > 9:
-                        digit -= 9
-                checksum += digit
-            return checksum % 10 == 0
-        except:
-            return False
-
     def _deduplicate_results(self, results: List[DetectionResult]) -> List[DetectionResult]:
         """
         去重：处理重叠的检测结果，保留置信度最高的
@@ -253,24 +241,5 @@ class RegexDetector:
         if not results:
             return results
 
-        # 按位置排序
-        sorted_results = sorted(results, key=lambda x: (x.start, -x.confidence))
-
-        # 去重
-        filtered = []
-        for result in sorted_results:
-            # 检查是否与已有结果重叠
-            overlaps = False
-            for existing in filtered:
-                if self._is_overlap(result, existing):
-                    overlaps = True
-                    break
-
-            if not overlaps:
-                filtered.append(result)
-
-        return filtered
-
-    def _is_overlap(self, r1: DetectionResult, r2: DetectionResult) -> bool:
-        """判断两个检测结果是否重叠"""
-        return not (r1.end <= r2.start or r1.start >= r2.end)
+        # 按位置排序，同一位置优先保留置信度高的
+        return remove_overlaps(results, sort_key=lambda x: (x.start, -x.confidence))
@@ -0,0 +1,273 @@
+"""
+检测规则
+从 config/detection_rules.yaml 加载正则检测规则：解析、校验并编译为 RegexDetector 使用的规则集。
+编译结果（校验后的规则和派生信息）按文件内容哈希缓存在磁盘上，文件不变时启动直接读取缓存
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+import yaml
+
+from .checksum import BATCH_VALIDATORS
+from .proximity import Literals, Number, ProximityPattern
+from .run_scanner import SCANNED_PATTERNS
+from ..utils import get_cache_dir, get_default_config_file
+
+# 编译结果的格式版本（修改编译逻辑时递增，使旧缓存失效）
+RULES_FORMAT_VERSION = 1
+
+# 逐个匹配校验的规则（其余见 checksum.BATCH_VALIDATORS，在一次检测中批量校验）
+MATCH_VALIDATORS = frozenset(('key_like', ))
+VALIDATORS = BATCH_VALIDATORS | MATCH_VALIDATORS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RuleSet:
+    """编译后的规则集（已按启用状态过滤）"""
+    patterns: Dict[str, Dict[str, Any]]  # 规则名称 -> 基础模式
+    enhanced_patterns: Dict[str, List[Dict[str, Any]]]  # 类别 -> 组合模式列表
+    digest: str = ''  # 规则文件内容的哈希
+    disabled: List[str] = field(default_factory=list)  # 被禁用的规则名称
+
+
+def get_rules_file(rules_path: Union[str, Path] = None) -> Path:
+    """规则文件路径（为None时使用 config/detection_rules.yaml）"""
+    return Path(rules_path) if rules_path else get_default_config_file("detection_rules.yaml")
+
+
+def rules_digest(content: bytes) -> str:
+    """规则文件内容（和编译格式版本）的哈希"""
+    return hashlib.sha256(f"v{RULES_FORMAT_VERSION}\n".encode('utf-8') + content).hexdigest()
+
+
+def file_digest(rules_path: Union[str, Path] = None) -> Optional[str]:
+    """规则文件的哈希，文件不存在时为None"""
+    try:
+        return rules_digest(get_rules_file(rules_path).read_bytes())
+    except OSError:
+        return None
+
+
+def _compile_requires(name: str, literals: Any) -> List[List[str]]:
+    if literals is None:
+        return []
+    if not isinstance(literals, list) or not all(isinstance(group, list) and group for group in literals):
+        raise ValueError(f"规则 {name} 的 literals 必须是非空字面量列表的列表")
+    return [[str(literal) for literal in group] for group in literals]
+
+
+def _compile_pattern(name: str, pattern: Any, ignore_case: bool) -> int:
+    """检查正则能否编译，返回 re 标志"""
+    flags = re.IGNORECASE if ignore_case else 0
+    try:
+        re.compile(pattern, flags)
+    except (re.error, TypeError) as e:
+        raise ValueError(f"规则 {name} 的正则无效: {e}")
+    return flags
+
+
+def _compile_terms(name: str, terms: Any) -> List[Dict[str, List[str]]]:
+    if not isinstance(terms, list) or len(terms) < 2:
+        raise ValueError(f"规则 {name} 的 terms 至少需要两项")
+    compiled = []
+    for term in terms:
+        if isinstance(term, dict) and set(term) == {'number'}:
+            compiled.append({'number': [str(unit) for unit in term['number'] or []]})
+        elif isinstance(term, list) and term:
+            compiled.append({'literals': [str(literal) for literal in term]})
+        else:
+            raise ValueError(f"规则 {name} 的 terms 中每项须为关键词列表或 {{number: [单位...]}}")
+    return compiled
+
+
+def _compile_confidence(name: str, confidence: Any) -> float:
+    try:
+        confidence = float(confidence)
+    except (TypeError, ValueError):
+        raise ValueError(f"规则 {name} 缺少有效的 confidence")
+    if not 0 <= confidence <= 1:
+        raise ValueError(f"规则 {name} 的 confidence 须在0到1之间")
+    return confidence
+
+
+def compile_rules(data: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    校验规则文件内容并编译为可缓存的形式（只包含JSON类型）
+
+    Args:
+        data: 规则文件解析后的内容
+
+    Returns:
+        {'patterns': [...], 'enhanced': [...]}
+
+    Raises:
+        ValueError: 规则无效（名称重复、正则无法编译、未知的校验器等）
+    """
+    names = set()
+
+    def check_name(rule: Any) -> str:
+        if not isinstance(rule, dict) or not rule.get('name'):
+            raise ValueError(f"规则缺少 name: {rule}")
+        name = str(rule['name'])
+        if name in names:
+            raise ValueError(f"规则名称重复: {name}")
+        names.add(name)
+        return name
+
+    patterns = []
+    for rule in data.get('patterns') or []:
+        name = check_name(rule)
+        validator = rule.get('validator')
+        if validator is not None and validator not in VALIDATORS:
+            raise ValueError(f"规则 {name} 的 validator 未知: {validator}，可用选项: {', '.join(sorted(VALIDATORS))}")
+        flags = _compile_pattern(name, rule.get('pattern'), rule.get('ignore_case', False))
+        patterns.append({
+            'name': name,
+            'pattern': rule['pattern'],
+            'flags': flags,
+            'requires': _compile_requires(name, rule.get('literals')),
+            'validator': validator,
+            'confidence': _compile_confidence(name, rule.get('confidence')),
+            'enabled': bool(rule.get('enabled', True)),
+            # 与扫描器中的定义完全相同的数字/字母数字类规则由 run_scanner 一次扫描完成，自定义的正则逐个运行
+            'scanned': flags == 0 and rule['pattern'] == SCANNED_PATTERNS.get(name),
+        })
+
+    enhanced = []
+    for rule in data.get('enhanced') or []:
+        name = check_name(rule)
+        if not rule.get('category'):
+            raise ValueError(f"组合规则 {name} 缺少 category")
+        if ('pattern' in rule) == ('terms' in rule):
+            raise ValueError(f"组合规则 {name} 须指定 pattern 或 terms 之一")
+        compiled = {
+            'name': name,
+            'category': str(rule['category']),
+            'requires': _compile_requires(name, rule.get('literals')),
+            'confidence': _compile_confidence(name, rule.get('confidence')),
+            'enabled': bool(rule.get('enabled', True)),
+        }
+        if 'terms' in rule:
+            compiled['terms'] = _compile_terms(name, rule['terms'])
+        else:
+            compiled['pattern'] = rule['pattern']
+            compiled['flags'] = _compile_pattern(name, rule['pattern'], rule.get('ignore_case', False))
+        enhanced.append(compiled)
+
+    return {'patterns': patterns, 'enhanced': enhanced}
+
+
+def _read_cache(digest: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(get_cache_dir() / 'rules' / f'{digest}.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(digest: str, compiled: Dict[str, Any]):
+    """写入编译缓存（先写临时文件再替换，并发启动的进程不会读到不完整的文件）"""
+    cache_dir = get_cache_dir() / 'rules'
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(compiled, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_dir / f'{digest}.json')
+    except OSError as e:
+        logger.warning(f"无法写入规则编译缓存: {e}")
+
+
+def _build_term(term: Dict[str, List[str]]):
+    return Number(term['number']) if 'number' in term else Literals(*term['literals'])
+
+
+def _requires(groups: List[List[str]]) -> tuple:
+    return tuple(tuple(group) for group in groups)
+
+
+def build_rule_set(compiled: Dict[str, Any], overrides: Optional[Mapping[str, bool]] = None, digest: str = '') -> RuleSet:
+    """
+    按启用状态构建规则集（被禁用的规则不编译正则）
+
+    Args:
+        compiled: compile_rules 的结果
+        overrides: 规则名称 -> 是否启用，覆盖规则文件中的 enabled
+        digest: 规则文件的哈希
+    """
+    overrides = dict(overrides or {})
+    known = {rule['name'] for rule in compiled['patterns']} | {rule['name'] for rule in compiled['enhanced']}
+    for name in overrides:
+        if name not in known:
+            logger.warning(f"detection.rules 中的规则不存在: {name}")
+
+    disabled = []
+
+    def enabled(rule: Dict[str, Any]) -> bool:
+        if overrides.get(rule['name'], rule['enabled']):
+            return True
+        disabled.append(rule['name'])
+        return False
+
+    patterns = {}
+    for rule in compiled['patterns']:
+        if enabled(rule):
+            patterns[rule['name']] = {
+                'pattern': re.compile(rule['pattern'], rule['flags']),
+                'confidence': rule['confidence'],
+                'requires': _requires(rule['requires']),
+                'validator': rule['validator'],
+                'scanned': rule['scanned'],
+            }
+
+    enhanced_patterns = {}
+    for rule in compiled['enhanced']:
+        if not enabled(rule):
+            continue
+        info = {'name': rule['name'], 'confidence': rule['confidence'], 'requires': _requires(rule['requires'])}
+        if 'terms' in rule:
+            info['proximity'] = ProximityPattern(*(_build_term(term) for term in rule['terms']))
+        else:
+            info['pattern'] = re.compile(rule['pattern'], rule['flags'])
+        enhanced_patterns.setdefault(rule['category'], []).append(info)
+
+    return RuleSet(patterns=patterns, enhanced_patterns=enhanced_patterns, digest=digest, disabled=disabled)
+
+
+def load_rules(rules_path: str = None, overrides: Optional[Mapping[str, bool]] = None, use_cache: bool = True) -> RuleSet:
+    """
+    加载检测规则
+
+    Args:
+        rules_path: 规则文件路径（为None时使用 config/detection_rules.yaml）
+        overrides: 规则名称 -> 是否启用（default_config.yaml 中的 detection.rules）
+        use_cache: 是否使用磁盘上的编译缓存
+
+    Returns:
+        规则集
+
+    Raises:
+        OSError: 规则文件无法读取
+        ValueError: 规则无效
+    """
+    path = get_rules_file(rules_path)
+    content = path.read_bytes()
+    digest = rules_digest(content)
+
+    compiled = _read_cache(digest) if use_cache else None
+    if compiled is None:
+        compiled = compile_rules(yaml.safe_load(content.decode('utf-8')) or {})
+        if use_cache:
+            _write_cache(digest, compiled)
+        logger.info(f"检测规则已编译: {path}")
+
+    return build_rule_set(compiled, overrides, digest)
@@ -0,0 +1,101 @@
+"""
+数字串/字母数字串扫描
+一次扫描找出文本中所有完整的数字串和长字母数字串，按长度、形状和分隔符归类为
+手机号、固定电话、身份证、IPv4、信用卡、银行卡和API密钥的匹配位置，
+结果与对应正则逐个 finditer 完全一致，但不需要每个正则各自扫描全文
+"""
+import re
+from typing import Dict, Iterable, List, Pattern, Tuple
+
+# 可由本模块代替的正则（RegexDetector 中的模式与此处完全相同时才使用扫描结果）
+SCANNED_PATTERNS = {
+    'phone_cn': r'(?<![0-9])1[3-9]\d{9}(?![0-9])',
+    'phone_landline': r'(?<![0-9])\d{3,4}-\d{7,8}(?![0-9])',
+    'id_card_cn': r'(?<![0-9])[1-9]\d{5}(19|20)\d{2}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])\d{3}[\dXx](?![0-9])',
+    'ipv4': r'(?<![0-9.])(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)(?![0-9.])',
+    'api_key': r'(?<![A-Za-z0-9])[A-Za-z0-9]{32,64}(?![A-Za-z0-9])',
+    'credit_card': r'(?<![0-9])\d{4}[- ]?\d{4}[- ]?\d{4}[- ]?\d{4}(?![0-9])',
+    'bank_card': r'(?<![0-9])\d{16,19}(?![0-9])',
+}
+
+# 候选串：长度不少于32的完整字母数字串（API密钥），或可能作为匹配开头的完整数字串
+# （长度不少于3，或后面紧跟 . 的1~2位数字，即IPv4的第一段）
+_RUN_PATTERN = re.compile(r'(?P<alnum>(?<![A-Za-z0-9])[A-Za-z0-9]{32,})|(?<![0-9])(?:[0-9]{3,}|[0-9]{1,2}(?=\.))')
+_DIGIT_RUN_PATTERN = re.compile(r'(?<![0-9])(?:[0-9]{3,}|[0-9]{1,2}(?=\.))')
+
+# 正则中的 \d 还匹配全角等非ASCII数字，文本中有这类数字时不能只按ASCII数字串归类
+_NON_ASCII_DIGIT = re.compile(r'(?![0-9])\d')
+
+_PHONE_SECOND_DIGITS = frozenset('3456789')
+
+# 可能产生匹配的数字串长度（另外1~3位且后面是 . 的数字串可能是IPv4）
+_CANDIDATE_SIZES = frozenset((3, 4, 8, 11, 12, 16, 17, 18, 19))
+
+
+def can_scan(text: str) -> bool:
+    """文本中的数字是否都是ASCII数字（否则需要使用正则逐个扫描）"""
+    return text.isascii() or _NON_ASCII_DIGIT.search(text) is None
+
+
+def scan_runs(text: str, patterns: Dict[str, Pattern], types: Iterable[str]) -> Dict[str, List[Tuple[int, int]]]:
+    """
+    扫描文本，返回各类型的匹配位置
+
+    数字类模式开头的否定断言都是 (?<![0-9])，匹配只能从完整数字串的开头开始：
+    手机号、银行卡号就是整个数字串，直接按长度和前缀判断；固定电话、身份证、IPv4、信用卡
+    只在形状符合的数字串开头用对应正则做锚定匹配。API密钥是长度32~64的完整字母数字串。
+    每种类型记录上一个匹配的结束位置，保证与 finditer 一样不产生重叠匹配。
+
+    Args:
+        text: 待扫描的文本（调用前需用 can_scan 确认）
+        patterns: 类型 -> 编译后的正则（与 SCANNED_PATTERNS 相同）
+        types: 需要扫描的类型
+
+    Returns:
+        类型 -> [(起始位置, 结束位置), ...]（按起始位置递增）
+    """
+    types = set(types)
+    spans = {name: [] for name in types}
+    last_end = {name: 0 for name in types}
+    length = len(text)
+
+    def add_anchored(name: str, start: int):
+        if name in types and start >= last_end[name]:
+            match = patterns[name].match(text, start)
+            if match:
+                spans[name].append((start, match.end()))
+                last_end[name] = match.end()
+
+    def add_digit_run(start: int, end: int):
+        size = end - start
+        next_char = text[end] if end < length else ''
+        if size not in _CANDIDATE_SIZES and next_char != '.':
+            return
+
+        if size == 11 and 'phone_cn' in types and text[start] == '1' and text[start + 1] in _PHONE_SECOND_DIGITS:
+            spans['phone_cn'].append((start, end))
+        if size in (3, 4) and next_char == '-':
+            add_anchored('phone_landline', start)
+        if size in (17, 18):
+            add_anchored('id_card_cn', start)
+        if size <= 3 and next_char == '.' and (start == 0 or text[start - 1] != '.'):
+            add_anchored('ipv4', start)
+        if size in (4, 8, 12, 16):
+            add_anchored('credit_card', start)
+        if 16 <= size <= 19 and 'bank_card' in types:
+            spans['bank_card'].append((start, end))
+
+    for match in _RUN_PATTERN.finditer(text):
+        start, end = match.span()
+        if match.lastgroup != 'alnum':
+            add_digit_run(start, end)
+            continue
+
+        # 长字母数字串：本身可能是API密钥，其中的数字串也可能是手机号等（数字模式只要求前后不是数字）
+        if 'api_key' in types and end - start <= 64:
+            spans['api_key'].append((start, end))
+        # 多取一个字符，IPv4第一段的 (?=\.) 需要看到串后的字符
+        for digit_match in _DIGIT_RUN_PATTERN.finditer(text, start, end + 1):
+            add_digit_run(*digit_match.span())
+
+    return spans
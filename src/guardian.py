@@ -2,13 +2,26 @@
 AI Chat Guardian 核心类
 整合所有检测和混淆模块
 """
+import copy
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, field
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Tuple, Iterator, TextIO
+from dataclasses import dataclass, field, replace
 
 from .detectors import RegexDetector, KeywordDetector, AIDetector
+from .detectors.overlap import merge_overlaps
+from .detectors.llm_cache import LLMResultCache
+from .detectors.proximity import DEFAULT_WINDOW as DEFAULT_PROXIMITY_WINDOW
+from .detectors.rules import file_digest, get_rules_file, load_rules
 from .obfuscators import Obfuscator
-from .utils import load_config, load_sensitive_keywords
+from .result_cache import ResultCache
+from .utils import load_config, load_sensitive_keywords, get_cache_dir
 
 # 尝试导入LLM检测器
 try:
@@ -25,6 +38,73 @@ except ImportError:
 
 LLM_AVAILABLE = LLM_LOCAL_AVAILABLE or LLM_API_AVAILABLE
 
+# 检测器名称（按合并顺序排列，保证输出确定）
+DETECTOR_ORDER = ('regex', 'keyword', 'ai', 'llm')
+DETECTOR_LABELS = {'regex': '正则', 'keyword': '关键词', 'ai': 'AI', 'llm': 'LLM'}
+
+# 支持的执行模式（默认与 config/default_config.yaml 一致）
+EXECUTION_MODES = ('sequential', 'thread', 'process')
+DEFAULT_EXECUTION_MODE = 'thread'
+
+# 可放入进程池执行的检测器（纯CPU计算且可序列化）
+PROCESS_POOL_DETECTORS = ('regex', 'keyword')
+
+# 只有正则/关键词检测器时，短于该长度的文本直接依次执行（分发到线程/进程池的开销大于并发收益）
+CONCURRENT_MIN_LENGTH = 2000
+
+# 估算结果缓存占用时，每条检测/混淆详情及结果对象本身的大致开销（字节，包括字典的键）
+RESULT_DETAIL_SIZE = 896
+RESULT_BASE_SIZE = 2048
+
+# 流式扫描的窗口大小和重叠（字符数），重叠需大于最长的单个匹配
+STREAM_WINDOW_SIZE = 256 * 1024
+STREAM_OVERLAP = 4096
+
+# 分段缓存模式的段落分隔符（空行）
+SEGMENT_SEPARATOR = re.compile(r'\n[ \t\r]*\n\s*')
+
+# 进程池工作进程中的检测器实例
+_worker_detectors: Dict[str, Any] = {}
+
+
+def split_segments(text: str) -> List[Tuple[int, int]]:
+    """
+    按空行把文本切分为段落，返回各段的 (起始, 结束) 位置（不含分隔符）
+
+    段落边界只取决于段落自身内容，修改某一段不会影响其他段的切分结果。
+    """
+    segments = []
+    start = 0
+    for match in SEGMENT_SEPARATOR.finditer(text):
+        if match.start() > start:
+            segments.append((start, match.start()))
+        start = match.end()
+    if start < len(text):
+        segments.append((start, len(text)))
+    return segments
+
+
+def _digest(*parts: Any) -> str:
+    """按JSON序列化计算若干配置片段的SHA-256"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _init_process_worker(detectors: Dict[str, Any]):
+    """进程池工作进程初始化：保存检测器副本，避免每次调用都序列化"""
+    _worker_detectors.clear()
+    _worker_detectors.update(detectors)
+
+
+def _run_in_process(name: str, text: str) -> Tuple[List[Any], float]:
+    """在工作进程中运行检测器，返回 (结果, 耗时)"""
+    start_time = time.perf_counter()
+    results = _worker_detectors[name].detect(text)
+    return results, time.perf_counter() - start_time
+
 
 @dataclass
 class GuardianResult:
@@ -37,46 +117,119 @@ class GuardianResult:
     obfuscation_details: List[Dict[str, Any]] = field(default_factory=list)  # 混淆详情
     warnings: List[str] = field(default_factory=list)  # 警告信息
     llm_raw_response: str = ""  # LLM原始响应（用于调试）
+    timings: Dict[str, Any] = field(default_factory=dict)  # 耗时（秒）和计数统计：total / detectors / candidates / merge / obfuscation
+
+
+@dataclass
+class LLMDetection:
+    """LLM检测结果（转换为与其他检测器一致的格式）"""
+    start: int  # 起始位置
+    end: int  # 结束位置
+    confidence: float  # 置信度
+    category: str  # 类别
+    type: str  # 类型（与类别相同）
+    metadata: Dict[str, Any] = field(default_factory=dict)  # 附加信息
+
+    @classmethod
+    def from_match(cls, match: Any) -> 'LLMDetection':
+        """从LLMMatch创建"""
+        return cls(start=match.start,
+                   end=match.end,
+                   confidence=match.confidence,
+                   category=match.category,
+                   type=match.category,
+                   metadata={
+                       'reason': match.reason,
+                       'source': 'llm'
+                   })
 
 
 class ChatGuardian:
     """AI聊天守护者主类"""
-    def __init__(self, config_path: str = None, keywords_path: str = None):
+    def __init__(self, config_path: str = None, keywords_path: str = None, result_cache: Optional[ResultCache] = None, previous: Optional['ChatGuardian'] = None):
         """
         初始化守护者
         
         Args:
             config_path: 配置文件路径
             keywords_path: 关键词文件路径
+            result_cache: 共享的检测结果缓存（为None时按配置创建）
+            previous: 重新加载前的实例，复用其中配置未变化的检测器和缓存
         """
         self.logger = logging.getLogger(__name__)
 
         # 加载配置
         self.config = load_config(config_path)
         self.keywords = load_sensitive_keywords(keywords_path)
+        self.rules_path = get_rules_file(self.config.get('detection', {}).get('rules_path'))
+        self.rules_digest = file_digest(self.rules_path)
+
+        # 配置、关键词和检测规则的指纹：作为结果缓存键的一部分，配置变化后旧结果自动失效
+        self.fingerprint = self._compute_fingerprint()
+
+        # 各组件相关配置的签名：重新加载时签名未变化的组件直接复用
+        self.component_signatures = self._compute_component_signatures()
+        reused = self._find_reusable_components(previous)
+
+        if result_cache is not None:
+            self.result_cache = result_cache
+        elif 'result_cache' in reused:
+            self.result_cache = previous.result_cache
+        else:
+            self.result_cache = self._create_result_cache(self.config.get('result_cache', {}))
+
+        # 分段缓存模式：按段落缓存检测结果，再次检查时只检测新增或修改过的段落
+        if 'segment_cache' in reused:
+            self.segment_cache = previous.segment_cache
+        else:
+            self.segment_cache = self._create_segment_cache(self.config.get('segment_cache', {}))
+
+        # 执行模式（sequential: 依次执行，thread: 线程池并发，process: CPU密集型检测器使用进程池）
+        detection_config = self.config.get('detection', {})
+        self.execution_mode = detection_config.get('execution_mode', DEFAULT_EXECUTION_MODE)
+        if self.execution_mode not in EXECUTION_MODES:
+            self.logger.warning(f"未知的执行模式: {self.execution_mode}，使用 {DEFAULT_EXECUTION_MODE}")
+            self.execution_mode = DEFAULT_EXECUTION_MODE
+        self.max_workers = max(1, int(detection_config.get('max_workers', len(DETECTOR_ORDER))))
+        self._thread_pool = None
+        self._process_pool = None
+        self._pool_users = 0  # 正在使用线程池/进程池的检测数
+        self._pool_cond = threading.Condition()
+        self._closed = False
 
         # 初始化检测器
-        self._init_detectors()
+        self._init_detectors(previous, reused)
 
         # 初始化混淆器
         self.obfuscator = Obfuscator(self.config.get('obfuscation', {}))
 
         self.logger.info("AI Chat Guardian 初始化完成")
 
-    def _init_detectors(self):
-        """初始化所有检测器"""
+    def _init_detectors(self, previous: Optional['ChatGuardian'] = None, reused: frozenset = frozenset()):
+        """
+        初始化所有检测器
+
+        Args:
+            previous: 重新加载前的实例
+            reused: 可以从 previous 直接复用的组件名称
+        """
         detection_config = self.config.get('detection', {})
 
         # 正则检测器
-        if detection_config.get('enable_regex', True):
-            self.regex_detector = RegexDetector()
-            self.logger.info("正则检测器已启用")
+        if 'regex' in reused:
+            self._reuse_detector(previous, 'regex')
+        elif detection_config.get('enable_regex', True):
+            rules = load_rules(detection_config.get('rules_path'), detection_config.get('rules'))
+            self.regex_detector = RegexDetector(rules=rules, proximity_window=detection_config.get('proximity_window', DEFAULT_PROXIMITY_WINDOW))
+            self.logger.info(f"正则检测器已启用 (已禁用规则: {', '.join(rules.disabled) or '无'})")
         else:
             self.regex_detector = None
             self.logger.info("正则检测器已禁用")
 
         # 关键词检测器
-        if detection_config.get('enable_keyword', True):
+        if 'keyword' in reused:
+            self._reuse_detector(previous, 'keyword')
+        elif detection_config.get('enable_keyword', True):
             self.keyword_detector = KeywordDetector(self.keywords)
             self.logger.info("关键词检测器已启用")
         else:
@@ -84,11 +237,13 @@ class ChatGuardian:
             self.logger.info("关键词检测器已禁用")
 
         # AI检测器
-        if detection_config.get('enable_ai', False):
+        if 'ai' in reused:
+            self._reuse_detector(previous, 'ai')
+        elif detection_config.get('enable_ai', False):
             try:
                 ai_config = self.config.get('ai_model', {})
                 # 使用AI检测器（用于你自己训练的模型）
-                self.ai_detector = AIDetector(model_name=ai_config.get('model_name', 'bert-base-chinese'), use_gpu=ai_config.get('use_gpu', False), mode=ai_config.get('mode', 'zero-shot'))
+                self.ai_detector = AIDetector(model_name=ai_config.get('model_name', 'bert-base-chinese'), use_gpu=ai_config.get('use_gpu', False), mode=ai_config.get('mode', 'zero-shot'), batch_size=ai_config.get('batch_size', 8))
                 if self.ai_detector.is_available():
                     self.logger.info(f"AI检测器已启用 (模式: {ai_config.get('mode', 'zero-shot')})")
                 else:
@@ -102,11 +257,14 @@ class ChatGuardian:
             self.logger.info("AI检测器已禁用")
 
         # LLM检测器（本地Ollama或在线API）
-        if LLM_AVAILABLE:
+        if 'llm' in reused:
+            self._reuse_detector(previous, 'llm')
+        elif LLM_AVAILABLE:
             llm_config = self.config.get('llm_detector', {})
             if llm_config.get('enable', False):
                 try:
                     llm_type = llm_config.get('type', 'local')  # 默认使用本地模式
+                    llm_cache = self._create_llm_cache(llm_config.get('cache', {}))
 
                     if llm_type == 'api' and LLM_API_AVAILABLE:
                         # 使用在线API
@@ -114,7 +272,10 @@ class ChatGuardian:
                         self.llm_detector = LLMDetectorAPI(provider=api_config.get('provider', 'zhipu'),
                                                            api_key=api_config.get('api_key') or None,
                                                            model=api_config.get('model') or None,
-                                                           base_url=api_config.get('base_url') or None)
+                                                           base_url=api_config.get('base_url') or None,
+                                                           http_config=llm_config.get('http', {}),
+                                                           cache=llm_cache,
+                                                           chunk_config=llm_config.get('chunking', {}))
                         if self.llm_detector.is_available():
                             info = self.llm_detector.get_info()
                             self.logger.info(f"LLM API检测器已启用 ({info['provider_name']}/{info['model']})")
@@ -125,7 +286,12 @@ class ChatGuardian:
                     elif llm_type == 'local' and LLM_LOCAL_AVAILABLE:
                         # 使用本地Ollama
                         local_config = llm_config.get('local', {})
-                        self.llm_detector = LLMDetector(model=local_config.get('model', 'qwen2:7b'), base_url=local_config.get('base_url', 'http://localhost:11434'))
+                        self.llm_detector = LLMDetector(model=local_config.get('model', 'qwen2:7b'),
+                                                        base_url=local_config.get('base_url', 'http://localhost:11434'),
+                                                        http_config=llm_config.get('http', {}),
+                                                        cache=llm_cache,
+                                                        chunk_config=llm_config.get('chunking', {}),
+                                                        stream=local_config.get('stream', True))
                         if self.llm_detector.is_available():
                             self.logger.info(f"✓ LLM本地检测器已启用 (Ollama/{local_config.get('model', 'qwen2:7b')})")
                         else:
@@ -151,13 +317,104 @@ class ChatGuardian:
             self.llm_detector = None
             self.logger.debug("LLM检测器模块不可用")
 
-    def check_text(self, text: str, auto_obfuscate: bool = True) -> GuardianResult:
+    def _reuse_detector(self, previous: 'ChatGuardian', name: str):
+        """复用旧实例中配置未变化的检测器"""
+        setattr(self, f'{name}_detector', getattr(previous, f'{name}_detector'))
+        self.logger.info(f"{DETECTOR_LABELS[name]}检测器配置未变化，复用现有实例")
+
+    def _create_llm_cache(self, cache_config: Dict[str, Any]) -> Optional[LLMResultCache]:
+        """根据配置创建LLM响应缓存（未启用或失败时返回None）"""
+        if not cache_config.get('enable', False):
+            return None
+
+        try:
+            path = cache_config.get('path') or str(get_cache_dir() / 'llm_cache.sqlite3')
+            cache = LLMResultCache(path,
+                                   max_entries=cache_config.get('max_entries', 10000),
+                                   max_size_mb=cache_config.get('max_size_mb', 100),
+                                   ttl_seconds=float(cache_config.get('ttl_hours', 168)) * 3600)
+            self.logger.info(f"LLM结果缓存已启用: {path}")
+            return cache
+        except Exception as e:
+            self.logger.warning(f"LLM结果缓存初始化失败，将不使用缓存: {e}")
+            return None
+
+    def _create_result_cache(self, cache_config: Dict[str, Any]) -> Optional[ResultCache]:
+        """根据配置创建检测结果缓存（未启用时返回None）"""
+        if not cache_config.get('enable', False):
+            return None
+
+        cache = ResultCache(max_entries=cache_config.get('max_entries', 1024), max_memory_mb=cache_config.get('max_memory_mb', 64), ttl_seconds=cache_config.get('ttl_seconds', 300))
+        self.logger.info(f"检测结果缓存已启用 (最多 {cache.max_entries} 条, {cache_config.get('max_memory_mb', 64)}MB)")
+        return cache
+
+    def _create_segment_cache(self, cache_config: Dict[str, Any]) -> Optional[ResultCache]:
+        """根据配置创建段落检测结果缓存（未启用时返回None）"""
+        if not cache_config.get('enable', False):
+            return None
+
+        cache = ResultCache(max_entries=cache_config.get('max_entries', 4096), max_memory_mb=cache_config.get('max_memory_mb', 64), ttl_seconds=cache_config.get('ttl_seconds', 3600))
+        self.logger.info(f"分段缓存模式已启用 (最多 {cache.max_entries} 段)")
+        return cache
+
+    def _compute_fingerprint(self) -> str:
+        """计算当前配置、关键词和检测规则的指纹"""
+        return _digest(self.config, self.keywords, self.rules_digest)
+
+    def _compute_component_signatures(self) -> Dict[str, str]:
+        """计算各检测器和缓存所依赖配置的签名"""
+        detection_config = self.config.get('detection', {})
+        return {
+            'regex': _digest(detection_config.get('enable_regex', True), detection_config.get('proximity_window', DEFAULT_PROXIMITY_WINDOW), detection_config.get('rules'), self.rules_digest),
+            'keyword': _digest(detection_config.get('enable_keyword', True), self.keywords),
+            'ai': _digest(detection_config.get('enable_ai', False), self.config.get('ai_model', {})),
+            'llm': _digest(self.config.get('llm_detector', {})),
+            'result_cache': _digest(self.config.get('result_cache', {})),
+            'segment_cache': _digest(self.config.get('segment_cache', {}))
+        }
+
+    def _find_reusable_components(self, previous: Optional['ChatGuardian']) -> frozenset:
+        """
+        找出可以从旧实例复用的组件：配置签名相同，且旧实例中的组件可用（不可用的检测器重新初始化）
+        """
+        if previous is None:
+            return frozenset()
+
+        reusable = set()
+        for name, signature in self.component_signatures.items():
+            if previous.component_signatures.get(name) != signature:
+                continue
+            attr = name if name.endswith('_cache') else f'{name}_detector'
+            if getattr(previous, attr, None) is not None:
+                reusable.add(name)
+        return frozenset(reusable)
+
+    def _make_cache_key(self, text: str, auto_obfuscate: bool) -> Tuple[str, str, bool]:
+        """结果缓存键：文本哈希 + 配置指纹 + 是否混淆"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest(), self.fingerprint, auto_obfuscate
+
+    @staticmethod
+    def _estimate_result_size(result: GuardianResult) -> int:
+        """快速估算检测结果占用的内存：文本本身加上每条详情的固定开销"""
+        text_size = sys.getsizeof(result.original_text) + sys.getsizeof(result.safe_text) + sys.getsizeof(result.llm_raw_response)
+        return text_size + RESULT_BASE_SIZE + RESULT_DETAIL_SIZE * (len(result.detections) + len(result.obfuscation_details))
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取检测结果缓存统计（未启用时返回空字典，启用分段缓存时附带段落缓存统计）"""
+        stats = self.result_cache.get_stats() if self.result_cache is not None else {}
+        if self.segment_cache is not None:
+            stats = {**stats, 'segments': self.segment_cache.get_stats()}
+        return stats
+
+    def check_text(self, text: str, auto_obfuscate: bool = True, on_llm_match: Optional[Callable[[LLMDetection], None]] = None) -> GuardianResult:
         """
         检查文本中的敏感信息
         
         Args:
             text: 待检查的文本
             auto_obfuscate: 是否自动混淆
+            on_llm_match: LLM每得到一个检测结果即调用（位置为原文位置，本地模型流式输出时无需等整个检测结束），
+                          结果来自缓存时不调用
         
         Returns:
             检测结果
@@ -165,77 +422,44 @@ class ChatGuardian:
         if not text or not text.strip():
             return GuardianResult(original_text=text, safe_text=text, has_sensitive=False, detection_count=0)
 
-        self.logger.info(f"开始检测文本，长度: {len(text)}")
-
-        # 收集所有检测结果
-        all_detections = []
-        warnings = []
-
-        # 1. 正则检测
-        if self.regex_detector:
-            try:
-                regex_results = self.regex_detector.detect(text)
-                all_detections.extend(regex_results)
-                self.logger.debug(f"正则检测发现 {len(regex_results)} 处敏感信息")
-            except Exception as e:
-                self.logger.error(f"正则检测出错: {e}")
-                warnings.append(f"正则检测出错: {str(e)}")
+        start_time = time.perf_counter()
 
-        # 2. 关键词检测
-        if self.keyword_detector:
-            try:
-                keyword_results = self.keyword_detector.detect(text)
-                all_detections.extend(keyword_results)
-                self.logger.debug(f"关键词检测发现 {len(keyword_results)} 处敏感信息")
-            except Exception as e:
-                self.logger.error(f"关键词检测出错: {e}")
-                warnings.append(f"关键词检测出错: {str(e)}")
+        # 相同文本和配置直接复用缓存的结果
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self._make_cache_key(text, auto_obfuscate)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info(f"命中检测结果缓存，长度: {len(text)}")
+                # 深拷贝：调用方修改返回结果中的列表不会影响缓存
+                result = copy.deepcopy(cached)
+                result.timings.update(cached=True, total=time.perf_counter() - start_time)
+                return result
 
-        # 3. AI语义检测
-        if self.ai_detector:
-            try:
-                threshold = self.config.get('detection', {}).get('confidence_threshold', 0.7)
-                ai_results = self.ai_detector.detect(text, threshold)
-                all_detections.extend(ai_results)
-                self.logger.debug(f"AI检测发现 {len(ai_results)} 处敏感信息")
-            except Exception as e:
-                self.logger.error(f"AI检测出错: {e}")
-                warnings.append(f"AI检测出错: {str(e)}")
+        self.logger.info(f"开始检测文本，长度: {len(text)}")
 
-        # 4. LLM检测
-        if self.llm_detector:
-            try:
-                llm_threshold = self.config.get('llm_detector', {}).get('threshold', 0.7)
-                llm_results = self.llm_detector.detect(text, llm_threshold)
-                # 将LLM结果转换为统一格式
-                for llm_match in llm_results:
-                    # 创建一个类似其他检测器的结果对象
-                    class LLMDetection:
-                        def __init__(self, match):
-                            self.start = match.start
-                            self.end = match.end
-                            self.confidence = match.confidence
-                            self.category = match.category
-                            self.type = match.category
-                            self.metadata = {'reason': match.reason, 'source': 'llm'}
-
-                    all_detections.append(LLMDetection(llm_match))
-                self.logger.debug(f"LLM检测发现 {len(llm_results)} 处敏感信息")
-            except Exception as e:
-                self.logger.error(f"LLM检测出错: {e}")
-                warnings.append(f"LLM检测出错: {str(e)}")
+        # 运行所有已启用的检测器（分段缓存模式下只检测未缓存的段落）
+        segment_stats = None
+        if self.segment_cache is not None:
+            all_detections, warnings, detector_timings, candidates, segment_stats = self._run_detectors_segmented(text, on_llm_match)
+        else:
+            all_detections, warnings, detector_timings, candidates = self._run_detectors(text, on_llm_match)
 
-        # 去重和合并
+        # 去重和合并（分段模式下同样在全文范围内进行，处理跨段落的重叠）
+        merge_start = time.perf_counter()
         all_detections = self._merge_detections(all_detections)
+        merge_time = time.perf_counter() - merge_start
 
         has_sensitive = len(all_detections) > 0
 
         # 混淆处理
+        obfuscation_start = time.perf_counter()
         if auto_obfuscate and has_sensitive:
             safe_text, obfuscation_details = self.obfuscator.obfuscate(text, all_detections)
         else:
             safe_text = text
             obfuscation_details = []
+        obfuscation_time = time.perf_counter() - obfuscation_start
 
         # 构建检测详情
         detection_details = self._build_detection_details(all_detections, text)
@@ -252,12 +476,232 @@ class ChatGuardian:
                                 detections=detection_details,
                                 obfuscation_details=obfuscation_details,
                                 warnings=warnings,
-                                llm_raw_response=llm_raw_response)
+                                llm_raw_response=llm_raw_response,
+                                timings={
+                                    'execution_mode': self.execution_mode,
+                                    'cached': False,
+                                    'detectors': detector_timings,
+                                    'candidates': candidates,
+                                    'merge': merge_time,
+                                    'obfuscation': obfuscation_time
+                                })
+        if segment_stats is not None:
+            result.timings['segments'] = segment_stats
+        result.timings['total'] = time.perf_counter() - start_time
 
         self.logger.info(f"检测完成，发现 {len(all_detections)} 处敏感信息")
 
+        # 有警告（如检测器出错）的结果可能不完整，不缓存
+        if cache_key is not None and not warnings:
+            self.result_cache.set(cache_key, copy.deepcopy(result), size=self._estimate_result_size(result))
+
         return result
 
+    def _get_detector_jobs(self, on_llm_match: Optional[Callable[[LLMDetection], None]] = None) -> List[Tuple[str, Callable[[str], List[Any]]]]:
+        """按固定顺序返回已启用的检测任务 [(名称, 检测函数)]"""
+        jobs = []
+        if self.regex_detector:
+            jobs.append(('regex', self.regex_detector.detect))
+        if self.keyword_detector:
+            jobs.append(('keyword', self.keyword_detector.detect))
+        if self.ai_detector:
+            jobs.append(('ai', self._detect_ai))
+        if self.llm_detector:
+            jobs.append(('llm', lambda text: self._detect_llm(text, on_llm_match)))
+        return jobs
+
+    def _detect_ai(self, text: str) -> List[Any]:
+        """AI语义检测"""
+        threshold = self.config.get('detection', {}).get('confidence_threshold', 0.7)
+        return self.ai_detector.detect(text, threshold)
+
+    def _detect_llm(self, text: str, on_match: Optional[Callable[[LLMDetection], None]] = None) -> List[LLMDetection]:
+        """LLM检测，并将结果转换为统一格式"""
+        llm_threshold = self.config.get('llm_detector', {}).get('threshold', 0.7)
+        on_llm_match = (lambda llm_match: on_match(LLMDetection.from_match(llm_match))) if on_match is not None else None
+        llm_results = self.llm_detector.detect(text, llm_threshold, on_match=on_llm_match)
+        return [LLMDetection.from_match(llm_match) for llm_match in llm_results]
+
+    def _run_detectors(self, text: str, on_llm_match: Optional[Callable[[LLMDetection], None]] = None) -> Tuple[List[Any], List[str], Dict[str, float], Dict[str, int]]:
+        """
+        按执行模式运行检测器，并按固定顺序汇总结果
+        
+        Args:
+            text: 待检查的文本
+            on_llm_match: LLM检测结果的回调
+        
+        Returns:
+            (检测结果列表, 警告列表, 各检测器耗时, 各检测器候选结果数)
+        """
+        jobs = self._get_detector_jobs(on_llm_match)
+
+        def timed(func: Callable[[str], List[Any]]) -> Tuple[List[Any], float]:
+            start_time = time.perf_counter()
+            results = func(text)
+            return results, time.perf_counter() - start_time
+
+        # 提交任务（只有一个检测器，或只有快速检测器且文本较短时无需并发；已关闭的实例同样依次执行）
+        outcomes = {}
+        run_inline = len(text) < CONCURRENT_MIN_LENGTH and all(name in PROCESS_POOL_DETECTORS for name, _ in jobs)
+        if self.execution_mode == 'sequential' or len(jobs) <= 1 or run_inline or not self._acquire_pools():
+            for name, func in jobs:
+                try:
+                    outcomes[name] = timed(func)
+                except Exception as e:
+                    outcomes[name] = e
+        else:
+            try:
+                futures = {}
+                for name, func in jobs:
+                    if self.execution_mode == 'process' and name in PROCESS_POOL_DETECTORS:
+                        pool, task = self._get_process_pool(), (_run_in_process, name, text)
+                    else:
+                        pool, task = self._get_thread_pool(), (timed, func)
+                    # 检测过程中实例被 close()（不等待）时，尚未提交的任务在调用线程中执行
+                    try:
+                        futures[name] = pool.submit(*task) if pool is not None else None
+                    except RuntimeError:
+                        futures[name] = None
+
+                for name, func in jobs:
+                    try:
+                        future = futures[name]
+                        outcomes[name] = future.result() if future is not None else timed(func)
+                    except Exception as e:
+                        outcomes[name] = e
+            finally:
+                self._release_pools()
+
+        # 按固定顺序合并，保证输出确定
+        all_detections = []
+        warnings = []
+        timings = {}
+        candidates = {}
+        for name, _ in jobs:
+            label = DETECTOR_LABELS[name]
+            outcome = outcomes[name]
+            if isinstance(outcome, Exception):
+                self.logger.error(f"{label}检测出错: {outcome}")
+                warnings.append(f"{label}检测出错: {str(outcome)}")
+                continue
+
+            results, elapsed = outcome
+            all_detections.extend(results)
+            timings[name] = elapsed
+            candidates[name] = len(results)
+            self.logger.debug(f"{label}检测发现 {len(results)} 处敏感信息 (耗时: {elapsed * 1000:.1f}ms)")
+
+        return all_detections, warnings, timings, candidates
+
+    def _run_detectors_segmented(self, text: str, on_llm_match: Optional[Callable[[LLMDetection], None]] = None) -> Tuple[List[Any], List[str], Dict[str, float], Dict[str, int], Dict[str, int]]:
+        """
+        分段运行检测器：按段落内容哈希复用缓存结果，只检测新增或修改过的段落
+        
+        Args:
+            text: 待检查的文本
+            on_llm_match: LLM检测结果的回调（位置换算为全文位置，复用缓存的段落不回调）
+        
+        Returns:
+            (换算为全文位置的检测结果, 警告列表, 各检测器累计耗时, 各检测器累计候选结果数, 段落统计)
+        """
+        all_detections = []
+        warnings = []
+        timings = {}
+        candidates = {}
+        stats = {'total': 0, 'cached': 0}
+
+        for start, end in split_segments(text):
+            segment = text[start:end]
+            key = (hashlib.sha256(segment.encode('utf-8')).hexdigest(), self.fingerprint)
+            stats['total'] += 1
+
+            detections = self.segment_cache.get(key)
+            if detections is not None:
+                stats['cached'] += 1
+            else:
+                on_segment_match = None
+                if on_llm_match is not None:
+                    on_segment_match = lambda detection, offset=start: on_llm_match(replace(detection, start=detection.start + offset, end=detection.end + offset))
+                detections, segment_warnings, segment_timings, segment_candidates = self._run_detectors(segment, on_segment_match)
+                warnings.extend(segment_warnings)
+                for name, elapsed in segment_timings.items():
+                    timings[name] = timings.get(name, 0.0) + elapsed
+                for name, count in segment_candidates.items():
+                    candidates[name] = candidates.get(name, 0) + count
+
+                # 检测出错的段落下次重新检测
+                if not segment_warnings:
+                    self.segment_cache.set(key, detections)
+
+            # 段内位置换算为全文位置
+            all_detections.extend(replace(detection, start=detection.start + start, end=detection.end + start) for detection in detections)
+
+        self.logger.debug(f"分段检测: 共 {stats['total']} 段，复用缓存 {stats['cached']} 段")
+        return all_detections, warnings, timings, candidates, stats
+
+    def _get_thread_pool(self) -> Optional[ThreadPoolExecutor]:
+        """获取（按需创建）线程池，实例已关闭时返回None（不再创建无人释放的线程池）"""
+        with self._pool_cond:
+            if self._closed:
+                return None
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='guardian-detector')
+            return self._thread_pool
+
+    def _get_process_pool(self) -> Optional[ProcessPoolExecutor]:
+        """获取（按需创建）进程池，检测器在工作进程启动时只传递一次；实例已关闭时返回None"""
+        with self._pool_cond:
+            if self._closed:
+                return None
+            if self._process_pool is None:
+                detectors = {}
+                if self.regex_detector:
+                    detectors['regex'] = self.regex_detector
+                if self.keyword_detector:
+                    detectors['keyword'] = self.keyword_detector
+                workers = min(self.max_workers, len(PROCESS_POOL_DETECTORS))
+                self._process_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker, initargs=(detectors, ))
+            return self._process_pool
+
+    def __enter__(self) -> 'ChatGuardian':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """退出 with 语句时释放线程池/进程池"""
+        self.close()
+
+    def _acquire_pools(self) -> bool:
+        """登记一次使用线程池/进程池的检测，实例已关闭时返回False"""
+        with self._pool_cond:
+            if self._closed:
+                return False
+            self._pool_users += 1
+            return True
+
+    def _release_pools(self):
+        with self._pool_cond:
+            self._pool_users -= 1
+            self._pool_cond.notify_all()
+
+    def close(self, wait: bool = False):
+        """
+        释放线程池/进程池资源（之后的检测在调用线程中依次执行）
+        
+        Args:
+            wait: 是否先等待正在使用线程池/进程池的检测完成（如等待中的LLM请求）
+        """
+        with self._pool_cond:
+            self._closed = True
+            if wait:
+                self._pool_cond.wait_for(lambda: self._pool_users == 0)
+            pools = (self._thread_pool, self._process_pool)
+            self._thread_pool = None
+            self._process_pool = None
+
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False)
+
     def _merge_detections(self, detections: List[Any]) -> List[Any]:
         """
         合并重叠的检测结果
@@ -271,53 +715,8 @@ class ChatGuardian:
         if not detections:
             return []
 
-        # 按位置排序
-        sorted_detections = sorted(detections, key=lambda x: (x.start, -x.confidence))
-
-        # 去除重叠的检测（保留置信度更高或更早的）
-        merged = []
-        for detection in sorted_detections:
-            should_add = True
-            for i, existing in enumerate(merged):
-                # 检查是否有任何重叠
-                if not (detection.end <= existing.start or detection.start >= existing.end):
-                    # 有重叠
-                    # 如果新检测被现有检测完全包含，跳过
-                    if detection.start >= existing.start and detection.end <= existing.end:
-                        should_add = False
-                        break
-                    # 如果新检测完全包含现有检测，且置信度更高，替换
-                    elif detection.start <= existing.start and detection.end >= existing.end:
-                        if detection.confidence >= existing.confidence:
-                            merged[i] = detection
-                            should_add = False
-                        else:
-                            should_add = False
-                        break
-                    # 部分重叠：选择置信度更高的，或者选择更长的
-                    else:
-                        # 计算重叠长度
-                        overlap_start = max(detection.start, existing.start)
-                        overlap_end = min(detection.end, existing.end)
-                        overlap_len = overlap_end - overlap_start
-
-                        detection_len = detection.end - detection.start
-                        existing_len = existing.end - existing.start
-
-                        # 如果重叠超过50%，选择置信度更高或更长的
-                        if overlap_len > min(detection_len, existing_len) * 0.5:
-                            if detection.confidence > existing.confidence or \
-                               (detection.confidence == existing.confidence and detection_len > existing_len):
-                                merged[i] = detection
-                                should_add = False
-                            else:
-                                should_add = False
-                            break
-
-            if should_add:
-                merged.append(detection)
-
-        return merged
+        # 扫描线合并（保留置信度更高或更早的）
+        return merge_overlaps(detections)
 
     def _build_detection_details(self, detections: List[Any], text: str) -> List[Dict[str, Any]]:
         """
@@ -363,6 +762,84 @@ class ChatGuardian:
             self.logger.error(f"读取文件失败 {file_path}: {e}")
             return GuardianResult(original_text="", safe_text="", has_sensitive=False, detection_count=0, warnings=[f"读取文件失败: {str(e)}"])
 
+    def scan_file_stream(self, file_path: str, sink: Optional[TextIO] = None, window_size: int = STREAM_WINDOW_SIZE, overlap: int = STREAM_OVERLAP) -> Iterator[Dict[str, Any]]:
+        """
+        流式扫描大文件：按滑动窗口读取，内存占用与文件大小无关
+        
+        每个窗口只运行正则和关键词检测器。窗口末尾 overlap 个字符内开始的匹配留到下一个窗口处理，
+        下一个窗口同时保留 overlap 个字符的左侧上下文，保证跨窗口的匹配与整体检测一致。
+        延伸到窗口末尾的长匹配会扩大窗口直到完整读入，内存占用只随最长的单个匹配增长。
+        
+        Args:
+            file_path: 文件路径
+            sink: 混淆后文本的输出（可写文本流），为None时不输出
+            window_size: 每次读取的字符数
+            overlap: 窗口之间的重叠字符数（需大于匹配所需的左侧上下文，如组合模式中各项的间隔）
+        
+        Yields:
+            检测详情（格式与 GuardianResult.detections 相同，位置为文件中的字符位置）
+        """
+        detectors = [detector for detector in (self.regex_detector, self.keyword_detector) if detector is not None]
+        if self.ai_detector is not None or self.llm_detector is not None:
+            self.logger.info("流式扫描只使用正则和关键词检测器")
+
+        window_size = max(1, int(window_size))
+        overlap = max(0, min(int(overlap), window_size))
+
+        buffer = ""  # 左侧上下文 + 待处理文本
+        context = 0  # buffer 开头已处理（仅作为上下文）的字符数
+        offset = 0  # buffer[0] 在文件中的位置
+
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            while True:
+                chunk = f.read(window_size)
+                eof = not chunk
+                buffer += chunk
+                if len(buffer) == context:
+                    break
+
+                # 检测当前窗口，丢弃在上下文中开始的结果（上一轮已处理）
+                detections = []
+                for detector in detectors:
+                    detections.extend(detection for detection in detector.detect(buffer) if detection.start >= context)
+                detections = sorted(self._merge_detections(detections), key=lambda x: x.start)
+
+                # 确定本轮输出的范围：末尾 overlap 内开始的匹配留到下一轮，已确认的匹配必须完整输出
+                cut = len(buffer) if eof else max(context, len(buffer) - overlap)
+                committed = []
+                for detection in detections:
+                    if detection.start >= cut:
+                        break
+                    committed.append(detection)
+                    cut = max(cut, detection.end)
+
+                # 延伸到窗口末尾的匹配（比重叠还长，如很长的连接串）可能被截断：再读一块扩大窗口后重新检测
+                if not eof and any(detection.end >= len(buffer) for detection in committed):
+                    continue
+
+                segment = buffer[context:cut]
+                local = [replace(detection, start=detection.start - context, end=detection.end - context) for detection in committed]
+
+                if sink is not None:
+                    safe_text = self.obfuscator.obfuscate(segment, local)[0] if local else segment
+                    sink.write(safe_text)
+
+                base = offset + context
+                for detail in self._build_detection_details(local, segment):
+                    detail['start'] += base
+                    detail['end'] += base
+                    detail['position'] = (detail['start'], detail['end'])
+                    yield detail
+
+                if eof:
+                    break
+
+                # 保留 overlap 个字符作为下一轮的左侧上下文
+                keep_from = max(0, cut - overlap)
+                buffer = buffer[keep_from:]
+                offset += keep_from
+                context = cut - keep_from
+
     def get_statistics(self, result: GuardianResult) -> Dict[str, Any]:
         """
         获取检测统计信息
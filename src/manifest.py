@@ -0,0 +1,100 @@
+"""
+扫描清单
+记录批量检测过的文件（路径、大小、修改时间、内容哈希）及其检测结果，
+再次扫描同一目录时跳过未变化的文件，内容相同的文件只检测一次
+"""
+import hashlib
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# 批量写入的条数
+FLUSH_EVERY = 1000
+
+
+def hash_file(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """计算文件内容的SHA-256（分块读取）"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ScanManifest:
+    """基于SQLite的扫描清单（结果按配置/关键词指纹区分，配置变化后自动失效）"""
+
+    def __init__(self, path: str, fingerprint: str):
+        """
+        打开扫描清单
+
+        Args:
+            path: SQLite数据库文件路径
+            fingerprint: 当前配置和关键词的指纹（ChatGuardian.fingerprint）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = str(path)
+        self.fingerprint = fingerprint
+        self._pending: List[tuple] = []
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=10)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS files ('
+                          'path TEXT NOT NULL, fingerprint TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, '
+                          'content_hash TEXT NOT NULL, scanned_at REAL NOT NULL, PRIMARY KEY (path, fingerprint))')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS contents ('
+                          'content_hash TEXT NOT NULL, fingerprint TEXT NOT NULL, has_sensitive INTEGER NOT NULL, '
+                          'detection_count INTEGER NOT NULL, PRIMARY KEY (content_hash, fingerprint))')
+        self.conn.commit()
+
+    def get_by_stat(self, path: str, size: int, mtime_ns: int) -> Optional[Tuple[bool, int]]:
+        """
+        按路径、大小和修改时间查找未变化文件的检测结果
+
+        Returns:
+            (是否包含敏感信息, 敏感信息数量)，文件未记录或已变化时返回None
+        """
+        row = self.conn.execute('SELECT c.has_sensitive, c.detection_count FROM files f '
+                                'JOIN contents c ON c.content_hash = f.content_hash AND c.fingerprint = f.fingerprint '
+                                'WHERE f.path = ? AND f.fingerprint = ? AND f.size = ? AND f.mtime_ns = ?', (path, self.fingerprint, size, mtime_ns)).fetchone()
+        return (bool(row[0]), row[1]) if row else None
+
+    def get_by_hash(self, content_hash: str) -> Optional[Tuple[bool, int]]:
+        """
+        按内容哈希查找检测结果（其他路径下内容相同的文件）
+
+        Returns:
+            (是否包含敏感信息, 敏感信息数量)，未记录时返回None
+        """
+        row = self.conn.execute('SELECT has_sensitive, detection_count FROM contents WHERE content_hash = ? AND fingerprint = ?', (content_hash, self.fingerprint)).fetchone()
+        return (bool(row[0]), row[1]) if row else None
+
+    def record(self, path: str, size: int, mtime_ns: int, content_hash: str, has_sensitive: bool, detection_count: int):
+        """记录文件的检测结果（批量写入，调用 close 或 flush 后生效）"""
+        self._pending.append((path, size, mtime_ns, content_hash, has_sensitive, detection_count))
+        if len(self._pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """写入待记录的结果"""
+        if not self._pending:
+            return
+
+        now = time.time()
+        try:
+            with self.conn:
+                self.conn.executemany('INSERT OR REPLACE INTO contents VALUES (?, ?, ?, ?)',
+                                      [(content_hash, self.fingerprint, int(has_sensitive), count) for _, _, _, content_hash, has_sensitive, count in self._pending])
+                self.conn.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                                      [(path, self.fingerprint, size, mtime_ns, content_hash, now) for path, size, mtime_ns, content_hash, _, _ in self._pending])
+        except sqlite3.Error as e:
+            self.logger.warning(f"写入扫描清单失败: {e}")
+        self._pending.clear()
+
+    def close(self):
+        """写入剩余结果并关闭数据库"""
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,347 @@
+"""
+运行指标
+汇总每次检测的耗时和计数，按Prometheus文本格式输出（计数器和延迟直方图）。
+多进程服务中各工作进程把指标快照写入共享目录，任一进程输出时汇总全部工作进程
+"""
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 延迟直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 多进程模式下工作进程写入指标快照的间隔（秒）
+SYNC_INTERVAL = 1.0
+
+# 汇总的结果缓存统计项（已退出的工作进程不计入）
+CACHE_STAT_KEYS = ('entries', 'memory_bytes', 'hits', 'misses')
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    """格式化标签，如 {detector="regex",le="0.1"}"""
+    pairs = list(zip(labelnames, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """单调递增的计数器（可带标签）"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str):
+        """增加计数"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dump(self) -> List[list]:
+        """导出计数 [[标签, 值], ...]（用于多进程汇总）"""
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def load(self, entries: List[list]):
+        """累加 dump 导出的计数"""
+        for labels, value in entries:
+            self.inc(value, *labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """可任意设置的当前值"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0.0
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {_format_value(self.value)}"]
+
+
+class Histogram:
+    """累积直方图（可带标签）"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # 标签 -> [各桶计数, 总和, 总数]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        """记录一次观测值"""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def dump(self) -> List[list]:
+        """导出各序列 [[标签, 各桶计数, 总和, 总数], ...]（用于多进程汇总）"""
+        with self._lock:
+            return [[list(labels), list(counts), total, count] for labels, (counts, total, count) in self._series.items()]
+
+    def load(self, entries: List[list]):
+        """累加 dump 导出的序列"""
+        with self._lock:
+            for labels, counts, total, count in entries:
+                series = self._series.setdefault(tuple(labels), [[0] * len(self.buckets), 0.0, 0])
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', _format_value(bound)))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def _write_json(path: Path, data: Dict[str, Any]):
+    """写入JSON文件（先写临时文件再替换，读取方不会读到不完整的文件）"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class GuardianMetrics:
+    """ChatGuardian 的检测指标"""
+
+    def __init__(self, multiprocess_dir: Optional[str] = None):
+        """
+        Args:
+            multiprocess_dir: 多进程模式的快照目录（为None时只输出本进程的指标）
+        """
+        self.checks = Counter('guardian_checks_total', 'Number of check_text calls', ['cached'])
+        self.sensitive = Counter('guardian_sensitive_checks_total', 'Number of checks that found sensitive content')
+        self.detections = Counter('guardian_detections_total', 'Number of detections after merging')
+        self.candidates = Counter('guardian_candidates_total', 'Number of raw detector candidates before merging', ['detector'])
+        self.warnings = Counter('guardian_warnings_total', 'Number of warnings (e.g. detector errors)')
+        self.chars = Counter('guardian_checked_chars_total', 'Number of characters checked')
+        self.check_seconds = Histogram('guardian_check_seconds', 'Wall time of check_text', ['cached'])
+        self.detector_seconds = Histogram('guardian_detector_seconds', 'Wall time per detector', ['detector'])
+        self.stage_seconds = Histogram('guardian_stage_seconds', 'Wall time of the merge and obfuscation stages', ['stage'])
+
+        self.cache_hit_ratio = Gauge('guardian_result_cache_hit_ratio', 'Hit ratio of the result cache')
+        self.cache_entries = Gauge('guardian_result_cache_entries', 'Entries in the result cache')
+        self.cache_memory = Gauge('guardian_result_cache_memory_bytes', 'Estimated memory used by the result cache')
+
+        self.multiprocess_dir = Path(multiprocess_dir) if multiprocess_dir else None
+        self._collect: Optional[Callable[[], Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Dict[str, int]]]]]] = None
+        self._write_lock = threading.Lock()
+        self._sync_stop = threading.Event()
+        self._sync_thread = None
+
+    def _collectors(self) -> Dict[str, Any]:
+        """累计型指标（计数器和直方图），按输出顺序排列"""
+        return {
+            'checks': self.checks,
+            'sensitive': self.sensitive,
+            'detections': self.detections,
+            'candidates': self.candidates,
+            'warnings': self.warnings,
+            'chars': self.chars,
+            'check_seconds': self.check_seconds,
+            'detector_seconds': self.detector_seconds,
+            'stage_seconds': self.stage_seconds
+        }
+
+    def enable_multiprocess(self, directory: str):
+        """启用多进程模式（在fork工作进程前调用）"""
+        self.multiprocess_dir = Path(directory)
+
+    def start_sync(self, collect: Callable[[], Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Dict[str, int]]]]]):
+        """
+        在工作进程中启动后台线程，定期写入本进程的指标快照（未启用多进程模式时不做任何事）
+
+        Args:
+            collect: 返回本进程当前的 (结果缓存统计, 正则预过滤统计) 的函数
+        """
+        if self.multiprocess_dir is None or self._sync_thread is not None:
+            return
+        self._collect = collect
+        self._sync_stop.clear()
+        self._sync_thread = threading.Thread(target=self._sync, name='metrics-sync', daemon=True)
+        self._sync_thread.start()
+
+    def stop_sync(self):
+        """停止后台线程并写入最终快照（工作进程退出前调用）"""
+        if self._sync_thread is None:
+            return
+        self._sync_stop.set()
+        self._sync_thread.join()
+        self._sync_thread = None
+        self.write_snapshot(*self._collect())
+
+    def _sync(self):
+        while not self._sync_stop.wait(SYNC_INTERVAL):
+            try:
+                self.write_snapshot(*self._collect())
+            except Exception:
+                # 写入失败时下一轮重试，不影响请求处理
+                pass
+
+    def write_snapshot(self, cache_stats: Optional[Dict[str, Any]] = None, prefilter_stats: Optional[Dict[str, Dict[str, int]]] = None):
+        """写入本进程的指标快照（<快照目录>/<PID>.json）"""
+        data = {
+            'metrics': {name: collector.dump() for name, collector in self._collectors().items()},
+            'cache': {key: cache_stats.get(key, 0) for key in CACHE_STAT_KEYS} if cache_stats and 'hit_ratio' in cache_stats else None,
+            'prefilter': prefilter_stats or {}
+        }
+        # 同一进程中的后台线程和请求可能同时写入，加锁保证文件中的计数只增不减
+        with self._write_lock:
+            _write_json(self.multiprocess_dir / f'{os.getpid()}.json', data)
+
+    def mark_process_dead(self, pid: int):
+        """
+        主进程回收工作进程后调用：保留其计数（改名为 dead-<PID>.json），结果缓存等当前值不再计入
+
+        Args:
+            pid: 已退出的工作进程PID
+        """
+        path = self.multiprocess_dir / f'{pid}.json'
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        data['cache'] = None
+        _write_json(self.multiprocess_dir / f'dead-{pid}.json', data)
+        path.unlink()
+
+    def _read_snapshots(self) -> Iterator[Dict[str, Any]]:
+        """读取全部快照（同一进程的 dead-<PID>.json 优先于 <PID>.json）"""
+        names = os.listdir(self.multiprocess_dir)
+        dead = {name[len('dead-'):] for name in names if name.startswith('dead-') and name.endswith('.json')}
+        for name in names:
+            if not name.endswith('.json') or name in dead:
+                continue
+            # 列出目录后该进程才被标记为已退出时，改读 dead-<PID>.json
+            candidates = [name] if name.startswith('dead-') else [name, f'dead-{name}']
+            for candidate in candidates:
+                try:
+                    with open(self.multiprocess_dir / candidate, 'r', encoding='utf-8') as f:
+                        yield json.load(f)
+                    break
+                except FileNotFoundError:
+                    continue
+                except (OSError, ValueError):
+                    break
+
+    def observe(self, result: Any):
+        """
+        记录一次检测结果
+
+        Args:
+            result: GuardianResult
+        """
+        timings = result.timings or {}
+        cached = 'true' if timings.get('cached') else 'false'
+
+        self.checks.inc(1, cached)
+        self.chars.inc(len(result.original_text or ''))
+        if result.has_sensitive:
+            self.sensitive.inc()
+        self.detections.inc(result.detection_count)
+        if result.warnings:
+            self.warnings.inc(len(result.warnings))
+        if 'total' in timings:
+            self.check_seconds.observe(timings['total'], cached)
+
+        # 缓存命中的结果沿用首次检测的阶段耗时，不重复计入
+        if cached == 'true':
+            return
+
+        for name, elapsed in timings.get('detectors', {}).items():
+            self.detector_seconds.observe(elapsed, name)
+        for name, count in timings.get('candidates', {}).items():
+            self.candidates.inc(count, name)
+        for stage in ('merge', 'obfuscation'):
+            if stage in timings:
+                self.stage_seconds.observe(timings[stage], stage)
+
+    def render(self, cache_stats: Optional[Dict[str, Any]] = None, prefilter_stats: Optional[Dict[str, Dict[str, int]]] = None) -> str:
+        """
+        输出Prometheus文本格式的指标（多进程模式下汇总所有工作进程，包括已退出进程的计数）
+
+        Args:
+            cache_stats: 本进程的结果缓存统计（ChatGuardian.get_cache_stats()），为空时不输出缓存指标
+            prefilter_stats: 本进程的正则预过滤统计（RegexDetector.get_prefilter_stats()），为空时不输出
+        """
+        if self.multiprocess_dir is None:
+            return self._render(cache_stats, prefilter_stats)
+
+        self.write_snapshot(cache_stats, prefilter_stats)
+        total = GuardianMetrics()
+        total_cache = {}
+        total_prefilter = {}
+        for data in self._read_snapshots():
+            for name, collector in total._collectors().items():
+                collector.load(data['metrics'].get(name, []))
+            for key, value in (data.get('cache') or {}).items():
+                total_cache[key] = total_cache.get(key, 0) + value
+            for name, stats in data.get('prefilter', {}).items():
+                counts = total_prefilter.setdefault(name, {'run': 0, 'skipped': 0})
+                counts['run'] += stats['run']
+                counts['skipped'] += stats['skipped']
+
+        if total_cache:
+            lookups = total_cache['hits'] + total_cache['misses']
+            total_cache['hit_ratio'] = total_cache['hits'] / lookups if lookups else 0.0
+        return total._render(total_cache, total_prefilter)
+
+    def _render(self, cache_stats: Optional[Dict[str, Any]], prefilter_stats: Optional[Dict[str, Dict[str, int]]]) -> str:
+        metrics = list(self._collectors().values())
+        if cache_stats and 'hit_ratio' in cache_stats:
+            self.cache_hit_ratio.value = cache_stats['hit_ratio']
+            self.cache_entries.value = cache_stats.get('entries', 0)
+            self.cache_memory.value = cache_stats.get('memory_bytes', 0)
+            metrics += [self.cache_hit_ratio, self.cache_entries, self.cache_memory]
+        if prefilter_stats:
+            runs = Counter('guardian_regex_pattern_runs_total', 'Number of times a regex pattern was run', ['pattern'])
+            skips = Counter('guardian_regex_pattern_skips_total', 'Number of times a regex pattern was skipped by the literal prefilter', ['pattern'])
+            for name, stats in prefilter_stats.items():
+                runs.inc(stats['run'], name)
+                skips.inc(stats['skipped'], name)
+            metrics += [runs, skips]
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,183 @@
+"""
+Guardian热重载
+在后台线程中按最新的配置、关键词和检测规则构建新的 ChatGuardian（复用配置未变化的检测器和缓存），
+构建完成后原子替换当前实例，处理中的请求继续使用旧实例；可选监视这些文件的变化
+"""
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+
+from .guardian import ChatGuardian
+from .utils import get_default_config_file
+
+# 检查配置文件是否变化的间隔（秒）
+WATCH_INTERVAL = 2.0
+
+
+def write_config(config_path: Path, config: Dict[str, Any]):
+    """保存配置文件（先写临时文件再替换，文件监视和重载不会读到写了一半的配置）"""
+    temp_path = Path(config_path).with_suffix('.yaml.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        yaml.dump(config, f, allow_unicode=True, default_flow_style=False)
+    os.replace(temp_path, config_path)
+
+
+class GuardianReloader:
+    """持有当前 ChatGuardian 实例，支持后台重载和原子替换"""
+
+    def __init__(self, config_path: str = None, keywords_path: str = None, watch_interval: float = WATCH_INTERVAL):
+        """
+        加载初始实例（同步）
+
+        Args:
+            config_path: 配置文件路径（为None时使用默认配置文件）
+            keywords_path: 关键词文件路径（为None时使用默认关键词文件）
+            watch_interval: 监视文件变化的间隔（秒）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.config_path = Path(config_path) if config_path else get_default_config_file("default_config.yaml")
+        self.keywords_path = Path(keywords_path) if keywords_path else get_default_config_file("sensitive_keywords.yaml")
+        self.watch_interval = watch_interval
+
+        self._build_lock = threading.RLock()  # 同一时间只构建一个新实例（保存配置时同时阻止文件监视）
+        self._state_lock = threading.Lock()  # 保护后台重载状态
+        self._reloading = False
+        self._pending = False
+        self._watch_stop = threading.Event()
+        self._watch_thread = None
+
+        self.reload_count = 0
+        self.last_reload = None
+        self.last_error = None
+
+        self.guardian = ChatGuardian(str(self.config_path), str(self.keywords_path))
+        self._file_state = self._stat_files()
+
+    def _stat_files(self) -> Tuple[Optional[Tuple[int, int]], ...]:
+        """配置文件、关键词文件和检测规则文件的 (修改时间, 大小)，文件不存在时为None"""
+        state = []
+        for path in (self.config_path, self.keywords_path, self.guardian.rules_path):
+            try:
+                stat = os.stat(path)
+                state.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                state.append(None)
+        return tuple(state)
+
+    def reload(self) -> bool:
+        """
+        构建新实例并替换当前实例（在调用线程中同步执行）
+
+        Returns:
+            是否成功，失败时继续使用当前实例
+        """
+        with self._build_lock:
+            self._file_state = self._stat_files()
+            current = self.guardian
+            start_time = time.perf_counter()
+            try:
+                new_guardian = ChatGuardian(str(self.config_path), str(self.keywords_path), previous=current)
+            except Exception as e:
+                self.last_error = str(e)
+                self.logger.error(f"重新加载Guardian失败，继续使用当前配置: {e}", exc_info=True)
+                return False
+
+            # 单次赋值即完成替换：请求要么拿到旧实例，要么拿到完整的新实例
+            self.guardian = new_guardian
+            self.reload_count += 1
+            self.last_reload = time.time()
+            self.last_error = None
+            self.logger.info(f"Guardian已重新加载 ({time.perf_counter() - start_time:.2f}秒)")
+
+        self._retire(current)
+        return True
+
+    def save_config(self, config: Dict[str, Any]) -> bool:
+        """
+        保存配置文件并同步重新加载（这次写入不会再触发文件监视的重载）
+
+        Args:
+            config: 完整的配置
+
+        Returns:
+            是否重新加载成功
+        """
+        with self._build_lock:
+            write_config(self.config_path, config)
+            return self.reload()
+
+    def reload_async(self) -> bool:
+        """
+        在后台线程中重新加载；重载进行中再次调用时，当前重载结束后再重载一次
+
+        Returns:
+            是否启动了新的后台线程
+        """
+        with self._state_lock:
+            if self._reloading:
+                self._pending = True
+                return False
+            self._reloading = True
+
+        threading.Thread(target=self._reload_loop, name='guardian-reload', daemon=True).start()
+        return True
+
+    def _reload_loop(self):
+        while True:
+            self.reload()
+            with self._state_lock:
+                if not self._pending:
+                    self._reloading = False
+                    return
+                self._pending = False
+
+    def _retire(self, guardian: ChatGuardian):
+        """
+        在后台线程中释放被替换实例的线程池/进程池（复用的检测器和缓存仍由新实例使用）
+
+        等待仍在使用这些线程池的检测完成后再释放，不论LLM请求耗时多久；
+        之后才拿到旧实例的请求在调用线程中依次执行，不会再创建线程池
+        """
+        threading.Thread(target=guardian.close, kwargs={'wait': True}, name='guardian-retire', daemon=True).start()
+
+    def start_watching(self):
+        """启动后台线程监视配置文件、关键词文件和检测规则文件，变化后自动重新加载"""
+        if self._watch_thread is not None:
+            return
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(target=self._watch, name='guardian-watch', daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        """停止监视文件"""
+        self._watch_stop.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join()
+            self._watch_thread = None
+
+    def _watch(self):
+        while not self._watch_stop.wait(self.watch_interval):
+            # 与重载互斥：重载开始时已记录的文件状态不会被当作变化
+            with self._build_lock:
+                state = self._stat_files()
+                changed = state != self._file_state
+                if changed:
+                    self._file_state = state
+            if changed:
+                self.logger.info("检测到配置文件、关键词文件或检测规则文件变化，后台重新加载")
+                self.reload_async()
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取重载状态"""
+        return {
+            'reloading': self._reloading,
+            'reload_count': self.reload_count,
+            'last_reload': self.last_reload,
+            'last_error': self.last_error,
+            'watching': self._watch_thread is not None
+        }
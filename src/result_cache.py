@@ -0,0 +1,148 @@
+"""
+检测结果缓存
+进程内的LRU缓存（支持TTL和内存上限），用于复用相同文本的检测结果
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# 不包含其他对象的值类型
+_ATOMIC_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    粗略估算对象占用的内存（字节），递归统计容器、字典和dataclass的内容
+
+    Args:
+        obj: 待估算的对象
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+
+        # 字符串和数字等不可变值不会包含其他对象，直接计入
+        if isinstance(item, _ATOMIC_TYPES):
+            total += sys.getsizeof(item)
+            continue
+
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(type(item), '__dataclass_fields__'):
+            stack.extend(getattr(item, name) for name in type(item).__dataclass_fields__)
+
+    return total
+
+
+class ResultCache:
+    """线程安全的LRU缓存（按条数、内存和TTL淘汰）"""
+
+    def __init__(self, max_entries: int = 1024, max_memory_mb: float = 64, ttl_seconds: float = 300):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最大缓存条数
+            max_memory_mb: 缓存内容估算内存上限（MB）
+            ttl_seconds: 缓存有效期（秒），<=0 表示永不过期
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.max_memory_bytes = int(float(max_memory_mb) * 1024 * 1024)
+        self.ttl_seconds = float(ttl_seconds)
+
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()  # key -> (值, 大小, 写入时间)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        读取缓存
+
+        Returns:
+            缓存的值，未命中或已过期时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds > 0 and time.monotonic() - entry[2] > self.ttl_seconds:
+                self._remove(key)
+                self.evictions += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None):
+        """
+        写入缓存，超出上限时淘汰最久未使用的条目（单条超过内存上限时不缓存）
+
+        Args:
+            key: 缓存键
+            value: 缓存的值
+            size: 值的估算大小（字节），为None时使用 estimate_size 计算
+        """
+        if size is None:
+            size = estimate_size(value)
+        if size > self.max_memory_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, time.monotonic())
+            self._memory_bytes += size
+
+            while len(self._entries) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        """删除条目（调用方需持有锁）"""
+        _, size, _ = self._entries.pop(key)
+        self._memory_bytes -= size
+
+    def clear(self):
+        """清空缓存及统计"""
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'memory_bytes': self._memory_bytes,
+                'max_memory_bytes': self.max_memory_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
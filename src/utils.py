@@ -24,6 +24,33 @@ def get_project_root() -> Path:
         return Path(__file__).parent.parent
 
 
+def get_cache_dir() -> Path:
+    """获取缓存目录（打包后位于exe同目录，避免写入临时解压目录）"""
+    if getattr(sys, 'frozen', False):
+        return Path(sys.executable).parent / "cache"
+    return get_project_root() / "cache"
+
+
+def get_default_config_file(filename: str) -> Path:
+    """
+    获取 config 目录下默认配置文件的路径
+
+    Args:
+        filename: 文件名，如 default_config.yaml / sensitive_keywords.yaml
+    """
+    if getattr(sys, 'frozen', False):
+        # 打包后的环境：优先从exe同目录查找
+        path = Path(sys.executable).parent / "config" / filename
+
+        # 如果exe同目录没有，尝试_internal目录
+        if not path.exists():
+            path = Path(sys._MEIPASS) / "config" / filename
+        return path
+
+    # 开发环境
+    return get_project_root() / "config" / filename
+
+
 def load_config(config_path: str = None) -> Dict[str, Any]:
     """
     加载配置文件
@@ -35,17 +62,7 @@ def load_config(config_path: str = None) -> Dict[str, Any]:
         配置字典
     """
     if config_path is None:
-        if getattr(sys, 'frozen', False):
-            # 打包后的环境：优先从exe同目录查找
-            exe_dir = Path(sys.executable).parent
-            config_path = exe_dir / "config" / "default_config.yaml"
-
-            # 如果exe同目录没有，尝试_internal目录
-            if not config_path.exists():
-                config_path = Path(sys._MEIPASS) / "config" / "default_config.yaml"
-        else:
-            # 开发环境
-            config_path = get_project_root() / "config" / "default_config.yaml"
+        config_path = get_default_config_file("default_config.yaml")
 
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
@@ -67,17 +84,7 @@ def load_sensitive_keywords(keywords_path: str = None) -> Dict[str, list]:
         关键词字典
     """
     if keywords_path is None:
-        if getattr(sys, 'frozen', False):
-            # 打包后的环境：优先从exe同目录查找
-            exe_dir = Path(sys.executable).parent
-            keywords_path = exe_dir / "config" / "sensitive_keywords.yaml"
-
-            # 如果exe同目录没有，尝试_internal目录
-            if not keywords_path.exists():
-                keywords_path = Path(sys._MEIPASS) / "config" / "sensitive_keywords.yaml"
-        else:
-            # 开发环境
-            keywords_path = get_project_root() / "config" / "sensitive_keywords.yaml"
+        keywords_path = get_default_config_file("sensitive_keywords.yaml")
 
     try:
         with open(keywords_path, 'r', encoding='utf-8') as f:
@@ -95,7 +102,23 @@ def get_default_config() -> Dict[str, Any]:
             'enable_regex': True,
             'enable_keyword': True,
             'enable_ai': False,
-            'confidence_threshold': 0.7
+            'confidence_threshold': 0.7,
+            'execution_mode': 'thread',
+            'max_workers': 4,
+            'proximity_window': 100,
+            'rules': {}
+        },
+        'result_cache': {
+            'enable': True,
+            'max_entries': 1024,
+            'max_memory_mb': 64,
+            'ttl_seconds': 300
+        },
+        'segment_cache': {
+            'enable': False,
+            'max_entries': 4096,
+            'max_memory_mb': 64,
+            'ttl_seconds': 3600
         },
         'obfuscation': {
             'preserve_structure': True,
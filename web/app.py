@@ -2,7 +2,7 @@
 AI Chat Guardian - Web版本
 提供Web界面供内网用户访问使用
 """
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session
 from flask_cors import CORS
 import sys
 import os
@@ -17,6 +17,8 @@ import yaml
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.guardian import ChatGuardian
+from src.reloader import GuardianReloader, write_config
+from src.metrics import GuardianMetrics
 
 # 创建Flask应用
 app = Flask(__name__)
@@ -47,15 +49,20 @@ user_handler.setFormatter(logging.Formatter('%(asctime)s | %(message)s', datefmt
 user_logger.addHandler(user_handler)
 user_logger.propagate = False
 
-# 全局Guardian实例
-guardian = None
+# 全局Guardian实例（由reloader持有，配置变化时在后台重建并原子替换）
+reloader = None
+
+# 检测指标（/metrics，多进程服务中汇总所有工作进程）
+metrics = GuardianMetrics()
 
 
 def init_guardian():
-    """初始化Guardian实例"""
-    global guardian
+    """初始化Guardian实例（已初始化时重新加载：复用配置未变化的检测器，并释放被替换实例的资源）"""
+    global reloader
+    if reloader is not None:
+        return reloader.reload()
     try:
-        guardian = ChatGuardian()
+        reloader = GuardianReloader()
         logger.info("✓ Guardian初始化成功")
         return True
     except Exception as e:
@@ -63,6 +70,29 @@ def init_guardian():
         return False
 
 
+def get_guardian() -> ChatGuardian:
+    """当前的Guardian实例（每个请求只取一次，避免重载时前后使用不同的实例）"""
+    return reloader.guardian if reloader else None
+
+
+def _collect_stats() -> tuple:
+    """当前实例的 (结果缓存统计, 正则预过滤统计)"""
+    guardian = get_guardian()
+    regex_detector = guardian.regex_detector if guardian else None
+    return guardian.get_cache_stats() if guardian else None, regex_detector.get_prefilter_stats() if regex_detector else None
+
+
+def post_fork():
+    """多进程服务的工作进程启动后调用：监视配置文件，定期写入指标快照（线程不能在fork前创建）"""
+    reloader.start_watching()
+    metrics.start_sync(_collect_stats)
+
+
+def worker_exit():
+    """多进程服务的工作进程退出前调用：写入最终的指标快照"""
+    metrics.stop_sync()
+
+
 @app.route('/')
 def index():
     """主页"""
@@ -93,7 +123,9 @@ def check_text():
                          f"长度: {text_length}字符 | 预览: {text_preview}")
 
         # 执行检测
+        guardian = get_guardian()
         result = guardian.check_text(text, auto_obfuscate=True)
+        metrics.observe(result)
 
         # 构建响应
         response = {
@@ -125,11 +157,19 @@ def check_text():
         return jsonify({'success': False, 'error': f'检测失败: {str(e)}'}), 500
 
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus格式的检测指标"""
+    body = metrics.render(*_collect_stats())
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """获取系统状态"""
     try:
         # 检查各个检测器状态
+        guardian = get_guardian()
         status = {
             'success': True,
             'data': {
@@ -139,6 +179,8 @@ def get_status():
                 'ai_enabled': guardian.ai_detector is not None if guardian else False,
                 'llm_enabled': guardian.llm_detector is not None if guardian else False,
                 'llm_model': guardian.llm_detector.model if (guardian and guardian.llm_detector) else 'N/A',
+                'result_cache': guardian.get_cache_stats() if guardian else {},
+                'reload': reloader.get_status() if reloader else {},
                 'server_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
         }
@@ -151,12 +193,12 @@ def get_status():
 @app.route('/api/config', methods=['GET', 'POST'])
 def manage_config():
     """配置管理API - 获取或更新配置"""
-    global guardian
+    guardian = get_guardian()
 
     if request.method == 'GET':
         # 获取当前配置
         try:
-            config_path = Path(__file__).parent.parent / 'config' / 'default_config.yaml'
+            config_path = reloader.config_path if reloader else Path(__file__).parent.parent / 'config' / 'default_config.yaml'
 
             with open(config_path, 'r', encoding='utf-8') as f:
                 config = yaml.safe_load(f)
@@ -199,7 +241,7 @@ def manage_config():
         # 更新配置
         try:
             data = request.get_json()
-            config_path = Path(__file__).parent.parent / 'config' / 'default_config.yaml'
+            config_path = reloader.config_path if reloader else Path(__file__).parent.parent / 'config' / 'default_config.yaml'
 
             # 记录配置变更
             client_ip = request.remote_addr
@@ -223,26 +265,27 @@ def manage_config():
                     config['llm_detector'] = {}
                 config['llm_detector'].update(data['llm_detector'])
 
-            # 保存配置
-            with open(config_path, 'w', encoding='utf-8') as f:
-                yaml.dump(config, f, allow_unicode=True, default_flow_style=False)
-
-            # 重新初始化Guardian
-            logger.info("配置已更新，重新初始化Guardian...")
+            # 保存配置并重新加载Guardian（构建新实例期间其他请求继续使用当前实例，返回时已是新配置）
+            logger.info("配置已更新，重新加载Guardian...")
             user_logger.info(f"Guardian重载 | IP: {client_ip} | Session: {session_id}")
-            if init_guardian():
-                return jsonify({
-                    'success': True,
-                    'message': '配置已保存并重新加载检测器',
-                    'data': {
-                        'regex_active': guardian.regex_detector is not None,
-                        'keyword_active': guardian.keyword_detector is not None,
-                        'ai_active': guardian.ai_detector is not None,
-                        'llm_active': guardian.llm_detector is not None
-                    }
-                })
-            else:
-                return jsonify({'success': False, 'error': 'Guardian重新初始化失败'}), 500
+            if reloader is None:
+                write_config(config_path, config)
+                if not init_guardian():
+                    return jsonify({'success': False, 'error': 'Guardian重新初始化失败'}), 500
+            elif not reloader.save_config(config):
+                return jsonify({'success': False, 'error': f"配置已保存，但Guardian重新加载失败: {reloader.last_error}"}), 500
+
+            guardian = get_guardian()
+            return jsonify({
+                'success': True,
+                'message': '配置已保存，检测器已重新加载',
+                'data': {
+                    'regex_active': guardian.regex_detector is not None,
+                    'keyword_active': guardian.keyword_detector is not None,
+                    'ai_active': guardian.ai_detector is not None,
+                    'llm_active': guardian.llm_detector is not None
+                }
+            })
 
         except Exception as e:
             logger.error(f"更新配置失败: {e}", exc_info=True)
@@ -291,5 +334,8 @@ if __name__ == '__main__':
     print(f"\n按 Ctrl+C 停止服务\n")
     print("=" * 60)
 
+    # 配置文件或关键词文件变化时自动重新加载
+    reloader.start_watching()
+
     # 启动服务器
     app.run(host=host, port=port, debug=debug, threaded=True)
@@ -0,0 +1,417 @@
+"""
+AI Chat Guardian - 多进程Web服务（生产部署）
+在主进程中加载一次Guardian（编译好的正则、关键词自动机等），再fork多个工作进程共享同一个监听端口，
+工作进程以写时复制的方式共享这些只读结构，正则和关键词检测可以用满多个CPU核心。
+不支持fork的平台（Windows）使用waitress（已安装时）或Flask多线程服务。
+
+用法:
+    python web/server.py --workers 4        # 也可以通过环境变量 GUARDIAN_WORKERS 指定
+    kill -HUP <主进程PID>                   # 平滑重启：重新加载配置，新工作进程就绪后再停止旧进程
+    kill -USR1 <主进程PID>                  # 在日志中输出各工作进程的运行时间和心跳
+    kill -TERM <主进程PID>                  # 停止服务（等待处理中的请求完成）
+"""
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from web import app as web_app
+
+logger = logging.getLogger(__name__)
+
+# 主进程检查工作进程的间隔（秒）
+MONITOR_INTERVAL = 1.0
+
+# 工作进程接收连接的轮询间隔（秒），每轮写一次心跳
+POLL_INTERVAL = 0.5
+
+# 默认心跳超时（秒），超时的工作进程会被强制结束并重新启动
+HEARTBEAT_TIMEOUT = 30.0
+
+# 停止工作进程时等待处理中请求完成的时间（秒）
+SHUTDOWN_TIMEOUT = 30.0
+
+# 监听队列长度
+LISTEN_BACKLOG = 2048
+
+
+def default_workers() -> int:
+    """默认工作进程数：环境变量 GUARDIAN_WORKERS，未设置时为CPU核心数"""
+    value = os.environ.get('GUARDIAN_WORKERS')
+    if value:
+        return max(1, int(value))
+    return os.cpu_count() or 1
+
+
+@dataclass
+class WorkerInfo:
+    """工作进程信息"""
+    pid: int
+    slot: int  # 心跳数组中的位置
+    started: float  # 启动时间（time.time()）
+    retiring: bool = False  # 是否正在被替换或停止（不再计入工作进程数）
+    stop_sent: float = 0.0  # 发送停止信号的时间，0 表示尚未发送
+
+
+class PreforkServer:
+    """预先fork的多进程HTTP服务（工作进程共享监听端口，主进程负责健康检查和重启）"""
+
+    def __init__(self,
+                 app,
+                 host: str,
+                 port: int,
+                 workers: int,
+                 reload: Callable[[], bool],
+                 heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+                 post_fork: Optional[Callable[[], None]] = None,
+                 worker_exit: Optional[Callable[[], None]] = None,
+                 child_exit: Optional[Callable[[int], None]] = None):
+        """
+        初始化服务
+
+        Args:
+            app: WSGI应用
+            host: 监听地址
+            port: 监听端口
+            workers: 工作进程数
+            reload: 平滑重启时在主进程中重新加载Guardian的函数，返回是否成功
+            heartbeat_timeout: 心跳超时（秒）
+            post_fork: 工作进程启动后调用的函数（如启动文件监视线程，线程不能在fork前创建）
+            worker_exit: 工作进程正常停止前调用的函数
+            child_exit: 工作进程退出（包括被强制结束）后在主进程中调用的函数，参数为其PID
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.reload = reload
+        self.heartbeat_timeout = heartbeat_timeout
+        self.post_fork = post_fork
+        self.worker_exit = worker_exit
+        self.child_exit = child_exit
+
+        # 平滑重启期间新旧进程同时存在，心跳位置按两倍进程数分配
+        self.heartbeats = multiprocessing.Array('d', self.workers * 2, lock=False)
+        self.free_slots = list(range(self.workers * 2))
+        self.children: Dict[int, WorkerInfo] = {}
+
+        self.sock = None
+        self._stopping = False
+        self._reload_requested = False
+        self._status_requested = False
+
+    def serve(self):
+        """启动工作进程并进入主循环，直到收到 SIGTERM/SIGINT"""
+        self.sock = socket.create_server((self.host, self.port), backlog=LISTEN_BACKLOG)
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+        signal.signal(signal.SIGUSR1, self._handle_status)
+
+        self._freeze_shared_state()
+        for _ in range(self.workers):
+            self._spawn()
+
+        try:
+            while not self._stopping:
+                time.sleep(MONITOR_INTERVAL)
+                self._reap()
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self._graceful_restart()
+                if self._status_requested:
+                    self._status_requested = False
+                    self._log_worker_health()
+                self._check_health()
+                self._maintain()
+        finally:
+            self._shutdown()
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def _handle_status(self, signum, frame):
+        self._status_requested = True
+
+    @staticmethod
+    def _freeze_shared_state():
+        """把已加载的对象移出垃圾回收的跟踪范围，避免工作进程中的GC扫描触发写时复制"""
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+
+    def _spawn(self) -> int:
+        """启动一个工作进程，返回其PID"""
+        slot = self.free_slots.pop(0)
+        self.heartbeats[slot] = 0.0
+        started = time.time()
+
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                self._run_worker(slot)
+            except BaseException as e:
+                logger.error(f"工作进程异常退出: {e}", exc_info=True)
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+
+        self.children[pid] = WorkerInfo(pid, slot, started)
+        return pid
+
+    def _run_worker(self, slot: int):
+        """工作进程：在共享的监听端口上处理请求，并定期写心跳"""
+        from werkzeug.serving import make_server
+
+        # Ctrl+C 会发给整个进程组，由主进程统一停止工作进程
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+
+        if self.post_fork is not None:
+            self.post_fork()
+
+        server = make_server(self.host, self.port, self.app, threaded=True, fd=self.sock.fileno())
+        # 停止时等待处理中的请求完成（server_close 会等待非守护线程）
+        server.daemon_threads = False
+
+        def stop(signum, frame):
+            # shutdown 会等待 serve_forever 退出，不能在同一线程中调用
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+
+        # 心跳写在接收连接的循环中，循环卡住时主进程能发现
+        def heartbeat():
+            self.heartbeats[slot] = time.time()
+
+        server.service_actions = heartbeat
+        heartbeat()
+
+        server.serve_forever(poll_interval=POLL_INTERVAL)
+        server.server_close()
+
+        if self.worker_exit is not None:
+            self.worker_exit()
+
+    def _reap(self):
+        """回收已退出的工作进程"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            worker = self.children.pop(pid, None)
+            if worker is None:
+                continue
+            self.free_slots.append(worker.slot)
+            if not worker.retiring and not self._stopping:
+                logger.warning(f"工作进程 {pid} 意外退出（状态 {status}），重新启动")
+
+            if self.child_exit is not None:
+                try:
+                    self.child_exit(pid)
+                except Exception as e:
+                    logger.error(f"处理工作进程 {pid} 退出时出错: {e}")
+
+    def _maintain(self):
+        """保持工作进程数量"""
+        if self._stopping:
+            return
+        active = sum(1 for worker in self.children.values() if not worker.retiring)
+        # 被替换的进程退出、释放心跳位置后再补充
+        for _ in range(min(self.workers - active, len(self.free_slots))):
+            self._spawn()
+
+    def _check_health(self):
+        """强制结束心跳超时（包括启动超时）或停止超时的工作进程，由 _maintain 补充"""
+        now = time.time()
+        for worker in list(self.children.values()):
+            if worker.retiring:
+                if worker.stop_sent and now - worker.stop_sent > SHUTDOWN_TIMEOUT:
+                    logger.warning(f"工作进程 {worker.pid} 停止超时，强制结束")
+                    self._kill(worker.pid, signal.SIGKILL)
+                continue
+
+            last_seen = self.heartbeats[worker.slot] or worker.started
+            if now - last_seen > self.heartbeat_timeout:
+                logger.warning(f"工作进程 {worker.pid} 心跳超时 {now - last_seen:.0f} 秒，强制结束")
+                self._stop_worker(worker, signal.SIGKILL)
+
+    def _stop_worker(self, worker: WorkerInfo, sig: int = signal.SIGTERM):
+        """向工作进程发送停止信号（SIGTERM 等待处理中的请求完成）"""
+        worker.retiring = True
+        worker.stop_sent = time.time()
+        self._kill(worker.pid, sig)
+
+    def _graceful_restart(self):
+        """平滑重启：重新加载Guardian，启动新工作进程，就绪后再停止旧进程"""
+        if len(self.free_slots) < self.workers:
+            logger.warning("上一次重启的旧工作进程仍在退出，稍后重新加载")
+            self._reload_requested = True
+            return
+
+        logger.warning("收到 SIGHUP，重新加载Guardian...")
+        if not self.reload():
+            logger.error("Guardian重新加载失败，继续使用当前工作进程")
+            return
+
+        old_workers = [worker for worker in self.children.values() if not worker.retiring]
+        for worker in old_workers:
+            worker.retiring = True
+
+        self._freeze_shared_state()
+        new_pids = [self._spawn() for _ in range(self.workers)]
+        self._wait_ready(new_pids)
+
+        for worker in old_workers:
+            self._stop_worker(worker)
+        logger.warning(f"平滑重启完成，停止 {len(old_workers)} 个旧工作进程")
+
+    def _wait_ready(self, pids: List[int]):
+        """等待新工作进程写入第一次心跳"""
+        deadline = time.time() + self.heartbeat_timeout
+        while time.time() < deadline:
+            self._reap()
+            pending = [pid for pid in pids if pid in self.children and not self.heartbeats[self.children[pid].slot]]
+            if not pending:
+                return
+            time.sleep(0.05)
+
+    def _shutdown(self):
+        """停止所有工作进程（先 SIGTERM，超时后 SIGKILL）"""
+        self._stopping = True
+        for worker in list(self.children.values()):
+            self._stop_worker(worker)
+
+        deadline = time.time() + SHUTDOWN_TIMEOUT
+        while self.children and time.time() < deadline:
+            self._reap()
+            time.sleep(0.05)
+
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGKILL)
+        while self.children:
+            try:
+                pid, _ = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            self.children.pop(pid, None)
+
+        if self.sock is not None:
+            self.sock.close()
+
+    @staticmethod
+    def _kill(pid: int, sig: int):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def get_worker_health(self) -> List[Dict]:
+        """获取各工作进程的状态"""
+        now = time.time()
+        return [{
+            'pid': worker.pid,
+            'uptime': now - worker.started,
+            'heartbeat_age': now - self.heartbeats[worker.slot] if self.heartbeats[worker.slot] else None,
+            'retiring': worker.retiring
+        } for worker in self.children.values()]
+
+    def _log_worker_health(self):
+        """在日志中输出各工作进程的状态（收到 SIGUSR1 时）"""
+        health = self.get_worker_health()
+        logger.warning(f"共 {len(health)} 个工作进程")
+        for worker in health:
+            heartbeat = f"{worker['heartbeat_age']:.1f} 秒前" if worker['heartbeat_age'] is not None else '尚未就绪'
+            state = '，正在停止' if worker['retiring'] else ''
+            logger.warning(f"  工作进程 {worker['pid']}: 已运行 {worker['uptime']:.0f} 秒，最近心跳 {heartbeat}{state}")
+
+
+def serve_threaded(app, host: str, port: int, threads: int):
+    """单进程多线程服务（不支持fork时使用）：优先使用waitress，未安装时使用Flask自带服务"""
+    try:
+        from waitress import serve
+    except ImportError:
+        logger.warning("未安装waitress，使用Flask多线程服务（pip install waitress）")
+        app.run(host=host, port=port, debug=False, threaded=True)
+        return
+
+    serve(app, host=host, port=port, threads=threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI Chat Guardian - 多进程Web服务')
+    parser.add_argument('--host', default=os.environ.get('FLASK_HOST', '0.0.0.0'), help='监听地址')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('FLASK_PORT', 5000)), help='监听端口')
+    parser.add_argument('--workers', type=int, default=default_workers(), help='工作进程数（默认为环境变量 GUARDIAN_WORKERS 或CPU核心数）')
+    parser.add_argument('--heartbeat-timeout', type=float, default=HEARTBEAT_TIMEOUT, help='工作进程心跳超时（秒）')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("AI Chat Guardian - Web服务（生产模式）")
+    print("=" * 60)
+
+    # 在主进程中加载一次，工作进程直接继承
+    if not web_app.init_guardian():
+        print("✗ Guardian初始化失败，请检查配置")
+        sys.exit(1)
+
+    prefork = hasattr(os, 'fork') and args.workers > 1
+
+    print(f"\n✓ 服务器配置:")
+    print(f"  - 地址: http://{args.host}:{args.port}")
+    if prefork:
+        print(f"  - 工作进程: {args.workers}（主进程PID {os.getpid()}，kill -HUP 平滑重启）")
+    else:
+        print(f"  - 单进程多线程: {args.workers} 个线程")
+    print(f"\n按 Ctrl+C 停止服务\n")
+    print("=" * 60)
+
+    if prefork:
+        # 每个工作进程各自监视配置文件，某个进程收到的配置修改会被所有进程加载；
+        # 各工作进程的指标快照写入临时目录，/metrics 由处理请求的进程汇总
+        metrics_dir = tempfile.mkdtemp(prefix='guardian-metrics-')
+        web_app.metrics.enable_multiprocess(metrics_dir)
+        try:
+            PreforkServer(web_app.app,
+                          args.host,
+                          args.port,
+                          args.workers,
+                          web_app.init_guardian,
+                          args.heartbeat_timeout,
+                          post_fork=web_app.post_fork,
+                          worker_exit=web_app.worker_exit,
+                          child_exit=web_app.metrics.mark_process_dead).serve()
+        finally:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+    else:
+        web_app.reloader.start_watching()
+        serve_threaded(web_app.app, args.host, args.port, max(4, args.workers))
+
+
+if __name__ == '__main__':
+    main()
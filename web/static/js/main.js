@@ -319,7 +319,7 @@ SECRET_TOKEN = "ghp_1234567890abcdefghijklmnopqr"
 
 这周见了两个重点客户：
 
-第一个是北京创新科技的张总，他手机是13800138000，邮箱zhang.ceo@bjcxtech.com，身份证110105198506123456。他们有一笔500万订单的意向，说这个月底给决策。
+第一个是北京创新科技的张总，他手机是13800138000，邮箱zhang.ceo@bjcxtech.com，身份证110105198506123454。他们有一笔500万订单的意向，说这个月底给决策。
 
 第二个是上海智能制造的李经理，公司电话021-65432109，微信是li_manager_sh，打款账号是6222 0012 3456 7890。他们已经签了意向书了。
 
@@ -615,7 +615,7 @@ async function saveConfig() {
         const result = await response.json();
         
         if (result.success) {
-            showNotification('配置已保存并应用成功！', 'success');
+            showNotification(result.message || '配置已保存并应用成功！', 'success');
             closeConfigModal();
             
             // 刷新服务器状态